@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -55,9 +56,12 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.profiling.ProfilingMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
+    "core.middleware.ShardRoutingMiddleware",
 ]
 
-ROOT_URLCONF = "app.urls"
+ROOT_URLCONF = os.environ.get("DJANGO_ROOT_URLCONF", "app.urls")
 
 TEMPLATES = [
     {
@@ -77,6 +81,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "app.wsgi.application"
 
+# Size of the thread pool async views use for ORM access under ASGI
+ASYNC_ORM_THREADS = int(os.environ.get("ASYNC_ORM_THREADS", 16))
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -88,8 +95,131 @@ DATABASES = {
         "NAME": os.environ.get("DB_NAME"),
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASS"),
+        # Reuse connections across requests for this many seconds instead of
+        # reconnecting (and re-authenticating) on every request
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+    }
+}
+
+# Verify persistent connections are still usable at the start of a request
+DB_CONN_HEALTH_CHECKS = bool(int(os.environ.get("DB_CONN_HEALTH_CHECKS", 1)))
+# Skip the check for connections verified less than this many seconds ago
+DB_CONN_HEALTH_CHECK_INTERVAL = float(
+    os.environ.get("DB_CONN_HEALTH_CHECK_INTERVAL", 5)
+)
+
+# Optionally share a bounded pool of connections between a process's threads
+if int(os.environ.get("DB_POOL", 0)):
+    DATABASES["default"].update(
+        {
+            "ENGINE": "core.db.backends.postgresql_pool",
+            "CONN_MAX_AGE": 0,
+            "POOL": {
+                "MIN_SIZE": int(os.environ.get("DB_POOL_MIN_SIZE", 1)),
+                "MAX_SIZE": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+                "TIMEOUT": float(os.environ.get("DB_POOL_TIMEOUT", 5)),
+            },
+        }
+    )
+
+# Read replicas, as a comma-separated list of hosts sharing the credentials
+# of the primary; safe requests to recipe endpoints are served from them
+for index, host in enumerate(
+    filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(","))
+):
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_REPLICAS = [
+    alias for alias in DATABASES if alias.startswith("replica")
+]
+
+# Shards, as a comma-separated list of hosts sharing the credentials of the
+# primary; each user's recipes, tags and ingredients live on one of them or
+# on the primary (see core.sharding). Append new hosts at the end, as each
+# shard's IDs are allocated from a range derived from its position.
+for index, host in enumerate(
+    filter(None, os.environ.get("DB_SHARD_HOSTS", "").split(","))
+):
+    DATABASES[f"shard{index}"] = {**DATABASES["default"], "HOST": host}
+
+DATABASE_SHARDS = [alias for alias in DATABASES if alias.startswith("shard")]
+if DATABASE_SHARDS:
+    DATABASE_SHARDS.insert(0, "default")
+DATABASE_ROUTERS = ["core.routers.ShardRouter", "core.routers.ReplicaRouter"]
+# Seconds a user's shard is cached after being looked up in the directory
+SHARD_DIRECTORY_CACHE_SECONDS = int(
+    os.environ.get("SHARD_DIRECTORY_CACHE_SECONDS", 300)
+)
+
+# Seconds a client reads from the primary after writing
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 5))
+# Replicas further behind than this are skipped
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", 2))
+REPLICA_LAG_CHECK_SECONDS = 1
+
+
+# Cache
+# Set CACHE_LOCATION to a memcached server so that all worker processes
+# share cached data and per-user data versions; sharding requires it
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+if os.environ.get("CACHE_LOCATION"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+        "LOCATION": os.environ["CACHE_LOCATION"],
     }
+
+# Seconds to keep computed recipe analytics, rendered recipe details and
+# pantry indexes
+RECIPE_ANALYTICS_CACHE_SECONDS = 24 * 60 * 60
+RECIPE_DETAIL_CACHE_SECONDS = 24 * 60 * 60
+RECIPE_PANTRY_CACHE_SECONDS = 24 * 60 * 60
+
+# Users whose tag and ingredient names each process keeps in memory for
+# autocomplete; 0 queries the database on every lookup
+AUTOCOMPLETE_CACHE_USERS = int(os.environ.get("AUTOCOMPLETE_CACHE_USERS", 0))
+
+
+# Throttling
+# Token-bucket rates per scope: "<scope>" limits each set of credentials and
+# "<scope>_ip" each client address. Buckets are kept in the default cache, or
+# with THROTTLE_BACKEND=shm in a memory-mapped file shared by the workers of
+# one host
+
+REST_FRAMEWORK = {
+    "DEFAULT_THROTTLE_RATES": {
+        "auth": os.environ.get("THROTTLE_AUTH_RATE", "20/min"),
+        "auth_ip": os.environ.get("THROTTLE_AUTH_IP_RATE", "100/min"),
+        "signup": os.environ.get("THROTTLE_SIGNUP_RATE", "20/min"),
+        "signup_ip": os.environ.get("THROTTLE_SIGNUP_IP_RATE", "100/min"),
+        "upload": os.environ.get("THROTTLE_UPLOAD_RATE", "30/min"),
+        "upload_ip": os.environ.get("THROTTLE_UPLOAD_IP_RATE", "120/min"),
+        "write": os.environ.get("THROTTLE_WRITE_RATE", "300/min"),
+        "write_ip": os.environ.get("THROTTLE_WRITE_IP_RATE", "1200/min"),
+    },
 }
+THROTTLE_BACKEND = os.environ.get("THROTTLE_BACKEND", "cache")
+THROTTLE_SHM_PATH = os.environ.get(
+    "THROTTLE_SHM_PATH", "/dev/shm/recipe-app-throttle"
+)
+
+
+# Signed tokens
+# Lifetimes in seconds of signed access tokens, which are verified without a
+# database lookup, and of the refresh tokens used to obtain new ones
+
+ACCESS_TOKEN_LIFETIME = int(os.environ.get("ACCESS_TOKEN_LIFETIME", 5 * 60))
+REFRESH_TOKEN_LIFETIME = int(
+    os.environ.get("REFRESH_TOKEN_LIFETIME", 30 * 24 * 60 * 60)
+)
 
 
 # Password validation
@@ -111,6 +241,46 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# PASSWORD_HASHER selects the hasher for new passwords: argon2, scrypt or
+# pbkdf2. Hashes made with another hasher, or with other cost parameters,
+# are upgraded on the next successful login. Use the bench_hashers command
+# to pick parameters for a target login rate per core.
+
+PASSWORD_HASHER = os.environ.get("PASSWORD_HASHER", "argon2")
+PASSWORD_HASHER_CLASSES = {
+    "argon2": "core.hashers.Argon2PasswordHasher",
+    "scrypt": "core.hashers.ScryptPasswordHasher",
+    "pbkdf2": "core.hashers.PBKDF2PasswordHasher",
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    hasher
+    for name, hasher in PASSWORD_HASHER_CLASSES.items()
+    if name != PASSWORD_HASHER
+]
+# Memory cost in KiB
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", 2))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", 19456))
+ARGON2_PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", 1))
+SCRYPT_WORK_FACTOR = int(os.environ.get("SCRYPT_WORK_FACTOR", 2**14))
+SCRYPT_BLOCK_SIZE = int(os.environ.get("SCRYPT_BLOCK_SIZE", 8))
+SCRYPT_PARALLELISM = int(os.environ.get("SCRYPT_PARALLELISM", 1))
+PBKDF2_ITERATIONS = int(os.environ.get("PBKDF2_ITERATIONS", 260000))
+
+
+# Background jobs
+# Jobs are run by the run_worker command. A claimed job that is not finished
+# within the lease, e.g. because its worker died, is claimed again; failed
+# attempts are retried with exponential backoff, capped at the max delay
+
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", 600))
+JOB_RETRY_BASE_DELAY = float(os.environ.get("JOB_RETRY_BASE_DELAY", 2))
+JOB_RETRY_MAX_DELAY = float(os.environ.get("JOB_RETRY_MAX_DELAY", 3600))
+# Tag or ingredient changes affecting more recipes than this refresh the
+# recipes' snapshots in a job rather than in the request
+SNAPSHOT_INLINE_RECIPES = int(os.environ.get("SNAPSHOT_INLINE_RECIPES", 200))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -140,3 +310,17 @@ STATIC_ROOT = "/vol/web/static"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "core.User"
+
+
+# Per-request profiling
+# Staff users can profile a request with an `X-Profile: 1` header or a
+# `?profile=1` query parameter; a random fraction of all requests can also be
+# profiled in the background
+
+PROFILING_ENABLED = bool(int(os.environ.get("PROFILING_ENABLED", 0)))
+PROFILING_DIR = os.environ.get("PROFILING_DIR", "/vol/web/profiles")
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0))
+PROFILING_TRACEMALLOC_FRAMES = 10
+PROFILING_TOP_ALLOCATIONS = 25
+# Only the most recent profiles are kept
+PROFILING_MAX_PROFILES = int(os.environ.get("PROFILING_MAX_PROFILES", 200))
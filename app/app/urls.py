@@ -13,13 +13,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import ProfileView, metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/user/", include("user.urls")),
     path("api/recipe/", include("recipe.urls")),
+    path("metrics", metrics_view, name="metrics"),
+    path(
+        "api/profiles/<uuid:profile_id>/",
+        ProfileView.as_view(),
+        name="profile",
+    ),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
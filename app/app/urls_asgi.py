@@ -0,0 +1,41 @@
+"""URL configuration used when serving over ASGI
+
+The read-heavy endpoints are routed to async wrappers around their regular
+views; every other route falls through to `app.urls`.
+"""
+
+from django.urls import include, path, re_path
+
+from app import urls
+from core.async_views import async_view
+from recipe.urls import router as recipe_router
+from user import views as user_views
+
+ASYNC_RECIPE_ROUTES = (
+    "recipe-list",
+    "recipe-detail",
+    "tag-list",
+    "ingredient-list",
+)
+
+async_recipe_patterns = [
+    re_path(
+        str(pattern.pattern), async_view(pattern.callback), name=pattern.name
+    )
+    for pattern in recipe_router.urls
+    if pattern.name in ASYNC_RECIPE_ROUTES
+]
+async_user_patterns = [
+    path("me/", async_view(user_views.ManageUserView.as_view()), name="me"),
+]
+
+urlpatterns = [
+    path(
+        "api/recipe/",
+        include((async_recipe_patterns, "recipe"), namespace="async-recipe"),
+    ),
+    path(
+        "api/user/",
+        include((async_user_patterns, "user"), namespace="async-user"),
+    ),
+] + urls.urlpatterns
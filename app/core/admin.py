@@ -1,8 +1,17 @@
+import functools
+import heapq
+import itertools
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db.models import F
+from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
 
-from core import models
+from core import models, sharding
 
 
 class UserAdmin(BaseUserAdmin):
@@ -37,7 +46,176 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+def _compare_keys(descending, a, b):
+    """Compare two ordering keys, nulls first, like a database would"""
+    for x, y, reverse in zip(a, b, descending):
+        if x == y:
+            continue
+        if x is None or y is None:
+            result = -1 if x is None else 1
+        else:
+            result = -1 if x < y else 1
+        return -result if reverse else result
+    return 0
+
+
+class ShardedPaginator(Paginator):
+    """Paginate an ordered queryset across every shard
+
+    Each shard returns its first rows up to the end of the page, which are
+    merged on the queryset's ordering, so later pages cost more.
+    """
+
+    @cached_property
+    def count(self):
+        return sum(
+            self.object_list.using(alias).count()
+            for alias in sharding.shard_aliases()
+        )
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        return self._get_page(self._merged(top)[bottom:top], number, self)
+
+    def _merged(self, top):
+        """Return the first ``top`` rows of all shards in order"""
+        ordering = [
+            field
+            for field in self.object_list.query.order_by
+            if isinstance(field, str)
+        ]
+        keys = {
+            f"_shard_order_{index}": F(field.lstrip("-"))
+            for index, field in enumerate(ordering)
+        }
+        key = functools.cmp_to_key(
+            functools.partial(
+                _compare_keys, [field.startswith("-") for field in ordering]
+            )
+        )
+        rows = [
+            self.object_list.using(alias).annotate(**keys)[:top]
+            for alias in sharding.shard_aliases()
+        ]
+        merged = heapq.merge(
+            *rows, key=lambda row: key([getattr(row, k) for k in keys])
+        )
+        return list(itertools.islice(merged, top))
+
+
+class ShardedChangeList(ChangeList):
+    """Change list showing the rows of every shard"""
+
+    def get_results(self, request):
+        super().get_results(request)
+        if not self.multi_page:
+            self.result_list = self.paginator.page(1).object_list
+
+
+class ShardedModelAdmin(admin.ModelAdmin):
+    """Admin for a sharded model, listing and editing rows on any shard
+
+    Rows are added through the API rather than here, since the shard of a
+    new row depends on its owner.
+    """
+
+    paginator = ShardedPaginator
+    show_full_result_count = False
+    list_max_show_all = 0
+    actions = None
+
+    def get_changelist(self, request, **kwargs):
+        return ShardedChangeList
+
+    def has_add_permission(self, request):
+        return not sharding.is_enabled() and super().has_add_permission(
+            request
+        )
+
+    def _shard_of(self, object_id):
+        """Return the shard holding a row, if any"""
+        for alias in sharding.shard_aliases():
+            if (
+                self.model._default_manager.using(alias)
+                .filter(pk=object_id)
+                .exists()
+            ):
+                return alias
+        return None
+
+    def _on_shard_of(self, object_id, view, *args, **kwargs):
+        """Call an object view with queries routed to the object's shard"""
+        alias = None
+        if object_id is not None:
+            try:
+                alias = self._shard_of(object_id)
+            except (ValueError, TypeError):
+                pass
+        if alias is None:
+            return view(*args, **kwargs)
+        with sharding.use_shard(alias):
+            return view(*args, **kwargs)
+
+    def changeform_view(self, request, object_id=None, *args, **kwargs):
+        return self._on_shard_of(
+            object_id,
+            super().changeform_view,
+            request,
+            object_id,
+            *args,
+            **kwargs,
+        )
+
+    def delete_view(self, request, object_id, *args, **kwargs):
+        return self._on_shard_of(
+            object_id, super().delete_view, request, object_id, *args, **kwargs
+        )
+
+    def history_view(self, request, object_id, *args, **kwargs):
+        return self._on_shard_of(
+            object_id,
+            super().history_view,
+            request,
+            object_id,
+            *args,
+            **kwargs,
+        )
+
+
+class CatalogNamedForm(forms.ModelForm):
+    """Form editing the name of a tag or ingredient through the catalog"""
+
+    name = forms.CharField(max_length=255)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.initial.setdefault("name", self.instance.name)
+
+    def save(self, commit=True):
+        self.instance.name = self.cleaned_data["name"]
+        return super().save(commit)
+
+
+class CatalogNamedAdmin(ShardedModelAdmin):
+    form = CatalogNamedForm
+    list_display = ["name", "user"]
+
+
+class UserShardAdmin(admin.ModelAdmin):
+    list_display = ["user", "alias"]
+    list_filter = ["alias"]
+    search_fields = ["user__email"]
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
-admin.site.register(models.Recipe)
+admin.site.register(models.UserShard, UserShardAdmin)
+admin.site.register(models.CatalogName, ShardedModelAdmin)
+admin.site.register(models.Tag, CatalogNamedAdmin)
+admin.site.register(models.Ingredient, CatalogNamedAdmin)
+admin.site.register(models.Recipe, ShardedModelAdmin)
+admin.site.register(models.Job)
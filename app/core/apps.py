@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.core.signals import request_started
+from django.db.models.signals import post_migrate
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from core import sharding, signals
+        from core.db.health import check_connection_health
+
+        request_started.connect(check_connection_health)
+        post_migrate.connect(sharding.reserve_id_range, sender=self)
+        checks.register(sharding.check_directory_cache, checks.Tags.caches)
@@ -0,0 +1,94 @@
+"""Async adapters for serving DRF views under ASGI
+
+Django runs sync views under ASGI one request per thread. The adapters here
+hand the whole view (authentication, ORM access and rendering) to a bounded
+thread pool instead, so the event loop keeps accepting connections while
+requests wait on the database and the number of concurrent database
+connections stays capped at ``ASYNC_ORM_THREADS``. Middleware that
+instruments requests registers a `pool_hook()` to run around the work a
+request hands to the pool, as that work happens in another thread.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+_pool_hooks = contextvars.ContextVar("orm_pool_hooks", default=())
+
+
+def get_orm_executor():
+    """Return the process-wide thread pool used for ORM access"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_ORM_THREADS,
+                thread_name_prefix="orm",
+            )
+    return _executor
+
+
+@contextmanager
+def pool_hook(hook):
+    """Enter the context manager hook() around the request's pooled work"""
+    token = _pool_hooks.set((*_pool_hooks.get(), hook))
+    try:
+        yield
+    finally:
+        _pool_hooks.reset(token)
+
+
+def _call_with_connections(func, *args, **kwargs):
+    """Call func, recycling stale connections like a request cycle would"""
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            for hook in _pool_hooks.get():
+                stack.enter_context(hook())
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_orm_pool(func, *args, **kwargs):
+    """Run a blocking function in the ORM thread pool
+
+    The function runs in a copy of the caller's context, so per-request
+    context variables (such as the database selected for reads) apply.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_orm_executor(),
+        functools.partial(
+            context.run, _call_with_connections, func, *args, **kwargs
+        ),
+    )
+
+
+def _render_view(view, request, *args, **kwargs):
+    """Call a sync view and render its response"""
+    response = view(request, *args, **kwargs)
+    if hasattr(response, "render") and callable(response.render):
+        response = response.render()
+    return response
+
+
+def async_view(view):
+    """Wrap a sync view so it is served from the ORM thread pool"""
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run_in_orm_pool(
+            _render_view, view, request, *args, **kwargs
+        )
+
+    return wrapper
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.utils.translation import gettext_lazy as _
+from rest_framework import authentication, exceptions
+
+from core import tokens
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """Authenticate requests carrying a signed access token
+
+    Clients send ``Authorization: Bearer <token>``. The user is built from
+    the token without a query; its other fields load on first access.
+    Revocation and deactivation are checked when the token is refreshed, so
+    they reach access tokens within ``ACCESS_TOKEN_LIFETIME`` seconds.
+    """
+
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        """Return the user and token payload, or None for other schemes"""
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            msg = _("Invalid token header.")
+            raise exceptions.AuthenticationFailed(msg)
+        try:
+            payload = tokens.read_access_token(auth[1].decode())
+        except (signing.BadSignature, UnicodeError):
+            msg = _("Invalid or expired token.")
+            raise exceptions.AuthenticationFailed(msg)
+        user = get_user_model().from_db(None, ["id"], [payload["uid"]])
+        return user, payload
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,52 @@
+"""Helpers shared by the benchmark management commands"""
+
+import statistics
+import time
+
+
+def percentile(samples, fraction):
+    """Return the given percentile (0 to 1) of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Summarize a list of latencies (in seconds) as milliseconds"""
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.mean(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p90_ms": percentile(samples, 0.90) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "max_ms": max(samples, default=0.0) * 1000,
+    }
+
+
+def format_summary(label, summary):
+    """Format a latency summary as a single report line"""
+    return (
+        f"{label}: n={summary['count']} "
+        f"mean={summary['mean_ms']:.2f}ms "
+        f"p50={summary['p50_ms']:.2f}ms "
+        f"p90={summary['p90_ms']:.2f}ms "
+        f"p99={summary['p99_ms']:.2f}ms "
+        f"max={summary['max_ms']:.2f}ms"
+    )
+
+
+def time_calls(func, iterations, warmup=0, clock=time.perf_counter):
+    """Call func repeatedly and return the latency of each call
+
+    Pass ``clock=time.thread_time`` to measure CPU time instead.
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = clock()
+        func()
+        samples.append(clock() - start)
+    return samples
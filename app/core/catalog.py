@@ -0,0 +1,74 @@
+"""Shared catalog of tag and ingredient names
+
+Tags and ingredients belong to a user, so a common name like "salt" used
+to be stored once per user. Names are instead interned in a single
+CatalogName row that the per-user rows reference, so the vocabulary is
+stored and indexed once however many users share it, and per-user rows
+only hold the reference. Names are stored exactly as written. Each entry
+also carries a key for matching names: Unicode NFC, surrounding whitespace
+stripped, inner runs of whitespace collapsed and lower-cased, so "Salt"
+and "salt " have entries of their own but share a key.
+
+Names are interned as tags and ingredients are saved (see core.signals)
+or bulk-created (see ``CatalogNamedQuerySet``), with one query when the
+name is in the catalog already. ``name`` still reads, filters and orders
+as before, through the catalog entry (see ``CatalogNamedManager``).
+"""
+
+import re
+import unicodedata
+
+from django.db import DEFAULT_DB_ALIAS
+
+from core.models import CatalogName, Ingredient, Tag
+
+MODELS = (Tag, Ingredient)
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(name):
+    """Return the normalized form of a name"""
+    return WHITESPACE.sub(" ", unicodedata.normalize("NFC", name)).strip()
+
+
+def key(name):
+    """Return the matching key of a name"""
+    return normalize(name).lower()
+
+
+def intern(names, using=DEFAULT_DB_ALIAS):
+    """Return the catalog IDs of names, keyed by name
+
+    Missing entries are inserted with conflicts ignored, so concurrent
+    callers interning the same name end up with the same entry.
+    """
+    values = set(names)
+    if not values:
+        return {}
+    entries = CatalogName.objects.using(using)
+    ids = dict(entries.filter(value__in=values).values_list("value", "id"))
+    missing = values.difference(ids)
+    if missing:
+        entries.bulk_create(
+            [CatalogName(value=value, key=key(value)) for value in missing],
+            ignore_conflicts=True,
+        )
+        ids.update(
+            entries.filter(value__in=missing).values_list("value", "id")
+        )
+    return ids
+
+
+def prune(using=DEFAULT_DB_ALIAS):
+    """Delete the catalog entries no longer referenced by any row
+
+    Returns the number of entries deleted. A name being interned while
+    entries are pruned may lose its entry before the row referencing it is
+    saved, so prune when names are not being written heavily.
+    """
+    deleted, _ = (
+        CatalogName.objects.using(using)
+        .filter(tags__isnull=True, ingredients__isnull=True)
+        .delete()
+    )
+    return deleted
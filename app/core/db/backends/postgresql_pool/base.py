@@ -0,0 +1,59 @@
+"""PostgreSQL backend borrowing its connections from an in-process pool
+
+Configure the pool through a ``POOL`` entry in the database settings, e.g.
+``{"MIN_SIZE": 2, "MAX_SIZE": 20, "TIMEOUT": 5}``, and keep
+``CONN_MAX_AGE`` at 0 so connections go back to the pool after each request.
+"""
+
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from core.db.pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _reset_connection(connection):
+    """Roll back leftover work so a connection can be handed out again"""
+    if connection.closed:
+        return False
+    status = connection.get_transaction_status()
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_pool(self, conn_params):
+        """Return the pool shared by every thread using this alias"""
+        with _pools_lock:
+            if self.alias not in _pools:
+                options = self.settings_dict.get("POOL", {})
+                _pools[self.alias] = ConnectionPool(
+                    connect=lambda: super(
+                        DatabaseWrapper, self
+                    ).get_new_connection(conn_params),
+                    reset=_reset_connection,
+                    min_size=options.get("MIN_SIZE", 0),
+                    max_size=options.get("MAX_SIZE", 10),
+                    timeout=options.get("TIMEOUT", 5.0),
+                    name=self.alias,
+                )
+            return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool(conn_params).acquire()
+        self.isolation_level = self.settings_dict["OPTIONS"].get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                _pools[self.alias].release(self.connection)
@@ -0,0 +1,36 @@
+import time
+from weakref import WeakKeyDictionary
+
+from django.conf import settings
+from django.db import connections
+
+# When each connection wrapper's connection was last found usable
+_checked_at = WeakKeyDictionary()
+
+
+def check_connection_health(**kwargs):
+    """Close persistent connections the server dropped between requests
+
+    Without this, the first query of a request served by a worker whose
+    connection was killed (failover, idle timeout, restart) fails instead of
+    transparently reconnecting. A connection is checked at most once per
+    ``DB_CONN_HEALTH_CHECK_INTERVAL`` so busy workers don't pay a round trip
+    on every request.
+    """
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        checked_at = _checked_at.get(connection)
+        if (
+            checked_at is not None
+            and now - checked_at < settings.DB_CONN_HEALTH_CHECK_INTERVAL
+        ):
+            continue
+        if connection.is_usable():
+            _checked_at[connection] = now
+        else:
+            connection.close()
+            _checked_at.pop(connection, None)
@@ -0,0 +1,146 @@
+"""A small thread-safe pool of DB-API connections"""
+
+import collections
+import threading
+import time
+
+from django.db.utils import OperationalError
+
+from core import metrics
+
+
+class PoolTimeout(OperationalError):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class ConnectionPool:
+    """Hand out at most max_size connections, reusing released ones
+
+    ``connect`` opens a new connection and ``reset`` prepares a released one
+    for reuse, returning False when the connection is broken and must be
+    discarded instead.
+    """
+
+    def __init__(
+        self,
+        connect,
+        reset=lambda connection: True,
+        min_size=0,
+        max_size=10,
+        timeout=5.0,
+        name="default",
+    ):
+        if not 0 <= min_size <= max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min <= max")
+        self.connect = connect
+        self.reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.name = name
+        self._idle = collections.deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self._filled = False
+
+    @property
+    def size(self):
+        """Number of open connections, idle or in use"""
+        return self._size
+
+    @property
+    def idle(self):
+        """Number of connections waiting to be acquired"""
+        return len(self._idle)
+
+    def _open(self):
+        """Open a connection for a slot already reserved in self._size"""
+        try:
+            return self.connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+                self._update_metrics()
+            raise
+
+    def _fill(self):
+        """Open connections until the pool holds min_size of them"""
+        self._filled = True
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            connection = self._open()
+            with self._condition:
+                self._idle.append(connection)
+                self._condition.notify()
+                self._update_metrics()
+
+    def acquire(self):
+        """Return an idle connection, opening or waiting for one if needed"""
+        if not self._filled:
+            self._fill()
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._condition:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    metrics.DB_POOL_TIMEOUTS.labels(self.name).inc()
+                    raise PoolTimeout(
+                        f"No connection available in pool {self.name!r} "
+                        f"after {self.timeout}s"
+                    )
+                self._condition.wait(remaining)
+            if self._idle:
+                connection = self._idle.pop()
+            else:
+                connection = None
+                self._size += 1
+            self._update_metrics()
+        if connection is None:
+            connection = self._open()
+        metrics.DB_POOL_WAIT.labels(self.name).observe(
+            time.monotonic() - start
+        )
+        return connection
+
+    def release(self, connection):
+        """Return a connection to the pool, discarding it if broken"""
+        try:
+            reusable = self.reset(connection)
+        except Exception:
+            reusable = False
+        with self._condition:
+            if reusable:
+                self._idle.append(connection)
+            else:
+                self._size -= 1
+            self._condition.notify()
+            self._update_metrics()
+        if not reusable:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def close(self):
+        """Close every idle connection"""
+        with self._condition:
+            connections = list(self._idle)
+            self._idle.clear()
+            self._size -= len(connections)
+            self._filled = False
+            self._update_metrics()
+        for connection in connections:
+            connection.close()
+
+    def _update_metrics(self):
+        """Publish the pool occupancy; called with the condition held"""
+        idle = len(self._idle)
+        metrics.DB_POOL_CONNECTIONS.labels(self.name, "idle").set(idle)
+        metrics.DB_POOL_CONNECTIONS.labels(self.name, "in_use").set(
+            self._size - idle
+        )
@@ -0,0 +1,114 @@
+"""Password hashers with cost parameters taken from settings
+
+Django's check_password rehashes a password on the next successful login
+whenever it was stored with a different hasher than the preferred one, or
+with different cost parameters, so changing PASSWORD_HASHER or the
+parameters below upgrades existing hashes transparently.
+"""
+
+import base64
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_noop as _
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2 hasher using the ARGON2_* settings"""
+
+    def __init__(self, time_cost=None, memory_cost=None, parallelism=None):
+        self.time_cost = time_cost or settings.ARGON2_TIME_COST
+        self.memory_cost = memory_cost or settings.ARGON2_MEMORY_COST
+        self.parallelism = parallelism or settings.ARGON2_PARALLELISM
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 hasher using the PBKDF2_ITERATIONS setting"""
+
+    def __init__(self, iterations=None):
+        self.iterations = iterations or settings.PBKDF2_ITERATIONS
+
+
+class ScryptPasswordHasher(hashers.BasePasswordHasher):
+    """scrypt hasher using the SCRYPT_* settings
+
+    Hashes use the same format as the scrypt hasher of later Django
+    releases, so they stay valid after upgrading.
+    """
+
+    algorithm = "scrypt"
+
+    def __init__(self, work_factor=None, block_size=None, parallelism=None):
+        self.work_factor = work_factor or settings.SCRYPT_WORK_FACTOR
+        self.block_size = block_size or settings.SCRYPT_BLOCK_SIZE
+        self.parallelism = parallelism or settings.SCRYPT_PARALLELISM
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        assert password is not None
+        assert salt and "$" not in salt
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=n,
+            r=r,
+            p=p,
+            # Twice the memory scrypt needs, which is 128 * n * r * p bytes
+            maxmem=256 * n * r * p,
+            dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode("ascii").strip()
+        return "%s$%d$%s$%d$%d$%s" % (self.algorithm, n, salt, r, p, hash_)
+
+    def decode(self, encoded):
+        algorithm, work_factor, salt, block_size, parallelism, hash_ = (
+            encoded.split("$", 5)
+        )
+        assert algorithm == self.algorithm
+        return {
+            "algorithm": algorithm,
+            "work_factor": int(work_factor),
+            "salt": salt,
+            "block_size": int(block_size),
+            "parallelism": int(parallelism),
+            "hash": hash_,
+        }
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = self.encode(
+            password,
+            decoded["salt"],
+            decoded["work_factor"],
+            decoded["block_size"],
+            decoded["parallelism"],
+        )
+        return constant_time_compare(encoded, encoded_2)
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return {
+            _("algorithm"): decoded["algorithm"],
+            _("work factor"): decoded["work_factor"],
+            _("block size"): decoded["block_size"],
+            _("parallelism"): decoded["parallelism"],
+            _("salt"): hashers.mask_hash(decoded["salt"]),
+            _("hash"): hashers.mask_hash(decoded["hash"]),
+        }
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return (
+            decoded["work_factor"] != self.work_factor
+            or decoded["block_size"] != self.block_size
+            or decoded["parallelism"] != self.parallelism
+            or hashers.must_update_salt(decoded["salt"], self.salt_entropy)
+        )
+
+    def harden_runtime(self, password, encoded):
+        # As for Argon2, there is no sensible way to make up the difference
+        pass
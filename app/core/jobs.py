@@ -0,0 +1,215 @@
+"""Database-backed background jobs
+
+Functions decorated with ``@task`` can be deferred with ``enqueue``, which
+stores a Job row in the same transaction as the caller's other writes.
+``run_worker`` claims due jobs in batches and runs them in a thread or
+process pool.
+
+On PostgreSQL jobs are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED``,
+so concurrent workers never wait on each other. Databases without it, such
+as SQLite in tests, fall back to claiming rows with a conditional UPDATE;
+either way a job is only run under the claim token that was written to it.
+A claim is a lease: if a worker dies, its jobs become claimable again once
+``JOB_LEASE_SECONDS`` have passed, and fail instead if that was their last
+attempt.
+"""
+
+import datetime
+import random
+import time
+import traceback
+import uuid
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    IntegrityError,
+    close_old_connections,
+    connections,
+    transaction,
+)
+from django.db.models import Case, F, Q, TextField, Value, When
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from core import metrics
+from core.models import Job
+
+_tasks = {}
+LEASE_EXPIRED_ERROR = "Lease expired during the last attempt"
+
+
+def task(func):
+    """Register a function so that it can be run as a job"""
+    func.task_name = f"{func.__module__}.{func.__name__}"
+    _tasks[func.task_name] = func
+    return func
+
+
+def discover_tasks():
+    """Import the tasks module of every installed app"""
+    autodiscover_modules("tasks")
+
+
+def enqueue(
+    func,
+    kwargs=None,
+    *,
+    dedup_key=None,
+    delay=0,
+    max_attempts=5,
+    using=DEFAULT_DB_ALIAS,
+):
+    """Defer a call of a task with JSON-serializable keyword arguments
+
+    While a job with the same ``dedup_key`` is still queued, that job is
+    returned instead of queueing another one.
+    """
+    name = func if isinstance(func, str) else func.task_name
+    job = Job(
+        task=name,
+        kwargs=kwargs or {},
+        dedup_key=dedup_key,
+        run_at=timezone.now() + datetime.timedelta(seconds=delay),
+        max_attempts=max_attempts,
+    )
+    if dedup_key is None:
+        job.save(using=using)
+        metrics.JOBS_ENQUEUED.labels(name).inc()
+        return job
+    while True:
+        try:
+            with transaction.atomic(using=using):
+                job.save(using=using)
+        except IntegrityError:
+            existing = (
+                Job.objects.using(using)
+                .filter(dedup_key=dedup_key, status=Job.QUEUED)
+                .first()
+            )
+            if existing is not None:
+                metrics.JOBS_DEDUPLICATED.labels(name).inc()
+                return existing
+            # The queued job was claimed in the meantime; try again
+            job.pk = None
+        else:
+            metrics.JOBS_ENQUEUED.labels(name).inc()
+            return job
+
+
+def claim_jobs(limit, using=DEFAULT_DB_ALIAS):
+    """Claim up to ``limit`` due jobs and return them"""
+    now = timezone.now()
+    claimable = Q(status=Job.QUEUED, run_at__lte=now) | Q(
+        status=Job.RUNNING, locked_until__lt=now
+    )
+    # Conditions of the UPDATE see the rows as they were before it
+    exhausted = Q(status=Job.RUNNING, attempts__gte=F("max_attempts"))
+    token = uuid.uuid4().hex
+    skip_locked = connections[using].features.has_select_for_update_skip_locked
+    # Without row locks the UPDATE alone decides the claim; SQLite would
+    # refuse to upgrade a read transaction while another worker writes
+    with transaction.atomic(using=using) if skip_locked else nullcontext():
+        candidates = (
+            Job.objects.using(using)
+            .filter(claimable)
+            .order_by("run_at")
+            .values_list("id", flat=True)
+        )
+        if skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates[:limit])
+        if not ids:
+            return []
+        # Rows claimed by another worker since the SELECT no longer match,
+        # and lapsed jobs without attempts left are failed rather than run
+        Job.objects.using(using).filter(claimable, id__in=ids).update(
+            status=Case(
+                When(exhausted, then=Value(Job.FAILED)),
+                default=Value(Job.RUNNING),
+            ),
+            claim=Case(When(exhausted, then=Value("")), default=Value(token)),
+            attempts=Case(
+                When(exhausted, then=F("attempts")),
+                default=F("attempts") + 1,
+            ),
+            locked_until=Case(
+                When(exhausted, then=None),
+                default=Value(
+                    now
+                    + datetime.timedelta(seconds=settings.JOB_LEASE_SECONDS)
+                ),
+            ),
+            finished=Case(
+                When(exhausted, then=Value(now)), default=F("finished")
+            ),
+            last_error=Case(
+                When(
+                    exhausted,
+                    then=Value(LEASE_EXPIRED_ERROR, output_field=TextField()),
+                ),
+                default=F("last_error"),
+            ),
+        )
+    return list(Job.objects.using(using).filter(claim=token))
+
+
+def retry_delay(attempts):
+    """Return the jittered backoff before retrying a failed attempt"""
+    delay = min(
+        settings.JOB_RETRY_MAX_DELAY,
+        settings.JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+    )
+    return delay * random.uniform(0.5, 1)
+
+
+def run_job(job, using=DEFAULT_DB_ALIAS):
+    """Run a claimed job and record its outcome; return the new status"""
+    close_old_connections()
+    metrics.JOB_QUEUE_DELAY.labels(job.task).observe(
+        max((timezone.now() - job.run_at).total_seconds(), 0)
+    )
+    if job.task not in _tasks:
+        discover_tasks()
+    start = time.perf_counter()
+    try:
+        func = _tasks.get(job.task)
+        if func is None:
+            raise LookupError(f"Unknown task {job.task}")
+        func(**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts and job.task in _tasks:
+            status = "retry"
+            changes = {
+                "status": Job.QUEUED,
+                "run_at": timezone.now()
+                + datetime.timedelta(seconds=retry_delay(job.attempts)),
+            }
+        else:
+            status = Job.FAILED
+            changes = {"status": Job.FAILED, "finished": timezone.now()}
+        changes["last_error"] = error
+    else:
+        status = Job.DONE
+        changes = {"status": Job.DONE, "finished": timezone.now()}
+    metrics.JOB_DURATION.labels(job.task).observe(time.perf_counter() - start)
+    # A job whose lease lapsed may have been claimed again; leave it be
+    row = Job.objects.using(using).filter(id=job.id, claim=job.claim)
+    try:
+        with transaction.atomic(using=using):
+            row.update(claim="", locked_until=None, **changes)
+    except IntegrityError:
+        # A duplicate was queued while the job ran; it will do the retry
+        status = "merged"
+        row.update(
+            claim="",
+            locked_until=None,
+            status=Job.FAILED,
+            finished=timezone.now(),
+            last_error=changes["last_error"],
+        )
+    metrics.JOBS_COMPLETED.labels(job.task, status).inc()
+    close_old_connections()
+    return status
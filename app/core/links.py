@@ -0,0 +1,96 @@
+"""Incremental changes to the tag and ingredient links of recipes
+
+Unlike ``recipe.tags.set()``, which diffs the full list of a single recipe,
+these helpers take only the IDs to add and remove, for any number of
+recipes, and write the through table with one INSERT and one DELETE.
+``m2m_changed`` is sent for every recipe whose links change, as the related
+manager would, so receivers such as the version bumps in core.signals stay
+in sync. The signals are flagged with ``batch=True``, and the snapshots and
+similarity buckets of all the changed recipes are then rebuilt at once
+rather than one recipe at a time.
+"""
+
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import m2m_changed
+
+from core import similarity
+from core.models import Recipe
+from core.snapshots import refresh_snapshots
+
+
+def _send(field, action, recipes, pk_sets, using):
+    """Send m2m_changed for each recipe with a non-empty pk set"""
+    for recipe in recipes:
+        if pk_sets.get(recipe.pk):
+            m2m_changed.send(
+                sender=field.remote_field.through,
+                instance=recipe,
+                action=action,
+                reverse=False,
+                model=field.related_model,
+                pk_set=pk_sets[recipe.pk],
+                using=using,
+                batch=True,
+            )
+
+
+def change_links(recipes, relation, add=(), remove=(), using=DEFAULT_DB_ALIAS):
+    """Link and unlink tags or ingredients to and from recipes
+
+    ``recipes`` are Recipe instances, ``relation`` is ``"tags"`` or
+    ``"ingredients"``, and ``add``/``remove`` are IDs of the related
+    objects. Return the IDs actually added and removed per recipe ID.
+    """
+    field = Recipe._meta.get_field(relation)
+    through = field.remote_field.through
+    source = f"{field.m2m_field_name()}_id"
+    target = f"{field.m2m_reverse_field_name()}_id"
+    recipes = list(recipes)
+    add, remove = set(add), set(remove)
+    existing = set(
+        through.objects.using(using)
+        .filter(
+            **{
+                f"{source}__in": [recipe.pk for recipe in recipes],
+                f"{target}__in": add | remove,
+            }
+        )
+        .values_list(source, target)
+    )
+    added, removed = defaultdict(set), defaultdict(set)
+    for recipe in recipes:
+        for target_id in add:
+            if (recipe.pk, target_id) not in existing:
+                added[recipe.pk].add(target_id)
+        for target_id in remove:
+            if (recipe.pk, target_id) in existing:
+                removed[recipe.pk].add(target_id)
+
+    with transaction.atomic(using=using, savepoint=False):
+        if removed:
+            _send(field, "pre_remove", recipes, removed, using)
+            through.objects.using(using).filter(
+                **{
+                    f"{source}__in": list(removed),
+                    f"{target}__in": remove,
+                }
+            ).delete()
+            _send(field, "post_remove", recipes, removed, using)
+        if added:
+            _send(field, "pre_add", recipes, added, using)
+            through.objects.using(using).bulk_create(
+                [
+                    through(**{source: recipe_id, target: target_id})
+                    for recipe_id, target_ids in added.items()
+                    for target_id in target_ids
+                ],
+                ignore_conflicts=True,
+            )
+            _send(field, "post_add", recipes, added, using)
+        changed = added.keys() | removed.keys()
+        if changed:
+            refresh_snapshots(changed, (relation,), using)
+            similarity.index_recipes(changed, using)
+    return added, removed
@@ -0,0 +1,110 @@
+import random
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max, Min, Q
+
+from core.benchmarks import format_summary, summarize, time_calls
+from core.models import Recipe, Tag
+from recipe.analytics import PERCENTILES, compute_analytics
+
+
+def orm_distribution(queryset, field, bins):
+    """Compute a histogram and percentiles with database aggregation"""
+    bounds = queryset.aggregate(low=Min(field), high=Max(field))
+    total = queryset.count()
+    if not total:
+        return
+    low, high = float(bounds["low"]), float(bounds["high"])
+    width = (high - low) / bins or 1
+    edges = [low + width * i for i in range(bins + 1)]
+    queryset.aggregate(
+        **{
+            f"bin{i}": Count(
+                "id",
+                filter=Q(**{f"{field}__gte": edges[i]})
+                & Q(
+                    **{
+                        (
+                            f"{field}__lte"
+                            if i == bins - 1
+                            else f"{field}__lt"
+                        ): edges[i + 1]
+                    }
+                ),
+            )
+            for i in range(bins)
+        }
+    )
+    for p in PERCENTILES:
+        index = min(total - 1, int(p / 100 * total))
+        queryset.order_by(field).values_list(field, flat=True)[index]
+
+
+def orm_analytics(user_id, bins):
+    """Compute the same distributions as recipe.analytics with the ORM"""
+    recipes = Recipe.objects.filter(user_id=user_id)
+    for field in ["time_minutes", "price"]:
+        orm_distribution(recipes, field, bins)
+    for tag_id in Tag.objects.filter(user_id=user_id).values_list(
+        "id", flat=True
+    ):
+        for field in ["time_minutes", "price"]:
+            orm_distribution(recipes.filter(tags__id=tag_id), field, bins)
+
+
+class Command(BaseCommand):
+    """Django command to compare NumPy and ORM analytics"""
+
+    help = "Benchmark recipe analytics against pure ORM aggregation"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=5000)
+        parser.add_argument("--tags", type=int, default=20)
+        parser.add_argument("--bins", type=int, default=10)
+        parser.add_argument("--iterations", type=int, default=10)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            email=f"bench-{uuid.uuid4().hex}@example.com"
+        )
+        try:
+            self._populate(user, options)
+            for label, func in [
+                ("numpy", compute_analytics),
+                ("orm", orm_analytics),
+            ]:
+                samples = time_calls(
+                    lambda: func(user.id, options["bins"]),
+                    options["iterations"],
+                    warmup=1,
+                )
+                self.stdout.write(format_summary(label, summarize(samples)))
+        finally:
+            user.delete()
+
+    def _populate(self, user, options):
+        """Create random recipes and tag links for the benchmark user"""
+        tags = Tag.objects.bulk_create(
+            Tag(user=user, name=f"tag{i}") for i in range(options["tags"])
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=f"recipe{i}",
+                time_minutes=random.randint(1, 240),
+                price=round(random.uniform(1, 999), 2),
+            )
+            for i in range(options["recipes"])
+        )
+        if recipes[0].pk is None:
+            recipes = list(Recipe.objects.filter(user=user))
+        if tags[0].pk is None:
+            tags = list(Tag.objects.filter(user=user))
+        Through = Recipe.tags.through
+        Through.objects.bulk_create(
+            Through(recipe_id=recipe.pk, tag_id=tag.pk)
+            for recipe in recipes
+            for tag in random.sample(tags, min(3, len(tags)))
+        )
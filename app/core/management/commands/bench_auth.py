@@ -0,0 +1,62 @@
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework import authentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from core import tokens
+from core.authentication import SignedTokenAuthentication
+from core.benchmarks import format_summary, summarize, time_calls
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the authentication cost per request
+
+    Compares database-backed tokens with signed access tokens, timing only
+    the authentication step of a request. The reported queries are those
+    the authentication step actually ran, counted on a sample request.
+    """
+
+    help = "Benchmark the cost of authenticating a request"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            email=f"bench-{uuid.uuid4().hex}@example.com"
+        )
+        try:
+            schemes = {
+                "token": (
+                    authentication.TokenAuthentication(),
+                    f"Token {Token.objects.create(user=user).key}",
+                ),
+                "signed": (
+                    SignedTokenAuthentication(),
+                    f"Bearer {tokens.issue_access_token(user)}",
+                ),
+            }
+            for name, (authenticator, header) in schemes.items():
+                self._run(name, authenticator, header, options["requests"])
+        finally:
+            user.delete()
+
+    def _run(self, name, authenticator, header, requests):
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=header)
+
+        def authenticate():
+            authenticator.authenticate(Request(request))
+
+        with CaptureQueriesContext(connection) as queries:
+            authenticate()
+        samples = time_calls(authenticate, requests, warmup=10)
+        self.stdout.write(
+            f"{format_summary(name, summarize(samples))} "
+            f"queries={len(queries)}"
+        )
@@ -0,0 +1,84 @@
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.benchmarks import format_summary, summarize, time_calls
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the cost of connecting to the database
+
+    Requests go through the full WSGI handler, so connections are opened
+    and closed exactly as they would be in production. Each CONN_MAX_AGE
+    value is measured in turn; run the command again with DB_POOL=1 to
+    measure the pooled backend. Throttling is switched off so that every
+    request reaches the database.
+    """
+
+    help = "Benchmark endpoint latency for different connection settings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--conn-max-age",
+            type=int,
+            nargs="+",
+            default=[0, 60],
+            help="CONN_MAX_AGE values to compare",
+        )
+        parser.add_argument("--host", default="localhost")
+
+    def handle(self, *args, **options):
+        self.handler = WSGIHandler()
+        self.factory = RequestFactory(HTTP_HOST=options["host"])
+        password = uuid.uuid4().hex
+        user = get_user_model().objects.create_user(
+            email=f"bench-{uuid.uuid4().hex}@example.com", password=password
+        )
+        try:
+            token = Token.objects.create(user=user)
+            Recipe.objects.bulk_create(
+                Recipe(user=user, title=f"recipe{i}", time_minutes=i, price=i)
+                for i in range(20)
+            )
+            with override_settings(REST_FRAMEWORK={}):
+                self._run(user, password, token, options)
+        finally:
+            user.delete()
+
+    def _request(self, request):
+        """Send a request through the WSGI handler and consume it"""
+        response = self.handler(request.environ, lambda *args: None)
+        response.close()
+
+    def _run(self, user, password, token, options):
+        engine = connections["default"].settings_dict["ENGINE"]
+        token_url = reverse("user:token")
+        recipes_url = reverse("recipe:recipe-list")
+        endpoints = {
+            "token": lambda: self._request(
+                self.factory.post(
+                    token_url, {"email": user.email, "password": password}
+                )
+            ),
+            "recipe-list": lambda: self._request(
+                self.factory.get(
+                    recipes_url, HTTP_AUTHORIZATION=f"Token {token.key}"
+                )
+            ),
+        }
+        for max_age in options["conn_max_age"]:
+            for connection in connections.all():
+                connection.settings_dict["CONN_MAX_AGE"] = max_age
+                connection.close()
+            for name, call in endpoints.items():
+                samples = time_calls(call, options["requests"], warmup=5)
+                label = f"{engine} CONN_MAX_AGE={max_age} {name}"
+                self.stdout.write(format_summary(label, summarize(samples)))
@@ -0,0 +1,123 @@
+import itertools
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import hashers
+from core.benchmarks import format_summary, summarize, time_calls
+
+PASSWORD = "correct horse battery staple"
+
+
+class Command(BaseCommand):
+    """Django command to benchmark password hasher parameters
+
+    Each combination of parameters is timed verifying a password, which is
+    the work a login does, in CPU seconds of the calling thread. The
+    strongest combination per hasher that still allows --target-rate
+    logins per second on one core is printed as settings.
+    """
+
+    help = "Benchmark password hasher parameters for a target login rate"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hasher",
+            nargs="+",
+            choices=("argon2", "scrypt", "pbkdf2"),
+            default=["argon2", "scrypt", "pbkdf2"],
+        )
+        parser.add_argument("--samples", type=int, default=10)
+        parser.add_argument(
+            "--target-rate",
+            type=float,
+            default=20,
+            help="Logins per second per core to sustain",
+        )
+        parser.add_argument(
+            "--argon2-time-cost", type=int, nargs="+", default=[1, 2, 3]
+        )
+        parser.add_argument(
+            "--argon2-memory-cost",
+            type=int,
+            nargs="+",
+            default=[19456, 47104, 65536],
+            help="Memory costs in KiB",
+        )
+        parser.add_argument(
+            "--scrypt-work-factor",
+            type=int,
+            nargs="+",
+            default=[2**14, 2**15, 2**16],
+        )
+        parser.add_argument(
+            "--pbkdf2-iterations",
+            type=int,
+            nargs="+",
+            default=[100000, 260000, 600000],
+        )
+
+    def handle(self, *args, **options):
+        candidates = {
+            "argon2": [
+                {"ARGON2_TIME_COST": t, "ARGON2_MEMORY_COST": m}
+                for t, m in itertools.product(
+                    options["argon2_time_cost"], options["argon2_memory_cost"]
+                )
+            ],
+            "scrypt": [
+                {"SCRYPT_WORK_FACTOR": n}
+                for n in options["scrypt_work_factor"]
+            ],
+            "pbkdf2": [
+                {"PBKDF2_ITERATIONS": i} for i in options["pbkdf2_iterations"]
+            ],
+        }
+        for name in options["hasher"]:
+            best, best_cost = None, 0
+            for params in candidates[name]:
+                cpu_seconds = self._measure(name, params, options["samples"])
+                within_target = cpu_seconds * options["target_rate"] <= 1
+                if within_target and cpu_seconds > best_cost:
+                    best, best_cost = params, cpu_seconds
+            if best is None:
+                self.stdout.write(
+                    f"{name}: no parameters reach the target rate"
+                )
+            else:
+                settings = " ".join(f"{k}={v}" for k, v in best.items())
+                self.stdout.write(f"{name}: PASSWORD_HASHER={name} {settings}")
+
+    def _measure(self, name, params, samples):
+        """Print the cost of verifying a password and return its CPU time"""
+        hasher = self._hasher(name, params)
+        encoded = hasher.encode(PASSWORD, hasher.salt())
+        cpu = time_calls(
+            lambda: hasher.verify(PASSWORD, encoded),
+            samples,
+            warmup=1,
+            clock=time.thread_time,
+        )
+        label = f"{name} " + " ".join(f"{k}={v}" for k, v in params.items())
+        cpu_seconds = statistics.mean(cpu)
+        self.stdout.write(
+            f"{format_summary(label, summarize(cpu))} "
+            f"logins/s/core={1 / cpu_seconds:.1f}"
+        )
+        return cpu_seconds
+
+    def _hasher(self, name, params):
+        """Return a hasher of the given kind with the given parameters"""
+        if name == "argon2":
+            return hashers.Argon2PasswordHasher(
+                time_cost=params["ARGON2_TIME_COST"],
+                memory_cost=params["ARGON2_MEMORY_COST"],
+            )
+        if name == "scrypt":
+            return hashers.ScryptPasswordHasher(
+                work_factor=params["SCRYPT_WORK_FACTOR"]
+            )
+        return hashers.PBKDF2PasswordHasher(
+            iterations=params["PBKDF2_ITERATIONS"]
+        )
@@ -0,0 +1,139 @@
+import datetime
+import json
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import format_summary, summarize
+
+# Runs in a fresh interpreter and reports its timings as JSON
+STARTUP_SCRIPT = """
+import io, json, sys, time
+start = time.perf_counter()
+from app.wsgi import application
+imported = time.perf_counter()
+environ = {
+    "REQUEST_METHOD": "GET",
+    "PATH_INFO": sys.argv[1],
+    "SERVER_NAME": sys.argv[2],
+    "SERVER_PORT": "80",
+    "HTTP_HOST": sys.argv[2],
+    "wsgi.input": io.BytesIO(),
+    "wsgi.errors": sys.stderr,
+    "wsgi.url_scheme": "http",
+}
+timings = {"import": imported - start}
+for label in ("first_request", "second_request"):
+    before = time.perf_counter()
+    response = application(dict(environ), lambda *args: None)
+    b"".join(response)
+    response.close()
+    timings[label] = time.perf_counter() - before
+timings["status"] = response.status_code
+print(json.dumps(timings))
+"""
+STAGES = ("process", "import", "first_request", "second_request")
+
+
+def current_revision():
+    """Return the git revision of the code, if it can be determined"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the time to serve the first request
+
+    Every run starts a new interpreter that imports the WSGI application
+    and serves two requests, so the first one includes loading the URLconf
+    and views. Results are appended to a JSON lines history file and
+    compared with the previous entry, to track startup time over time.
+    """
+
+    help = "Benchmark process startup and time to first request"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=10)
+        parser.add_argument("--path", default="/api/recipe/recipes/")
+        parser.add_argument("--host", default="localhost")
+        parser.add_argument(
+            "--history",
+            default="startup_history.jsonl",
+            help="JSON lines file the results are appended to",
+        )
+
+    def handle(self, *args, **options):
+        samples = {stage: [] for stage in STAGES}
+        for _ in range(options["runs"]):
+            for stage, seconds in self._run(options).items():
+                samples[stage].append(seconds)
+        summaries = {
+            stage: summarize(stage_samples)
+            for stage, stage_samples in samples.items()
+        }
+        for stage, summary in summaries.items():
+            self.stdout.write(format_summary(stage, summary))
+
+        previous = self._last_entry(options["history"])
+        entry = {
+            "timestamp": datetime.datetime.now(
+                datetime.timezone.utc
+            ).isoformat(),
+            "revision": current_revision(),
+            "python": sys.version.split()[0],
+            "path": options["path"],
+            "p50_ms": {
+                stage: summary["p50_ms"]
+                for stage, summary in summaries.items()
+            },
+        }
+        with open(options["history"], "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        if previous:
+            for stage in STAGES:
+                before = previous["p50_ms"].get(stage)
+                if before:
+                    change = entry["p50_ms"][stage] / before - 1
+                    self.stdout.write(
+                        f"{stage}: p50 {change:+.1%} since "
+                        f"{previous['revision'] or previous['timestamp']}"
+                    )
+
+    def _run(self, options):
+        """Start a server process and return the timings of its stages"""
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT]
+            + [options["path"], options["host"]],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        elapsed = time.perf_counter() - start
+        if result.returncode:
+            raise CommandError(f"Startup failed:\n{result.stderr}")
+        timings = json.loads(result.stdout.splitlines()[-1])
+        if timings.pop("status") >= 500:
+            raise CommandError(f"Request failed:\n{result.stderr}")
+        timings["process"] = elapsed
+        return timings
+
+    def _last_entry(self, path):
+        """Return the most recent entry of the history file, if any"""
+        try:
+            with open(path) as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None
+        return json.loads(lines[-1]) if lines else None
@@ -0,0 +1,164 @@
+import itertools
+import logging
+import os
+import posixpath
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+from core.models import Recipe
+
+
+def scan_files(root, prefix):
+    """Yield the storage name, size and mtime of every file below root
+
+    Directories are walked with ``os.scandir`` one at a time, so memory use
+    does not grow with the number of files.
+    """
+    pending = [(root, prefix)]
+    while pending:
+        path, name = pending.pop()
+        try:
+            entries = os.scandir(path)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                entry_name = posixpath.join(name, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append((entry.path, entry_name))
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    yield entry_name, stat.st_size, stat.st_mtime
+
+
+def remove_file(path, size):
+    """Delete a file of the given size and return the bytes reclaimed"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return 0
+    return size
+
+
+class Command(BaseCommand):
+    """Django command to delete media files no recipe refers to
+
+    Files are checked against ``Recipe.image`` on every shard (see
+    core.sharding) one batch at a time, and the
+    orphans of a batch are deleted in a thread pool while the next batch is
+    scanned and checked. Files modified within the grace period are kept,
+    as an upload is written before the recipe pointing at it is saved.
+    """
+
+    help = "Delete orphaned recipe images from the media directory"
+    log = logging.getLogger(__name__)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prefix",
+            default="uploads/recipe",
+            help="Directory below MEDIA_ROOT to collect",
+        )
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=24,
+            help="Keep files modified more recently than this",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report orphaned files without deleting them",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Threads used to delete files",
+        )
+        parser.add_argument(
+            "--database",
+            action="append",
+            dest="databases",
+            help="Database to check references on (default: every shard)",
+        )
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"].strip("/")
+        root = os.path.join(settings.MEDIA_ROOT, prefix)
+        if not os.path.isdir(root):
+            raise CommandError(f"{root} is not a directory")
+        cutoff = time.time() - options["grace_hours"] * 3600
+        self.scanned = self.orphaned = self.reclaimed = 0
+        start = time.perf_counter()
+        files = scan_files(root, prefix)
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            pending = []
+            while batch := list(
+                itertools.islice(files, options["batch_size"])
+            ):
+                self.scanned += len(batch)
+                orphans = self._orphans(
+                    batch,
+                    cutoff,
+                    options["databases"] or sharding.shard_aliases(),
+                )
+                self.orphaned += len(orphans)
+                self._collect(pending)
+                if options["dry_run"]:
+                    self.reclaimed += sum(size for _, size in orphans)
+                    continue
+                pending = [
+                    executor.submit(
+                        remove_file,
+                        os.path.join(settings.MEDIA_ROOT, name),
+                        size,
+                    )
+                    for name, size in orphans
+                ]
+                self.log.info(
+                    "Scanned %d files, %d orphaned",
+                    self.scanned,
+                    self.orphaned,
+                )
+            self._collect(pending)
+
+        action = "found" if options["dry_run"] else "deleted"
+        self.stdout.write(
+            f"Scanned {self.scanned} files in "
+            f"{time.perf_counter() - start:.1f}s; {action} {self.orphaned} "
+            f"orphaned files, reclaiming {self.reclaimed} bytes"
+        )
+
+    def _orphans(self, batch, cutoff, databases):
+        """Return the name and size of unreferenced files past the grace
+
+        A file is only an orphan if no recipe on any database refers to it.
+        """
+        candidates = {
+            name: size for name, size, mtime in batch if mtime < cutoff
+        }
+        if not candidates:
+            return []
+        referenced = set()
+        for using in databases:
+            referenced.update(
+                Recipe.objects.using(using)
+                .filter(image__in=candidates)
+                .values_list("image", flat=True)
+            )
+        return [
+            (name, size)
+            for name, size in candidates.items()
+            if name not in referenced
+        ]
+
+    def _collect(self, pending):
+        """Wait for pending deletions and count the reclaimed bytes"""
+        for future in pending:
+            self.reclaimed += future.result()
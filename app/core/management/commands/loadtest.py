@@ -0,0 +1,114 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import format_summary, summarize
+
+
+async def _read_response(reader):
+    """Read one HTTP/1.1 response and return its status code"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by server")
+    status = int(status_line.split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while size := int((await reader.readline()).strip(), 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    return status, headers.get("connection") == "close"
+
+
+class Command(BaseCommand):
+    """Django command to load test running API servers
+
+    Opens the given number of keep-alive connections to each URL and issues
+    GET requests on all of them for a fixed duration, e.g. to compare the
+    WSGI deployment against the ASGI one:
+
+        manage.py loadtest --token KEY --concurrency 500 \\
+            http://wsgi-host:8000/api/recipe/recipes/ \\
+            http://asgi-host:8000/api/recipe/recipes/
+    """
+
+    help = "Measure throughput and tail latency of running API servers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="+", metavar="URL")
+        parser.add_argument("--concurrency", type=int, default=500)
+        parser.add_argument("--duration", type=float, default=30.0)
+        parser.add_argument("--token", help="API token for authentication")
+
+    def handle(self, *args, **options):
+        for url in options["urls"]:
+            parts = urlsplit(url)
+            if parts.scheme != "http":
+                raise CommandError(f"Only http:// URLs are supported: {url}")
+            latencies, errors, elapsed = asyncio.run(
+                self._run(
+                    parts,
+                    options["concurrency"],
+                    options["duration"],
+                    options["token"],
+                )
+            )
+            self.stdout.write(
+                format_summary(url, summarize(latencies))
+                + f" errors={errors}"
+                + f" throughput={len(latencies) / elapsed:.1f}req/s"
+            )
+
+    async def _run(self, parts, concurrency, duration, token):
+        """Drive all connections against one URL until the deadline"""
+        target = parts.path or "/"
+        if parts.query:
+            target += f"?{parts.query}"
+        request = [
+            f"GET {target} HTTP/1.1",
+            f"Host: {parts.netloc}",
+            "Accept: application/json",
+        ]
+        if token:
+            request.append(f"Authorization: Token {token}")
+        request = ("\r\n".join(request) + "\r\n\r\n").encode()
+
+        latencies = []
+        errors = 0
+        start = time.perf_counter()
+        deadline = start + duration
+
+        async def connection_loop():
+            nonlocal errors
+            reader = writer = None
+            while time.perf_counter() < deadline:
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(
+                            parts.hostname, parts.port or 80
+                        )
+                    sent = time.perf_counter()
+                    writer.write(request)
+                    await writer.drain()
+                    status, closed = await _read_response(reader)
+                except (OSError, ValueError, asyncio.IncompleteReadError):
+                    errors += 1
+                    closed = True
+                else:
+                    latencies.append(time.perf_counter() - sent)
+                    if status >= 400:
+                        errors += 1
+                if closed and writer is not None:
+                    writer.close()
+                    reader = writer = None
+            if writer is not None:
+                writer.close()
+
+        await asyncio.gather(*(connection_loop() for _ in range(concurrency)))
+        return latencies, errors, time.perf_counter() - start
@@ -0,0 +1,112 @@
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so that nothing is imported yet
+STARTUP_SCRIPT = """
+import importlib, sys
+importlib.import_module(sys.argv[1])
+if sys.argv[2] == "1":
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+"""
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def parse_importtime(output):
+    """Parse ``-X importtime`` output into (module, self, cumulative, depth)
+
+    Times are in microseconds; ``depth`` is the nesting level of the import.
+    """
+    imports = []
+    for line in output.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            imports.append(
+                (module, int(own), int(cumulative), len(indent) // 2)
+            )
+    return imports
+
+
+class Command(BaseCommand):
+    """Django command to report the slowest imports of a server entry point
+
+    The entry point is imported in a fresh interpreter with ``-X
+    importtime``, followed by the URLconf, which Django otherwise loads on
+    the first request.
+    """
+
+    help = "Report the slowest imports of the WSGI or ASGI application"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--module",
+            default="app.wsgi",
+            help="Entry point to import, e.g. app.wsgi or app.asgi",
+        )
+        parser.add_argument("--limit", type=int, default=25)
+        parser.add_argument(
+            "--sort",
+            choices=("cumulative", "self"),
+            default="cumulative",
+            help="Rank modules by their own or their cumulative time",
+        )
+        parser.add_argument(
+            "--by-package",
+            action="store_true",
+            help="Sum the time of each top-level package",
+        )
+        parser.add_argument(
+            "--no-urls",
+            action="store_true",
+            help="Do not load the URLconf after the entry point",
+        )
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                STARTUP_SCRIPT,
+                options["module"],
+                "0" if options["no_urls"] else "1",
+            ],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        imports = parse_importtime(result.stderr)
+        if result.returncode or not imports:
+            raise CommandError(
+                f"Importing {options['module']} failed:\n{result.stderr}"
+            )
+        total = sum(own for _, own, _, _ in imports)
+
+        if options["by_package"]:
+            packages = defaultdict(int)
+            for module, own, _, _ in imports:
+                packages[module.partition(".")[0]] += own
+            rows = [(package, own, own) for package, own in packages.items()]
+        else:
+            rows = [
+                (module, own, cumulative)
+                for module, own, cumulative, _ in imports
+            ]
+        column = 1 if options["sort"] == "self" else 2
+        rows.sort(key=lambda row: row[column], reverse=True)
+
+        self.stdout.write(f"{'self ms':>9} {'cumul ms':>9}  module")
+        for module, own, cumulative in rows[: options["limit"]]:
+            self.stdout.write(
+                f"{own / 1000:9.1f} {cumulative / 1000:9.1f}  {module}"
+            )
+        self.stdout.write(
+            f"{len(imports)} modules imported in {total / 1000:.1f}ms"
+        )
@@ -0,0 +1,167 @@
+import csv
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from core import sharding
+
+
+def hash_password(password):
+    """Hash a password in a worker process"""
+    return make_password(password)
+
+
+class Command(BaseCommand):
+    """Django command to create users in bulk from a CSV or NDJSON file
+
+    Records have an ``email`` and optionally a ``password`` and ``name``;
+    users without a password get an unusable one. Passwords are hashed in a
+    pool of processes while the previous batch is being inserted, and every
+    new user is issued an auth token.
+    """
+
+    help = "Create users and auth tokens in bulk from a CSV or NDJSON file"
+    log = logging.getLogger(__name__)
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            choices=("csv", "ndjson"),
+            help="Input format; by default taken from the file extension",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Processes used to hash passwords",
+        )
+        parser.add_argument(
+            "--tokens-output",
+            help="Write the issued tokens as email,token CSV to this file",
+        )
+
+    def handle(self, *args, **options):
+        input_format = options["format"]
+        if input_format is None:
+            extension = os.path.splitext(options["path"])[1].lower()
+            input_format = "csv" if extension == ".csv" else "ndjson"
+        self.created = self.skipped = 0
+        self.seen = set()
+        self.tokens_output = None
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            source = stack.enter_context(open(options["path"], newline=""))
+            if options["tokens_output"]:
+                self.tokens_output = csv.writer(
+                    stack.enter_context(
+                        open(options["tokens_output"], "w", newline="")
+                    )
+                )
+            records = self._read(source, input_format)
+            self._provision(records, options)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Created {self.created} users, skipped {self.skipped} "
+            f"in {elapsed:.1f}s ({self.created / elapsed:.0f} users/s)"
+        )
+
+    def _read(self, source, input_format):
+        """Yield the records of the input file"""
+        if input_format == "csv":
+            yield from csv.DictReader(source)
+            return
+        for number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise CommandError(f"Line {number}: {error}")
+
+    def _provision(self, records, options):
+        """Hash each batch while the previous one is inserted"""
+        with ProcessPoolExecutor(
+            max_workers=options["workers"], initializer=django.setup
+        ) as executor:
+            pending = None
+            while batch := list(
+                itertools.islice(records, options["batch_size"])
+            ):
+                batch = self._new_records(batch)
+                passwords = [record["password"] for record in batch]
+                chunksize = max(1, len(passwords) // (options["workers"] * 4))
+                hashes = executor.map(
+                    hash_password, passwords, chunksize=chunksize
+                )
+                if pending:
+                    self._insert(*pending)
+                pending = (batch, hashes)
+            if pending:
+                self._insert(*pending)
+
+    def _new_records(self, batch):
+        """Return the valid records of a batch whose email is not taken"""
+        User = get_user_model()
+        records = {}
+        for record in batch:
+            email = User.objects.normalize_email(record.get("email") or "")
+            if not email or email in self.seen or email in records:
+                self.skipped += 1
+                continue
+            records[email] = {
+                "email": email,
+                "name": record.get("name") or "",
+                "password": record.get("password") or None,
+            }
+        existing = set(
+            User.objects.filter(email__in=records).values_list(
+                "email", flat=True
+            )
+        )
+        self.skipped += len(existing)
+        self.seen.update(records)
+        return [
+            record
+            for email, record in records.items()
+            if email not in existing
+        ]
+
+    def _insert(self, batch, hashes):
+        """Insert a batch of users together with their tokens"""
+        User = get_user_model()
+        users = [
+            User(email=record["email"], name=record["name"], password=hashed)
+            for record, hashed in zip(batch, hashes)
+        ]
+        with transaction.atomic():
+            users = User.objects.bulk_create(users)
+            if users and users[0].pk is None:
+                # The database did not return the new primary keys
+                users = list(
+                    User.objects.filter(email__in=[u.email for u in users])
+                )
+            tokens = Token.objects.bulk_create(
+                Token(user=user, key=Token.generate_key()) for user in users
+            )
+            # bulk_create() sends no post_save, so place the users here
+            if sharding.is_enabled():
+                sharding.assign_shards(users)
+        if self.tokens_output:
+            self.tokens_output.writerows(
+                (token.user.email, token.key) for token in tokens
+            )
+        self.created += len(users)
+        self.log.info("Created %d users", self.created)
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core import catalog
+
+
+class Command(BaseCommand):
+    """Django command to delete catalog names no tag or ingredient uses
+
+    Entries are left behind when tags and ingredients are renamed or
+    deleted. Run it when names are not being written heavily (see
+    ``catalog.prune``).
+    """
+
+    help = "Delete catalog names no longer used by any tag or ingredient"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        deleted = catalog.prune(options["database"])
+        self.stdout.write(f"Pruned {deleted} unused catalog names")
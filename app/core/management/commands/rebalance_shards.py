@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from core import sharding
+
+
+class Command(BaseCommand):
+    """Django command to move users' recipe data between shards
+
+    Without ``--user``, every user not on the shard the hash ring places
+    them on is moved there, e.g. after adding a shard. Each user is moved
+    in its own transactions, so the command can be interrupted and rerun.
+    Users who write to their data while being moved are skipped, and are
+    moved by a later run.
+    """
+
+    help = "Move users to their hash ring placement, or one user anywhere"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", help="ID or email of a single user to move"
+        )
+        parser.add_argument(
+            "--to",
+            dest="target",
+            help="Shard to move the user to (default: their placement)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the users that would be moved",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        if not sharding.is_enabled():
+            raise CommandError("No shards are configured")
+        target = options["target"]
+        if target is not None and target not in sharding.shard_aliases():
+            raise CommandError(f"Unknown shard {target!r}")
+        if options["user"]:
+            moves = [self._single_move(options["user"], target)]
+        elif target is not None:
+            raise CommandError("--to requires --user")
+        else:
+            moves = self._rebalance_moves(options["batch_size"])
+
+        moved = rows = 0
+        for user_id, source, target in moves:
+            if source == target:
+                continue
+            if options["dry_run"]:
+                self.stdout.write(
+                    f"Would move user {user_id}: {source} -> {target}"
+                )
+            else:
+                try:
+                    rows += sharding.move_user(user_id, target)
+                except sharding.UserMoveConflict as error:
+                    self.stderr.write(f"Skipped user {user_id}: {error}")
+                    continue
+                self.stdout.write(
+                    f"Moved user {user_id}: {source} -> {target}"
+                )
+            moved += 1
+        if options["dry_run"]:
+            self.stdout.write(f"{moved} users would be moved")
+        else:
+            self.stdout.write(f"Moved {moved} users ({rows} rows)")
+
+    def _single_move(self, user, target):
+        """Return the move of the user given by ID or email"""
+        users = get_user_model().objects.using(DEFAULT_DB_ALIAS)
+        lookup = {"pk": user} if user.isdigit() else {"email": user}
+        try:
+            user_id = users.values_list("id", flat=True).get(**lookup)
+        except users.model.DoesNotExist:
+            raise CommandError(f"User {user!r} does not exist")
+        return (
+            user_id,
+            sharding.shard_for_user(user_id),
+            target or sharding.placement(user_id),
+        )
+
+    def _rebalance_moves(self, batch_size):
+        """Yield the moves of the users away from their placement"""
+        users = get_user_model().objects.using(DEFAULT_DB_ALIAS)
+        last_id = 0
+        while True:
+            batch = list(
+                users.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]
+            for user_id in batch:
+                yield (
+                    user_id,
+                    sharding.shard_for_user(user_id),
+                    sharding.placement(user_id),
+                )
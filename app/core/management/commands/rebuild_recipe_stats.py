@@ -0,0 +1,46 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import sharding
+from core.models import RecipeStats
+from core.stats import compute_stats
+
+
+class Command(BaseCommand):
+    """Django command to recompute per-user recipe statistics"""
+
+    help = "Rebuild the RecipeStats rows from the recipes table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user-id",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Only rebuild the given user (repeatable)",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by("id")
+        if options["user_ids"]:
+            users = users.filter(id__in=options["user_ids"])
+        user_ids = list(users.values_list("id", flat=True))
+        batch_size = options["batch_size"]
+        for start in range(0, len(user_ids), batch_size):
+            shards = defaultdict(list)
+            for user_id in user_ids[start : start + batch_size]:
+                shards[sharding.shard_for_user(user_id)].append(user_id)
+            for using, batch in shards.items():
+                stats = RecipeStats.objects.using(using)
+                with transaction.atomic(using=using):
+                    # Lock the rows so concurrent signal updates queue behind
+                    list(stats.select_for_update().filter(user_id__in=batch))
+                    stats.filter(user_id__in=batch).delete()
+                    stats.bulk_create(
+                        compute_stats(user_id, using) for user_id in batch
+                    )
+        self.stdout.write(f"Rebuilt statistics for {len(user_ids)} users")
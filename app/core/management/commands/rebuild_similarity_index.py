@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from core.similarity import index_recipes
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the similar-recipe buckets"""
+
+    help = "Rebuild the MinHash/LSH buckets of all recipes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        indexed = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Recipe.objects.using(using)
+                .filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]
+            index_recipes(batch, using)
+            indexed += len(batch)
+        self.stdout.write(f"Indexed {indexed} recipes")
@@ -0,0 +1,63 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from core.snapshots import SNAPSHOT_FIELDS, build_snapshots
+
+
+class Command(BaseCommand):
+    """Django command to find and fix drifted recipe snapshots"""
+
+    help = "Verify the tag/ingredient snapshots on recipes and repair drift"
+    log = logging.getLogger(__name__)
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drifted recipes without fixing them",
+        )
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        fields = list(SNAPSHOT_FIELDS.values())
+        checked = drifted = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Recipe.objects.using(using)
+                .filter(id__gt=last_id)
+                .order_by("id")
+                .only("id", *fields)[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            ids = [recipe.id for recipe in batch]
+            expected = {
+                relation: build_snapshots(ids, relation, using)
+                for relation in SNAPSHOT_FIELDS
+            }
+            stale = []
+            for recipe in batch:
+                changed = False
+                for relation, field in SNAPSHOT_FIELDS.items():
+                    snapshot = expected[relation][recipe.id]
+                    if getattr(recipe, field) != snapshot:
+                        setattr(recipe, field, snapshot)
+                        changed = True
+                if changed:
+                    stale.append(recipe)
+            checked += len(batch)
+            drifted += len(stale)
+            if stale and not options["dry_run"]:
+                Recipe.objects.using(using).bulk_update(stale, fields)
+            self.log.info("Checked %d recipes, %d drifted", checked, drifted)
+
+        action = "found" if options["dry_run"] else "repaired"
+        self.stdout.write(
+            f"Checked {checked} recipes; {action} {drifted} drifted snapshots"
+        )
@@ -0,0 +1,116 @@
+import logging
+import multiprocessing
+import signal
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+import django
+from django.core.management.base import BaseCommand
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    """Django command to run queued background jobs
+
+    Due jobs are claimed only as free slots in the pool open up, so other
+    workers can pick up the rest. Threads suit jobs that mostly wait on the
+    database; the process pool is started with "spawn" so that no worker
+    inherits an open database connection. SIGTERM and SIGINT stop claiming
+    new jobs and wait for the running ones to finish.
+    """
+
+    help = "Run background jobs from the database queue"
+    log = logging.getLogger(__name__)
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument(
+            "--pool", choices=("thread", "process"), default="thread"
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep when no job is due",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no job is due instead of polling",
+        )
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        jobs.discover_tasks()
+        self.stopping = False
+        handlers = {
+            signum: signal.signal(signum, self._stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        if options["pool"] == "process":
+            executor = ProcessPoolExecutor(
+                max_workers=options["concurrency"],
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=options["concurrency"])
+        try:
+            with executor:
+                counts = self._run(executor, options)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        summary = "".join(f", {n} {status}" for status, n in counts.items())
+        self.stdout.write(f"Ran {sum(counts.values())} jobs{summary}")
+
+    def _stop(self, signum, frame):
+        """Finish the running jobs and exit"""
+        self.log.info("Received signal %d, shutting down", signum)
+        self.stopping = True
+
+    def _run(self, executor, options):
+        """Keep the pool busy with claimed jobs; return outcome counts"""
+        using = options["database"]
+        counts = {}
+        running = set()
+        while not self.stopping:
+            free = options["concurrency"] - len(running)
+            claimed = jobs.claim_jobs(free, using) if free else []
+            for job in claimed:
+                running.add(executor.submit(jobs.run_job, job, using))
+            if running:
+                if not free:
+                    timeout = None
+                elif claimed:
+                    timeout = 0
+                else:
+                    timeout = options["poll_interval"]
+                done, running = wait(
+                    running, timeout=timeout, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    self._count(future, counts)
+            elif options["once"]:
+                break
+            else:
+                time.sleep(options["poll_interval"])
+        for future in running:
+            self._count(future, counts)
+        return counts
+
+    def _count(self, future, counts):
+        """Tally the outcome of a finished job, surviving worker errors"""
+        try:
+            status = future.result()
+        except Exception:
+            # The job stays claimed and is retried once its lease lapses
+            self.log.exception("Job runner failed")
+            status = "error"
+        counts[status] = counts.get(status, 0) + 1
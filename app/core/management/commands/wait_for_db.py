@@ -1,7 +1,8 @@
-import logging
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import connections
 from django.db.utils import OperationalError
 
@@ -9,15 +10,85 @@ from django.db.utils import OperationalError
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
 
-    log = logging.getLogger(__name__)
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            action="append",
+            dest="databases",
+            help="Database alias to wait for (repeatable; default: default)",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60.0,
+            help="Seconds to wait before giving up",
+        )
+        parser.add_argument(
+            "--initial-delay",
+            type=float,
+            default=0.01,
+            help="Seconds to wait after the first failed attempt",
+        )
+        parser.add_argument(
+            "--max-delay",
+            type=float,
+            default=1.0,
+            help="Upper bound for the delay between attempts",
+        )
 
-    def handle(self, *args, **kwargs):
-        self.log.info("Waiting for database")
-        db_connection = None
-        while not db_connection:
+    def _probe(self, alias):
+        """Run a trivial query, raising OperationalError if unavailable"""
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute("SELECT 1")
+        finally:
+            connections[alias].close()
+
+    def _wait(self, alias, timeout, initial_delay, max_delay):
+        """Retry with jittered exponential backoff until alias answers"""
+        start = time.monotonic()
+        delay = initial_delay
+        attempts = 0
+        while True:
+            attempts += 1
             try:
-                db_connection = connections["default"]
-            except OperationalError:
-                self.log.warning("Database unavailable; waiting 1 second")
-                time.sleep(1)
-        self.log.info("Database is available")
+                self._probe(alias)
+            except OperationalError as exc:
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise CommandError(
+                        f"Database {alias!r} unavailable after "
+                        f"{attempts} attempts: {exc}"
+                    )
+                pause = min(random.uniform(delay / 2, delay), remaining)
+                self.stdout.write(
+                    f"Database {alias!r} unavailable; "
+                    f"retrying in {pause:.3f}s"
+                )
+                time.sleep(pause)
+                delay = min(delay * 2, max_delay)
+            else:
+                return time.monotonic() - start, attempts
+
+    def handle(self, *args, **options):
+        aliases = options["databases"] or ["default"]
+        self.stdout.write(f"Waiting for database(s): {', '.join(aliases)}")
+        with ThreadPoolExecutor(max_workers=len(aliases)) as executor:
+            futures = {
+                alias: executor.submit(
+                    self._wait,
+                    alias,
+                    options["timeout"],
+                    options["initial_delay"],
+                    options["max_delay"],
+                )
+                for alias in aliases
+            }
+            for alias, future in futures.items():
+                elapsed, attempts = future.result()
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Database {alias!r} is available after "
+                        f"{elapsed:.3f}s ({attempts} attempts)"
+                    )
+                )
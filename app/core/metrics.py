@@ -0,0 +1,152 @@
+"""Prometheus metrics for the API
+
+Metric values are kept in-process by default. When the service runs under a
+pre-forking server, set ``PROMETHEUS_MULTIPROC_DIR`` to an empty, writable
+directory before the workers start; every worker then writes its samples to
+memory-mapped files in that directory and the ``/metrics`` view aggregates
+them across processes.
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+SIZE_BUCKETS = tuple(4**exponent for exponent in range(3, 12))
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+LOGIN_CPU_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+QUERY_DURATION_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "Total HTTP requests handled",
+    ["route", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling an HTTP request",
+    ["route", "method"],
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Size of HTTP response bodies",
+    ["route", "method"],
+    buckets=SIZE_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    "db_queries_per_request",
+    "Number of database queries issued per HTTP request",
+    ["route", "method"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Time spent executing a single database query",
+    ["route", "method"],
+    buckets=QUERY_DURATION_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache name and result (hit or miss)",
+    ["cache", "result"],
+)
+IMAGE_UPLOAD_BYTES = Counter(
+    "image_upload_bytes_total",
+    "Total bytes received through image uploads",
+    ["route"],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections held by the in-process database pool",
+    ["alias", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_acquire_wait_seconds",
+    "Time spent acquiring a connection from the database pool",
+    ["alias"],
+    buckets=QUERY_DURATION_BUCKETS,
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_acquire_timeouts_total",
+    "Database pool acquisitions that timed out",
+    ["alias"],
+)
+THROTTLED_REQUESTS = Counter(
+    "throttled_requests_total",
+    "Requests rejected by a token-bucket throttle",
+    ["scope"],
+)
+LOGIN_CPU_SECONDS = Histogram(
+    "login_cpu_seconds",
+    "CPU time spent checking the credentials of a login",
+    ["result"],
+    buckets=LOGIN_CPU_BUCKETS,
+)
+JOBS_ENQUEUED = Counter(
+    "jobs_enqueued_total",
+    "Background jobs added to the queue",
+    ["task"],
+)
+JOBS_DEDUPLICATED = Counter(
+    "jobs_deduplicated_total",
+    "Background jobs not queued because an equal job was already queued",
+    ["task"],
+)
+JOBS_COMPLETED = Counter(
+    "jobs_completed_total",
+    "Background job attempts by outcome (done, retry or failed)",
+    ["task", "result"],
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds",
+    "Time spent running a background job attempt",
+    ["task"],
+    buckets=JOB_BUCKETS,
+)
+JOB_QUEUE_DELAY = Histogram(
+    "job_queue_delay_seconds",
+    "Time between a background job becoming due and starting to run",
+    ["task"],
+    buckets=JOB_BUCKETS,
+)
+
+
+def record_cache_lookup(cache_name, hit, count=1):
+    """Record the outcome of one or more lookups against a named cache"""
+    CACHE_REQUESTS.labels(cache_name, "hit" if hit else "miss").inc(count)
+
+
+def get_registry():
+    """Return the registry holding the metrics of every worker process"""
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_latest():
+    """Render all metrics in the Prometheus text exposition format"""
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+from core import async_views, metrics, routers, sharding
+
+
+def _route_label(request):
+    """Return a low-cardinality label identifying the matched route"""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "<unresolved>"
+    return match.view_name or match.route
+
+
+@contextmanager
+def _recording_queries(queries):
+    """Append the duration of each query the current thread runs meanwhile"""
+
+    def record_query(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            queries.append(time.perf_counter() - start)
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(record_query))
+        yield
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Record request counts, latencies, response sizes and query stats
+
+    Under ASGI queries run in other threads, so query stats are recorded
+    for the requests whose views run in the ORM thread pool (see
+    core.async_views); other requests only get the remaining metrics.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self._acall(request)
+        queries = []
+        start = time.perf_counter()
+        with _recording_queries(queries):
+            response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - start, queries)
+        return response
+
+    async def _acall(self, request):
+        queries = []
+        pooled = False
+
+        def record_pooled_queries():
+            nonlocal pooled
+            pooled = True
+            return _recording_queries(queries)
+
+        start = time.perf_counter()
+        with async_views.pool_hook(record_pooled_queries):
+            response = await self.get_response(request)
+        self._record(
+            request,
+            response,
+            time.perf_counter() - start,
+            queries if pooled else None,
+        )
+        return response
+
+    def _record(self, request, response, elapsed, queries=None):
+        """Record the metrics of a handled request"""
+        route = _route_label(request)
+        method = request.method
+        metrics.REQUESTS.labels(route, method, response.status_code).inc()
+        metrics.REQUEST_LATENCY.labels(route, method).observe(elapsed)
+        if queries is not None:
+            metrics.DB_QUERIES.labels(route, method).observe(len(queries))
+            query_latency = metrics.DB_QUERY_LATENCY.labels(route, method)
+            for duration in queries:
+                query_latency.observe(duration)
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.labels(route, method).observe(
+                len(response.content)
+            )
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """Serve safe requests to replica-enabled views from a read replica"""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "cls", None)
+        if (
+            request.method in SAFE_METHODS
+            and getattr(view_class, "replica_reads", False)
+            and not routers.is_pinned_to_primary(request)
+        ):
+            routers.set_read_alias(routers.choose_replica())
+
+    def process_response(self, request, response):
+        routers.set_read_alias(None)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            routers.pin_to_primary(request)
+        return response
+
+
+class ShardRoutingMiddleware(MiddlewareMixin):
+    """Route an API request's queries for user data to the user's shard"""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, "cls", None) is not None:
+            sharding.set_shard_request(request)
+
+    def process_response(self, request, response):
+        sharding.set_shard_request(None)
+        return response
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:21
+
+from django.db import migrations, models
+
+
+def backfill_snapshots(apps, schema_editor):
+    """Populate the snapshots of existing recipes"""
+    Recipe = apps.get_model('core', 'Recipe')
+    db = schema_editor.connection.alias
+    for relation, field, target in [
+        ('tags', 'tag_snapshot', 'tag'),
+        ('ingredients', 'ingredient_snapshot', 'ingredient'),
+    ]:
+        through = getattr(Recipe, relation).through
+        snapshots = {}
+        rows = through.objects.using(db).order_by('recipe_id', f'{target}_id')
+        for recipe_id, target_id, name in rows.values_list(
+            'recipe_id', f'{target}_id', f'{target}__name'
+        ):
+            snapshots.setdefault(recipe_id, []).append([target_id, name])
+        Recipe.objects.using(db).bulk_update(
+            [Recipe(id=pk, **{field: value}) for pk, value in snapshots.items()],
+            [field],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_snapshot',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_snapshot',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:22
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_stats', serialize=False, to='core.user')),
+                ('recipe_count', models.PositiveIntegerField(default=0)),
+                ('time_minutes_total', models.BigIntegerField(default=0)),
+                ('time_minutes_counts', models.JSONField(default=dict)),
+                ('price_total', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:38
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_refresh_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='detail_version',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_image_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_buckets', to='core.recipe')),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:40
+
+from django.db import migrations
+
+TABLES = ('core_tag', 'core_ingredient')
+
+
+def create_prefix_indexes(apps, schema_editor):
+    """Index names for case-insensitive prefix lookups on PostgreSQL
+
+    The expression matches the SQL Django generates for ``istartswith``;
+    text_pattern_ops lets LIKE use the index under any collation.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_name_prefix_idx '
+            f'ON {table} (user_id, UPPER(name::text) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_name_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_similarity_buckets'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='catalog_name',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ingredients', to='core.catalogname'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='catalog_name',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='tags', to='core.catalogname'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_user_shards"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="data_version",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-19 14:02
+
+from django.db import migrations
+
+
+def fold_catalog_case(apps, schema_editor):
+    """Lower-case catalog entries, merging those differing only in case"""
+    CatalogName = apps.get_model('core', 'CatalogName')
+    db = schema_editor.connection.alias
+    kept = {}
+    for entry in CatalogName.objects.using(db).order_by('id').iterator():
+        value = entry.value.lower()
+        if value not in kept:
+            kept[value] = entry
+            continue
+        for model_name in ('Tag', 'Ingredient'):
+            apps.get_model('core', model_name).objects.using(db).filter(
+                catalog_name_id=entry.id
+            ).update(catalog_name_id=kept[value].id)
+        entry.delete()
+    for value, entry in kept.items():
+        if entry.value != value:
+            entry.value = value
+            entry.save(update_fields=['value'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_user_data_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(fold_catalog_case, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,129 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:10
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 500
+WHITESPACE = re.compile(r'\s+')
+
+
+def key(name):
+    """Return the matching key of a name, as core.catalog.key()"""
+    return WHITESPACE.sub(' ', unicodedata.normalize('NFC', name)).strip().lower()
+
+
+def intern_exact_names(apps, schema_editor):
+    """Point every tag and ingredient at the entry of its exact name
+
+    Rows are moved a batch at a time, each batch in its own transaction.
+    Entries of the former case-folded catalog that no row uses any more
+    are deleted afterwards.
+    """
+    CatalogName = apps.get_model('core', 'CatalogName')
+    db = schema_editor.connection.alias
+    entries = CatalogName.objects.using(db)
+    for entry in entries.filter(key='').iterator():
+        entry.key = key(entry.value)
+        entry.save(update_fields=['key'])
+    for model_name in ('Tag', 'Ingredient'):
+        rows = apps.get_model('core', model_name).objects.using(db)
+        last_id = 0
+        while True:
+            with transaction.atomic(using=db):
+                batch = list(
+                    rows.filter(id__gt=last_id)
+                    .order_by('id')
+                    .select_for_update()[:BATCH_SIZE]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                names = {row.name for row in batch}
+                ids = dict(
+                    entries.filter(value__in=names).values_list('value', 'id')
+                )
+                entries.bulk_create(
+                    [
+                        CatalogName(value=name, key=key(name))
+                        for name in names.difference(ids)
+                    ],
+                    ignore_conflicts=True,
+                )
+                ids.update(
+                    entries.filter(value__in=names).values_list('value', 'id')
+                )
+                for row in batch:
+                    row.catalog_name_id = ids[row.name]
+                rows.bulk_update(batch, ['catalog_name'])
+    entries.filter(tags__isnull=True, ingredients__isnull=True).delete()
+
+
+def restore_names(apps, schema_editor):
+    """Copy the catalog names back to the rows"""
+    db = schema_editor.connection.alias
+    for model_name in ('Tag', 'Ingredient'):
+        model = apps.get_model('core', model_name)
+        for row in model.objects.using(db).select_related('catalog_name'):
+            row.name = row.catalog_name.value
+            row.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0017_catalog_name_case'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogname',
+            name='key',
+            field=models.CharField(db_index=True, default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(intern_exact_names, restore_names),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='catalog_name',
+            field=models.ForeignKey(
+                editable=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name='ingredients',
+                to='core.catalogname',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='catalog_name',
+            field=models.ForeignKey(
+                editable=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name='tags',
+                to='core.catalogname',
+            ),
+        ),
+        # Lets the columns be added back empty when migrating backwards
+        migrations.AlterField(
+            model_name='ingredient',
+            name='name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RemoveField(
+            model_name='ingredient',
+            name='name',
+        ),
+        migrations.RemoveField(
+            model_name='tag',
+            name='name',
+        ),
+    ]
@@ -1,5 +1,6 @@
 import os.path
 import uuid
+from decimal import Decimal
 
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -7,7 +8,8 @@ from django.contrib.auth.models import (
     PermissionsMixin,
 )
 from django.conf import settings
-from django.db import models
+from django.db import models, router
+from django.utils import timezone
 
 
 def recipe_image_file_path(instance, filename):
@@ -45,36 +47,153 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Bumped to revoke every refresh token issued to the user
+    token_version = models.PositiveIntegerField(default=0)
+    # Bumped on every write to the user's recipe data (see core.versions)
+    data_version = models.PositiveBigIntegerField(default=0)
 
     objects = UserManager()
 
     USERNAME_FIELD = "email"
+    # Only ever changed with F() updates, so that saving a stale instance
+    # cannot roll them back
+    COUNTER_FIELDS = ("token_version", "data_version")
 
+    def save(self, *args, **kwargs):
+        """Save the user, leaving the counters to their own updates"""
+        using = kwargs.get("using") or router.db_for_write(
+            type(self), instance=self
+        )
+        if (
+            not self._state.adding
+            and using == self._state.db
+            and not args
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
-class Tag(models.Model):
-    """Tag to be used for a recipe"""
 
-    name = models.CharField(max_length=255)
+class RefreshToken(models.Model):
+    """Long-lived token used to obtain new signed access tokens"""
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        related_name="refresh_tokens",
     )
+    # Only a hash of the token is stored
+    key_hash = models.CharField(max_length=64, unique=True)
+    token_version = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+    expires = models.DateTimeField()
+
+
+class CatalogName(models.Model):
+    """Tag or ingredient name shared by all users (see core.catalog)"""
+
+    value = models.CharField(max_length=255, unique=True)
+    # Normalized, lower-cased form of the value for matching names
+    key = models.CharField(max_length=255, db_index=True)
+
+    def __str__(self):
+        return self.value
+
+
+class CatalogNamedQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Intern the names of the rows before inserting them"""
+        from core import catalog
+
+        objs = list(objs)
+        unnamed = [obj for obj in objs if obj.catalog_name_id is None]
+        if unnamed:
+            ids = catalog.intern([obj.name for obj in unnamed], self.db)
+            for obj in unnamed:
+                obj.catalog_name_id = ids[obj.name]
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class CatalogNamedManager(models.Manager.from_queryset(CatalogNamedQuerySet)):
+    def get_queryset(self):
+        """Load the names, and let queries filter and order by ``name``"""
+        return (
+            super()
+            .get_queryset()
+            .select_related("catalog_name")
+            .annotate(name=models.F("catalog_name__value"))
+        )
+
+
+class CatalogNamedModel(models.Model):
+    """Model whose name is stored once in the catalog for all users
+
+    ``name`` reads and writes the catalog entry; a changed name is interned
+    when the row is saved (see core.signals).
+    """
+
+    catalog_name = models.ForeignKey(
+        CatalogName,
+        on_delete=models.PROTECT,
+        related_name="%(class)ss",
+        editable=False,
+    )
+
+    objects = CatalogNamedManager()
+
+    class Meta:
+        abstract = True
+
+    @property
+    def name(self):
+        if "_name" not in self.__dict__:
+            self._name = (
+                self.catalog_name.value if self.catalog_name_id else ""
+            )
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+
+    def save(self, *args, **kwargs):
+        """Save the row, storing the name as its catalog entry"""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {
+                "catalog_name" if field == "name" else field
+                for field in update_fields
+            }
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
-    """Ingredient to be used for a recipe"""
+class Tag(CatalogNamedModel):
+    """Tag to be used for a recipe"""
 
-    name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
 
-    def __str__(self):
-        return self.name
+
+class Ingredient(CatalogNamedModel):
+    """Ingredient to be used for a recipe"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
 
 
 class Recipe(models.Model):
@@ -90,7 +209,138 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField("Ingredient")
     tags = models.ManyToManyField("Tag")
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # Indexed for the orphan lookups of the gc_media command
+    image = models.ImageField(
+        null=True, upload_to=recipe_image_file_path, db_index=True
+    )
+    # Denormalized [id, name] pairs of the linked tags and ingredients, kept
+    # in sync by the signal handlers in core.signals
+    tag_snapshot = models.JSONField(default=list, editable=False)
+    ingredient_snapshot = models.JSONField(default=list, editable=False)
+    # Replaced whenever the rendered detail of the recipe may change, to key
+    # cached details (see recipe.details)
+    detail_version = models.UUIDField(default=uuid.uuid4, editable=False)
 
     def __str__(self):
         return self.title
+
+
+class RecipeStats(models.Model):
+    """Per-user recipe statistics, maintained incrementally by core.signals"""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="recipe_stats",
+    )
+    recipe_count = models.PositiveIntegerField(default=0)
+    time_minutes_total = models.BigIntegerField(default=0)
+    # Number of recipes per distinct time_minutes value, for the median
+    time_minutes_counts = models.JSONField(default=dict)
+    price_total = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0")
+    )
+
+    @property
+    def time_minutes_average(self):
+        if not self.recipe_count:
+            return None
+        return self.time_minutes_total / self.recipe_count
+
+    @property
+    def time_minutes_median(self):
+        if not self.recipe_count:
+            return None
+        values = sorted(
+            (int(minutes), count)
+            for minutes, count in self.time_minutes_counts.items()
+        )
+        middle = [(self.recipe_count - 1) // 2, self.recipe_count // 2]
+        medians = []
+        seen = 0
+        for minutes, count in values:
+            while middle and middle[0] < seen + count:
+                medians.append(minutes)
+                middle.pop(0)
+            seen += count
+        return sum(medians) / 2
+
+    @property
+    def price_average(self):
+        if not self.recipe_count:
+            return None
+        return (self.price_total / self.recipe_count).quantize(Decimal("0.01"))
+
+
+class SimilarityBucket(models.Model):
+    """LSH bucket of a recipe's MinHash signature (see core.similarity)"""
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="similarity_buckets"
+    )
+    # Hash of the owner, the band number and the band's signature values
+    key = models.BigIntegerField(db_index=True)
+
+    def __str__(self):
+        return f"{self.recipe_id}:{self.key}"
+
+
+class Job(models.Model):
+    """Deferred task run by the run_worker command (see core.jobs)"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    task = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=QUEUED
+    )
+    # At most one queued job may hold a given key
+    dedup_key = models.CharField(max_length=255, null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    # Token of the claim under which the job runs, and when that claim lapses
+    claim = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_at"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedup_key"],
+                condition=models.Q(status="queued"),
+                name="unique_queued_job_dedup_key",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.status})"
+
+
+class UserShard(models.Model):
+    """Database holding a user's recipe data (see core.sharding)"""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="shard",
+    )
+    alias = models.CharField(max_length=64, db_index=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.alias}"
@@ -0,0 +1,293 @@
+"""Opt-in CPU and memory profiling of individual requests
+
+A request is profiled when profiling is enabled and either a staff user asks
+for it (``X-Profile: 1`` header or ``?profile=1``) or it is picked by the
+background sampler (``PROFILING_SAMPLE_RATE``). Only one request per process
+is profiled at a time, since tracemalloc traces the whole interpreter.
+Profiles are stored under ``PROFILING_DIR``, where only the most recent
+``PROFILING_MAX_PROFILES`` are kept.
+Under ASGI only requests to async views are profiled: cProfile follows
+the view into the ORM thread pool (see core.async_views), whereas sync
+views run in threads the middleware cannot reach. Allocations are traced
+across the whole process, so they include those of concurrent requests.
+"""
+
+import asyncio
+import cProfile
+import json
+import os
+import random
+import shutil
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework import authentication, exceptions, permissions
+from rest_framework.request import Request
+
+from core import async_views
+from core.authentication import SignedTokenAuthentication
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_PARAM = "profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+PSTATS_FILE = "profile.pstats"
+FOLDED_FILE = "profile.folded"
+ALLOCATIONS_FILE = "allocations.txt"
+SUMMARY_FILE = "summary.json"
+
+_profiling_lock = threading.Lock()
+
+
+class CanProfileRequests(permissions.BasePermission):
+    """Allow only staff users to request and read profiles"""
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_staff)
+
+
+def profile_path(profile_id, filename=""):
+    """Return the path of a stored profile or of one of its files"""
+    return os.path.join(settings.PROFILING_DIR, str(profile_id), filename)
+
+
+def _frame_label(func):
+    """Return a flamegraph frame label for a pstats function key"""
+    filename, lineno, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+def collapsed_stacks(stats, min_seconds=1e-6, max_depth=64):
+    """Build collapsed stacks (in microseconds) from cProfile stats
+
+    cProfile only records caller/callee pairs, so a callee's time is split
+    between call paths in proportion to the time recorded for each caller.
+    The result is an approximation suitable for flamegraph tooling.
+    """
+    entries = stats.stats
+    children = defaultdict(list)
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, caller_stats in callers.items():
+            children[caller].append((func, caller_stats[3]))
+
+    folded = Counter()
+
+    def walk(func, stack, seconds):
+        _, _, own_time, cumulative_time, _ = entries[func]
+        fraction = seconds / cumulative_time if cumulative_time else 0
+        stack = stack + (func,)
+        if own_time * fraction > 0:
+            key = ";".join(_frame_label(frame) for frame in stack)
+            folded[key] += own_time * fraction
+        if len(stack) >= max_depth:
+            return
+        for child, child_time in children[func]:
+            share = child_time * fraction
+            if child not in stack and share >= min_seconds:
+                walk(child, stack, share)
+
+    for func, (_, _, _, cumulative_time, callers) in entries.items():
+        if not callers:
+            walk(func, (), cumulative_time)
+    return [
+        f"{stack} {round(seconds * 1e6)}"
+        for stack, seconds in folded.most_common()
+        if round(seconds * 1e6)
+    ]
+
+
+def _authenticated_user(request):
+    """Authenticate the request the same way the API views do"""
+    drf_request = Request(request)
+    for authenticator in (
+        SignedTokenAuthentication(),
+        authentication.TokenAuthentication(),
+        authentication.SessionAuthentication(),
+    ):
+        try:
+            result = authenticator.authenticate(drf_request)
+        except exceptions.APIException:
+            return None
+        if result is not None:
+            return result[0]
+    return None
+
+
+@contextmanager
+def _measuring():
+    """Time and trace the allocations of a block, yielding the results"""
+    measured = {}
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(settings.PROFILING_TRACEMALLOC_FRAMES)
+    start = time.perf_counter()
+    try:
+        yield measured
+    finally:
+        measured["wall_seconds"] = time.perf_counter() - start
+        measured["snapshot"] = tracemalloc.take_snapshot()
+        measured["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        if started_tracing:
+            tracemalloc.stop()
+
+
+def _prune_profiles():
+    """Delete the oldest stored profiles beyond PROFILING_MAX_PROFILES"""
+    profiles = []
+    with os.scandir(settings.PROFILING_DIR) as entries:
+        for entry in entries:
+            try:
+                uuid.UUID(entry.name)
+                profiles.append((entry.stat().st_mtime, entry.path))
+            except (ValueError, OSError):
+                continue
+    profiles.sort(reverse=True)
+    for _, path in profiles[settings.PROFILING_MAX_PROFILES :]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _save_profile(profile_id, request, response, profiler, snapshot, info):
+    """Write the profile, flamegraph stacks and allocation report to disk"""
+    os.makedirs(profile_path(profile_id), exist_ok=True)
+    import pstats
+
+    profiler.dump_stats(profile_path(profile_id, PSTATS_FILE))
+    stats = pstats.Stats(profiler)
+    with open(profile_path(profile_id, FOLDED_FILE), "w") as f:
+        f.write("\n".join(collapsed_stacks(stats)))
+
+    top_allocations = snapshot.filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__)]
+    ).statistics("lineno")[: settings.PROFILING_TOP_ALLOCATIONS]
+    with open(profile_path(profile_id, ALLOCATIONS_FILE), "w") as f:
+        f.write("\n".join(str(stat) for stat in top_allocations))
+
+    top_functions = sorted(
+        stats.stats.items(), key=lambda item: item[1][3], reverse=True
+    )[:20]
+    summary = {
+        "id": str(profile_id),
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "requested": info["requested"],
+        "wall_seconds": info["wall_seconds"],
+        "peak_memory_bytes": info["peak_memory_bytes"],
+        "top_functions": [
+            {
+                "function": _frame_label(func),
+                "calls": calls,
+                "own_seconds": own_time,
+                "cumulative_seconds": cumulative_time,
+            }
+            for func, (_, calls, own_time, cumulative_time, _) in top_functions
+        ],
+        "top_allocations": [
+            {
+                "location": str(stat.traceback),
+                "size_bytes": stat.size,
+                "count": stat.count,
+            }
+            for stat in top_allocations
+        ],
+    }
+    with open(profile_path(profile_id, SUMMARY_FILE), "w") as f:
+        json.dump(summary, f, indent=2)
+    _prune_profiles()
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """Wrap selected requests in cProfile and tracemalloc"""
+
+    def _is_requested(self, request):
+        """Return whether the client asked for this request to be profiled"""
+        return (
+            request.META.get(PROFILE_HEADER) == "1"
+            or request.GET.get(PROFILE_PARAM) == "1"
+        )
+
+    def _is_allowed(self, request):
+        """Return whether the requesting user may ask for a profile"""
+        user = _authenticated_user(request)
+        return CanProfileRequests().has_permission(
+            SimpleNamespace(user=user), None
+        )
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self._acall(request)
+        if not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+        requested = self._is_requested(request) and self._is_allowed(request)
+        sampled = random.random() < settings.PROFILING_SAMPLE_RATE
+        if not (requested or sampled):
+            return self.get_response(request)
+        if not _profiling_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self._profile(request, requested)
+        finally:
+            _profiling_lock.release()
+
+    async def _acall(self, request):
+        if not settings.PROFILING_ENABLED:
+            return await self.get_response(request)
+        # Authentication queries the database, so it runs in the ORM pool
+        requested = self._is_requested(request)
+        if requested:
+            requested = await async_views.run_in_orm_pool(
+                self._is_allowed, request
+            )
+        sampled = random.random() < settings.PROFILING_SAMPLE_RATE
+        if not (requested or sampled):
+            return await self.get_response(request)
+        if not _profiling_lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            return await self._aprofile(request, requested)
+        finally:
+            _profiling_lock.release()
+
+    def _profile(self, request, requested):
+        """Handle the request under the profilers and store the results"""
+        profiler = cProfile.Profile()
+        with _measuring() as measured, profiler:
+            response = self.get_response(request)
+        return self._store(request, response, requested, profiler, measured)
+
+    async def _aprofile(self, request, requested):
+        """Profile the request's work in the ORM pool and store the results"""
+        profiler = cProfile.Profile()
+        pooled = False
+
+        def profile_pooled_work():
+            nonlocal pooled
+            pooled = True
+            return profiler
+
+        with _measuring() as measured, async_views.pool_hook(
+            profile_pooled_work
+        ):
+            response = await self.get_response(request)
+        if not pooled:
+            return response
+        return self._store(request, response, requested, profiler, measured)
+
+    def _store(self, request, response, requested, profiler, measured):
+        """Save a request's profile and point the client to it if asked"""
+        profile_id = uuid.uuid4()
+        snapshot = measured.pop("snapshot")
+        info = {"requested": requested, **measured}
+        _save_profile(profile_id, request, response, profiler, snapshot, info)
+        if requested:
+            response[PROFILE_ID_HEADER] = str(profile_id)
+        return response
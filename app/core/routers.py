@@ -0,0 +1,158 @@
+"""Route user data to its shard and replica-safe reads to read replicas
+
+`ShardRouter` sends the ORM calls for users' recipe data to the user's
+shard (see core.sharding); it comes first, so replicas only serve the
+models that are not sharded when shards are configured.
+
+`ReplicaRoutingMiddleware` selects a replica for safe requests to views
+marked with ``replica_reads = True`` and `ReplicaRouter` sends the ORM reads
+made while handling them there. Clients that just wrote are pinned to the
+primary for ``REPLICA_PIN_SECONDS`` so they always read their own writes,
+and replicas lagging more than ``REPLICA_MAX_LAG_SECONDS`` are skipped.
+"""
+
+import hashlib
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+from core import sharding
+
+PIN_KEY_PREFIX = "replica-pin"
+
+_read_alias = ContextVar("read_alias", default=None)
+_lag_cache = {}
+
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+def get_read_alias():
+    """Return the replica selected for the current request, if any"""
+    return _read_alias.get()
+
+
+def set_read_alias(alias):
+    """Send the ORM reads of the current request to the given alias"""
+    _read_alias.set(alias)
+
+
+def measure_lag(alias):
+    """Return how many seconds the replica is behind the primary"""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(POSTGRES_LAG_SQL)
+        lag = cursor.fetchone()[0]
+    return float(lag or 0)
+
+
+def replica_lag(alias):
+    """Return the replica's lag, measured at most once per check interval"""
+    now = time.monotonic()
+    checked_at, lag = _lag_cache.get(alias, (None, None))
+    if (
+        checked_at is None
+        or now - checked_at > settings.REPLICA_LAG_CHECK_SECONDS
+    ):
+        try:
+            lag = measure_lag(alias)
+        except DatabaseError:
+            lag = float("inf")
+        _lag_cache[alias] = (now, lag)
+    return lag
+
+
+def choose_replica():
+    """Return a random replica that is not lagging too far behind"""
+    healthy = [
+        alias
+        for alias in settings.DATABASE_REPLICAS
+        if replica_lag(alias) <= settings.REPLICA_MAX_LAG_SECONDS
+    ]
+    return random.choice(healthy) if healthy else None
+
+
+def _client_key(request):
+    """Identify the client across requests, before authentication runs"""
+    credentials = (
+        request.META.get("HTTP_AUTHORIZATION")
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        or request.META.get("REMOTE_ADDR", "")
+    )
+    digest = hashlib.sha256(credentials.encode()).hexdigest()
+    return f"{PIN_KEY_PREFIX}:{digest}"
+
+
+def pin_to_primary(request):
+    """Send the client's reads to the primary for the pin window"""
+    cache.set(_client_key(request), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(request):
+    """Return whether the client wrote within the pin window"""
+    return cache.get(_client_key(request), False)
+
+
+class ReplicaRouter:
+    """Send reads to the replica selected for the request, writes to default"""
+
+    def db_for_read(self, model, **hints):
+        return get_read_alias()
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ShardRouter:
+    """Send reads and writes of sharded models to the owner's shard"""
+
+    def _route(self, model, hints):
+        if not sharding.is_sharded(model):
+            return None
+        instance = hints.get("instance")
+        if instance is not None:
+            if sharding.is_sharded(type(instance)) and instance._state.db:
+                return instance._state.db
+            user_id = sharding.owner_id(instance)
+            if user_id is not None:
+                return sharding.shard_for_user(user_id)
+        return sharding.current_shard()
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Sharded rows may reference users, whose rows every shard copies
+        for shared, owned in ((obj1, obj2), (obj2, obj1)):
+            if (
+                sharding.is_sharded(type(owned))
+                and not sharding.is_sharded(type(shared))
+                and owned._state.db in settings.DATABASE_SHARDS
+            ):
+                return True
+        return None
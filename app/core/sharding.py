@@ -0,0 +1,408 @@
+"""Partitioning of users' recipe data across several databases
+
+Users, tokens and jobs stay on the default database. A user's recipes,
+tags, ingredients and the rows derived from them live together on one of
+``DATABASE_SHARDS``, the default database included. New users are placed
+by a consistent-hash ring over the shards, so adding a shard only moves
+about ``1 / len(DATABASE_SHARDS)`` of the users to it, and placements are
+recorded in the UserShard directory on the default database. Lookups are
+cached in the default cache, which must be shared by all processes so a
+move is seen everywhere at once; a system check refuses to start
+otherwise. Users
+without a directory entry predate sharding and live on the default
+database. The rebalance_shards command moves users to their ring placement,
+or any user to a given shard.
+
+`core.routers.ShardRouter` sends the ORM calls for sharded models to the
+shard of the user they belong to: that of the instance at hand, else the
+shard selected with `use_shard()` or `user_shard()`, else that of the user
+authenticated for the current API request (see ``ShardRoutingMiddleware``).
+Queries with neither run against the default database, so code working
+outside requests, such as commands and jobs, selects a shard or passes
+``using`` explicitly.
+
+Each shard allocates IDs from its own range, so IDs stay unique across
+shards and moved rows keep them. Every shard holds a copy of the row of
+each user it stores data for, to satisfy foreign keys.
+"""
+
+import bisect
+import functools
+import hashlib
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import checks
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.fields import AutoFieldMixin
+
+from core import catalog, similarity
+from core.models import (
+    CatalogName,
+    Ingredient,
+    Recipe,
+    RecipeStats,
+    SimilarityBucket,
+    Tag,
+    UserShard,
+)
+from core.versions import bump_user_versions
+
+SHARDED_MODELS = {
+    model._meta.label_lower
+    for model in (
+        Recipe,
+        Recipe.tags.through,
+        Recipe.ingredients.through,
+        Tag,
+        Ingredient,
+        CatalogName,
+        RecipeStats,
+        SimilarityBucket,
+    )
+}
+DIRECTORY_KEY = "user-shard:{}"
+# Virtual nodes per shard on the hash ring
+RING_REPLICAS = 64
+# Shard ``shard<N>`` allocates IDs from ``(N + 1) * ID_RANGE`` upwards
+ID_RANGE = 1 << 40
+
+_shard_alias = ContextVar("shard_alias", default=None)
+_shard_request = ContextVar("shard_request", default=None)
+
+
+class UserMoveConflict(Exception):
+    """Raised when a user's data changes on the source during a move"""
+
+
+def _hash(key):
+    """Return a stable 64-bit hash of a string"""
+    return int.from_bytes(
+        hashlib.blake2b(key.encode(), digest_size=8).digest(), "big"
+    )
+
+
+class HashRing:
+    """Consistent-hash ring mapping keys to database aliases"""
+
+    def __init__(self, aliases, replicas=RING_REPLICAS):
+        points = sorted(
+            (_hash(f"{alias}:{replica}"), alias)
+            for alias in aliases
+            for replica in range(replicas)
+        )
+        self.hashes = [point for point, _ in points]
+        self.aliases = [alias for _, alias in points]
+
+    def lookup(self, key):
+        """Return the alias owning a key"""
+        index = bisect.bisect(self.hashes, _hash(str(key)))
+        return self.aliases[index % len(self.aliases)]
+
+
+@functools.lru_cache(maxsize=None)
+def _ring(aliases):
+    return HashRing(aliases)
+
+
+def is_enabled():
+    """Return whether several shards are configured"""
+    return bool(settings.DATABASE_SHARDS)
+
+
+def shard_aliases():
+    """Return the aliases of the databases holding recipe data"""
+    return settings.DATABASE_SHARDS or [DEFAULT_DB_ALIAS]
+
+
+def is_sharded(model):
+    """Return whether the rows of a model are partitioned by user"""
+    return is_enabled() and model._meta.label_lower in SHARDED_MODELS
+
+
+def placement(user_id):
+    """Return the shard the hash ring places a user on"""
+    return _ring(tuple(shard_aliases())).lookup(user_id)
+
+
+def shard_for_user(user_id):
+    """Return the shard holding a user's data, cached for a while"""
+    if not is_enabled():
+        return DEFAULT_DB_ALIAS
+    key = DIRECTORY_KEY.format(user_id)
+    alias = cache.get(key)
+    if alias is None:
+        alias = (
+            UserShard.objects.using(DEFAULT_DB_ALIAS)
+            .filter(user_id=user_id)
+            .values_list("alias", flat=True)
+            .first()
+        ) or DEFAULT_DB_ALIAS
+        cache.set(key, alias, settings.SHARD_DIRECTORY_CACHE_SECONDS)
+    return alias
+
+
+def check_directory_cache(app_configs, **kwargs):
+    """Report a shard directory cached separately by each process"""
+    if is_enabled() and isinstance(caches["default"], LocMemCache):
+        return [
+            checks.Error(
+                "Sharding requires a cache shared by all processes.",
+                hint="Set CACHE_LOCATION, or the shard of a moved user stays "
+                "cached in other processes.",
+                id="core.E001",
+            )
+        ]
+    return []
+
+
+def assign_shard(user):
+    """Place a new user on a shard and return the shard"""
+    alias = placement(user.pk)
+    UserShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        user_id=user.pk, defaults={"alias": alias}
+    )
+    forget_user(user.pk)
+    if alias != DEFAULT_DB_ALIAS:
+        mirror_users([user], alias)
+    return alias
+
+
+def assign_shards(users):
+    """Place new users created without save(), e.g. by bulk_create()"""
+    placed = defaultdict(list)
+    for user in users:
+        placed[placement(user.pk)].append(user)
+    UserShard.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        [
+            UserShard(user_id=user.pk, alias=alias)
+            for alias, users in placed.items()
+            for user in users
+        ],
+        ignore_conflicts=True,
+    )
+    for alias, users in placed.items():
+        if alias != DEFAULT_DB_ALIAS:
+            mirror_users(users, alias)
+
+
+def forget_user(user_id):
+    """Drop the cached shard of a user"""
+    cache.delete(DIRECTORY_KEY.format(user_id))
+
+
+def mirror_users(users, using):
+    """Copy users' rows to a shard, unless they are there already"""
+    User = get_user_model()
+    User.objects.using(using).bulk_create(
+        [
+            User(
+                **{
+                    field.attname: getattr(user, field.attname)
+                    for field in User._meta.concrete_fields
+                }
+            )
+            for user in users
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+@contextmanager
+def use_shard(alias):
+    """Route queries without other hints to a shard"""
+    token = _shard_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _shard_alias.reset(token)
+
+
+def user_shard(user_id):
+    """Route queries without other hints to a user's shard"""
+    return use_shard(shard_for_user(user_id))
+
+
+def set_shard_request(request):
+    """Route queries without other hints by the request's user"""
+    _shard_request.set(request)
+
+
+def current_shard():
+    """Return the shard queries without other hints are routed to"""
+    alias = _shard_alias.get()
+    if alias is None:
+        # Authentication sets the user of the underlying Django request too
+        user = getattr(_shard_request.get(), "user", None)
+        if user is not None and user.is_authenticated:
+            alias = shard_for_user(user.pk)
+    return alias
+
+
+def owner_id(instance):
+    """Return the ID of the user an instance's data belongs to"""
+    if isinstance(instance, get_user_model()):
+        return instance.pk
+    return getattr(instance, "user_id", None)
+
+
+def id_offset(alias):
+    """Return the start of the ID range of a shard"""
+    if not alias.startswith("shard"):
+        return 0
+    return (int(alias[len("shard") :]) + 1) * ID_RANGE
+
+
+def reserve_id_range(sender, using, **kwargs):
+    """Move the ID sequences of a shard's tables into its range
+
+    Connected to ``post_migrate``; sequences already in range are left
+    alone.
+    """
+    start = id_offset(using)
+    connection = connections[using]
+    if not start or connection.vendor not in ("postgresql", "sqlite"):
+        return
+    with connection.cursor() as cursor:
+        for model in sender.get_models(include_auto_created=True):
+            if (
+                model._meta.label_lower not in SHARDED_MODELS
+                or not isinstance(model._meta.pk, AutoFieldMixin)
+            ):
+                continue
+            table = model._meta.db_table
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT pg_get_serial_sequence(%s, %s)",
+                    [table, model._meta.pk.column],
+                )
+                [sequence] = cursor.fetchone()
+                cursor.execute(f"SELECT last_value FROM {sequence}")
+                if cursor.fetchone()[0] < start:
+                    cursor.execute("SELECT setval(%s, %s)", [sequence, start])
+                continue
+            cursor.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = %s", [table]
+            )
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)",
+                    [table, start],
+                )
+            elif row[0] < start:
+                cursor.execute(
+                    "UPDATE sqlite_sequence SET seq = %s WHERE name = %s",
+                    [start, table],
+                )
+
+
+def _user_querysets(user_id, using):
+    """Return the querysets of a user's sharded rows, parents first"""
+    return [
+        Tag.objects.using(using).filter(user_id=user_id),
+        Ingredient.objects.using(using).filter(user_id=user_id),
+        Recipe.objects.using(using).filter(user_id=user_id),
+        Recipe.tags.through.objects.using(using).filter(
+            recipe__user_id=user_id
+        ),
+        Recipe.ingredients.through.objects.using(using).filter(
+            recipe__user_id=user_id
+        ),
+        RecipeStats.objects.using(using).filter(user_id=user_id),
+    ]
+
+
+def _delete_user_rows(user_id, using):
+    """Delete a user's sharded rows from a database"""
+    for queryset in reversed(_user_querysets(user_id, using)[:3]):
+        queryset.delete()
+    RecipeStats.objects.using(using).filter(user_id=user_id).delete()
+
+
+def _copy_user_rows(user_id, source, target):
+    """Copy a user's sharded rows and return the number copied
+
+    Names are interned again in the target's catalog, and similarity
+    buckets are rebuilt there rather than copied.
+    """
+    copied = 0
+    for queryset in _user_querysets(user_id, source):
+        rows = list(queryset)
+        if queryset.model in catalog.MODELS:
+            # bulk_create() interns the names again on the target
+            for row in rows:
+                row.name, row.catalog_name_id = row.name, None
+        queryset.model.objects.using(target).bulk_create(rows, batch_size=500)
+        copied += len(rows)
+    similarity.index_recipes(
+        Recipe.objects.using(target)
+        .filter(user_id=user_id)
+        .values_list("id", flat=True),
+        target,
+    )
+    return copied
+
+
+def _row_keys(user_id, using):
+    """Return the primary keys of a user's sharded rows per model"""
+    return [
+        set(queryset.values_list("pk", flat=True))
+        for queryset in _user_querysets(user_id, using)
+    ]
+
+
+def move_user(user_id, target):
+    """Move a user's data to another shard and return the rows moved
+
+    The user's row on the source is locked for the duration of the move,
+    which on PostgreSQL blocks the inserts of new rows referencing it, and
+    so do the locks on their existing rows for new links. Should rows still
+    appear on the source during the copy, the move fails and is rolled back
+    rather than deleting them. The user's data version is bumped along with
+    the switch of their directory entry. Leftovers of an interrupted move to
+    the same target are replaced.
+    """
+    source = shard_for_user(user_id)
+    if source == target:
+        return 0
+    User = get_user_model()
+    user = User.objects.using(DEFAULT_DB_ALIAS).get(pk=user_id)
+    with transaction.atomic(using=source):
+        list(
+            User.objects.using(source)
+            .select_for_update()
+            .filter(pk=user_id)
+            .values_list("pk", flat=True)
+        )
+        for queryset in _user_querysets(user_id, source)[:3]:
+            list(queryset.select_for_update().values_list("pk", flat=True))
+        keys = _row_keys(user_id, source)
+        with transaction.atomic(using=target):
+            _delete_user_rows(user_id, target)
+            if target != DEFAULT_DB_ALIAS:
+                mirror_users([user], target)
+            copied = _copy_user_rows(user_id, source, target)
+            if _row_keys(user_id, source) != keys:
+                raise UserMoveConflict(
+                    f"User {user_id} wrote to {source} during the move"
+                )
+            bump_user_versions([user_id])
+            UserShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+                user_id=user_id, defaults={"alias": target}
+            )
+            forget_user(user_id)
+            # Also once committed, in case the old entry was cached meanwhile
+            transaction.on_commit(
+                functools.partial(forget_user, user_id), using=DEFAULT_DB_ALIAS
+            )
+        _delete_user_rows(user_id, source)
+        if source != DEFAULT_DB_ALIAS:
+            User.objects.using(source).filter(pk=user_id).delete()
+    return copied
@@ -0,0 +1,257 @@
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.db.models.signals import pre_delete, pre_save
+from django.dispatch import receiver
+
+from core import catalog, jobs, sharding, similarity, tasks
+from core.models import Ingredient, Recipe, Tag, User
+from core.snapshots import linked_recipe_ids, refresh_snapshots
+from core.stats import apply_change, stored_price
+from core.versions import bump_user_version
+
+
+def _refresh_snapshots(recipe_ids, relations, using):
+    """Refresh the snapshots of recipes, in a job if there are many"""
+    recipe_ids = list(recipe_ids)
+    if len(recipe_ids) <= settings.SNAPSHOT_INLINE_RECIPES:
+        refresh_snapshots(recipe_ids, relations, using)
+        return
+    transaction.on_commit(
+        partial(
+            jobs.enqueue,
+            tasks.refresh_recipe_snapshots,
+            {
+                "recipe_ids": recipe_ids,
+                "relations": list(relations),
+                "using": using,
+            },
+        ),
+        using=using,
+    )
+
+
+def _apply_stats_change(user_id, using, **change):
+    """Fold a change into a user's stats, rebuilding them if incomplete
+
+    A stats row created for a user who already has other recipes, e.g. one
+    whose stats were never built, only counts this recipe, so a rebuild is
+    queued.
+    """
+    created = apply_change(user_id, using=using, **change)
+    if created and Recipe.objects.using(using).filter(user_id=user_id)[1:2]:
+        transaction.on_commit(
+            partial(
+                jobs.enqueue,
+                tasks.rebuild_recipe_stats,
+                {"user_id": user_id},
+                dedup_key=f"rebuild-recipe-stats:{user_id}",
+            ),
+            using=using,
+        )
+
+
+def _relation_changed(relation):
+    """Return an m2m_changed handler keeping one snapshot in sync
+
+    The similarity buckets of the affected recipes are rebuilt as well.
+    Signals sent with ``batch=True`` are skipped: their sender rebuilds all
+    the recipes at once (see core.links).
+    """
+
+    def handler(sender, instance, action, reverse, pk_set, using, **kwargs):
+        if kwargs.get("batch"):
+            return
+        if not reverse:
+            if action not in ("post_add", "post_remove", "post_clear"):
+                return
+            recipe_ids = [instance.pk]
+        elif action == "pre_clear":
+            instance._snapshot_recipe_ids = linked_recipe_ids(instance, using)
+            return
+        elif action == "post_clear":
+            recipe_ids = getattr(instance, "_snapshot_recipe_ids", [])
+        elif action in ("post_add", "post_remove"):
+            recipe_ids = pk_set
+        else:
+            return
+        _refresh_snapshots(recipe_ids, (relation,), using)
+        similarity.index_recipes(recipe_ids, using)
+
+    return handler
+
+
+update_tag_snapshots = _relation_changed("tags")
+update_ingredient_snapshots = _relation_changed("ingredients")
+m2m_changed.connect(update_tag_snapshots, sender=Recipe.tags.through)
+m2m_changed.connect(
+    update_ingredient_snapshots, sender=Recipe.ingredients.through
+)
+
+RELATIONS = {Tag: "tags", Ingredient: "ingredients"}
+
+
+@receiver(pre_save, sender=Tag)
+@receiver(pre_save, sender=Ingredient)
+def intern_name(sender, instance, using, **kwargs):
+    """Point a tag or ingredient at the catalog entry of a new name"""
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "catalog_name" not in update_fields:
+        return
+    # Only names that were read or set are cached on the instance
+    name = instance.__dict__.get("_name")
+    if name is None or (
+        instance.catalog_name_id is not None
+        and instance.catalog_name.value == name
+    ):
+        return
+    instance.catalog_name_id = catalog.intern([name], using)[name]
+    instance._renamed = instance.pk is not None
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def refresh_renamed_snapshots(sender, instance, created, using, **kwargs):
+    """Propagate a tag or ingredient rename to the recipes using it"""
+    if created or not instance.__dict__.pop("_renamed", False):
+        return
+    _refresh_snapshots(
+        linked_recipe_ids(instance, using), (RELATIONS[sender],), using
+    )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_deleted_links(sender, instance, using, **kwargs):
+    """Record the recipes linked to a tag or ingredient being deleted"""
+    instance._snapshot_recipe_ids = linked_recipe_ids(instance, using)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def refresh_deleted_snapshots(sender, instance, using, **kwargs):
+    """Drop a deleted tag or ingredient from the recipes that used it"""
+    recipe_ids = getattr(instance, "_snapshot_recipe_ids", [])
+    _refresh_snapshots(recipe_ids, (RELATIONS[sender],), using)
+    similarity.index_recipes(recipe_ids, using)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_previous_stats_values(sender, instance, using, **kwargs):
+    """Record the stored values of a recipe about to be updated"""
+    instance._stats_previous = None
+    if instance._state.adding:
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and not {
+        "user",
+        "user_id",
+        "time_minutes",
+        "price",
+    }.intersection(update_fields):
+        return
+    instance._stats_previous = (
+        Recipe.objects.using(using)
+        .filter(pk=instance.pk)
+        .values_list("user_id", "time_minutes", "price")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def update_stats_on_save(sender, instance, created, using, **kwargs):
+    """Fold a created or updated recipe into its owner's statistics"""
+    previous = getattr(instance, "_stats_previous", None)
+    if not created and previous is None:
+        return
+    current = (instance.time_minutes, stored_price(instance.price))
+    if created:
+        _apply_stats_change(instance.user_id, using, added=current)
+        return
+    previous_user_id, *previous_values = previous
+    if previous_user_id != instance.user_id:
+        _apply_stats_change(previous_user_id, using, removed=previous_values)
+        _apply_stats_change(instance.user_id, using, added=current)
+    elif tuple(previous_values) != current:
+        _apply_stats_change(
+            instance.user_id, using, removed=previous_values, added=current
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def update_stats_on_delete(sender, instance, using, **kwargs):
+    """Remove a deleted recipe from its owner's statistics"""
+    removed = (instance.time_minutes, stored_price(instance.price))
+    apply_change(instance.user_id, removed=removed, using=using)
+
+
+DETAIL_FIELDS = {"title", "time_minutes", "price", "link"}
+
+
+@receiver(pre_save, sender=Recipe)
+def bump_detail_version(sender, instance, **kwargs):
+    """Give a recipe being saved a new detail version"""
+    if kwargs.get("update_fields") is None:
+        instance.detail_version = uuid.uuid4()
+
+
+@receiver(post_save, sender=Recipe)
+def bump_detail_version_on_partial_save(sender, instance, using, **kwargs):
+    """Bump the detail version when saving only some of the fields"""
+    update_fields = kwargs.get("update_fields")
+    if update_fields is None or "detail_version" in update_fields:
+        return
+    if DETAIL_FIELDS.intersection(update_fields):
+        instance.detail_version = uuid.uuid4()
+        Recipe.objects.using(using).filter(pk=instance.pk).update(
+            detail_version=instance.detail_version
+        )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_version_on_write(sender, instance, using, **kwargs):
+    """Invalidate the owner's cached derived data after a write"""
+    bump_user_version(instance.user_id, using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_version_on_link_change(sender, instance, action, using, **kwargs):
+    """Invalidate the owner's cached derived data after relinking"""
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_user_version(instance.user_id, using)
+
+
+@receiver(post_save, sender=User)
+def place_new_user(sender, instance, created, using, raw, **kwargs):
+    """Assign a shard to a user created on the default database"""
+    if (
+        created
+        and not raw
+        and using == DEFAULT_DB_ALIAS
+        and sharding.is_enabled()
+    ):
+        sharding.assign_shard(instance)
+
+
+@receiver(pre_delete, sender=User)
+def remember_user_shard(sender, instance, using, **kwargs):
+    """Record the shard of a user being deleted"""
+    instance._shard_alias = sharding.shard_for_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def delete_user_shard_data(sender, instance, using, **kwargs):
+    """Delete a deleted user's data from their shard"""
+    alias = getattr(instance, "_shard_alias", DEFAULT_DB_ALIAS)
+    if using == DEFAULT_DB_ALIAS and alias != DEFAULT_DB_ALIAS:
+        User.objects.using(alias).filter(pk=instance.pk).delete()
+    sharding.forget_user(instance.pk)
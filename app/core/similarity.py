@@ -0,0 +1,168 @@
+"""MinHash/LSH index of recipes with overlapping tags and ingredients
+
+Each recipe is a set of tokens, one per linked tag and ingredient. Its
+MinHash signature keeps, for each of ``BANDS * ROWS`` hash functions, the
+smallest hash of any token; two recipes agree on a signature value with a
+probability equal to the Jaccard similarity of their sets. Signatures are
+cut into ``BANDS`` bands of ``ROWS`` values, and each band is stored as a
+SimilarityBucket key hashed together with the owner's ID. Recipes sharing
+any key are candidates, which are then ranked by their exact Jaccard
+similarity, so a lookup only reads the recipe's bucket-mates.
+
+With 16 bands of 2 rows, recipes with a similarity of 0.5 share a bucket
+with a probability of 99%, and 0.3 with 78%. Buckets are rebuilt by
+core.signals whenever the links of a recipe change; use the
+rebuild_similarity_index command to index existing recipes.
+"""
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from core.models import Recipe, SimilarityBucket
+
+BANDS = 16
+ROWS = 2
+SEED = 20240601
+
+
+def recipe_tokens(tag_ids, ingredient_ids):
+    """Return the token set of a recipe's tag and ingredient IDs"""
+    return {tag_id * 2 for tag_id in tag_ids} | {
+        ingredient_id * 2 + 1 for ingredient_id in ingredient_ids
+    }
+
+
+def snapshot_tokens(recipe):
+    """Return the token set of a recipe from its snapshots"""
+    return recipe_tokens(
+        [tag_id for tag_id, _ in recipe.tag_snapshot],
+        [ingredient_id for ingredient_id, _ in recipe.ingredient_snapshot],
+    )
+
+
+def jaccard(a, b):
+    """Return the Jaccard similarity of two sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _hash_params(np):
+    """Return the odd multipliers and offsets of the hash functions"""
+    rng = np.random.default_rng(SEED)
+    high = np.iinfo(np.uint64).max
+    multipliers = rng.integers(1, high, BANDS * ROWS, dtype=np.uint64)
+    offsets = rng.integers(0, high, BANDS * ROWS, dtype=np.uint64)
+    return multipliers | np.uint64(1), offsets
+
+
+def signatures(token_sets):
+    """Return the MinHash signatures of non-empty token sets as a matrix"""
+    import numpy as np
+
+    multipliers, offsets = _hash_params(np)
+    lengths = np.array([len(tokens) for tokens in token_sets])
+    tokens = np.fromiter(
+        (token for tokens in token_sets for token in tokens),
+        dtype=np.uint64,
+        count=int(lengths.sum()),
+    )
+    # Multiply-shift hashing; uint64 arithmetic wraps around
+    hashes = (tokens[:, None] * multipliers + offsets) >> np.uint64(32)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return np.minimum.reduceat(hashes, starts, axis=0)
+
+
+def bucket_keys(user_ids, token_sets):
+    """Return the LSH bucket keys of non-empty token sets as a matrix
+
+    Row ``i`` holds the ``BANDS`` keys of ``token_sets[i]``, owned by
+    ``user_ids[i]``.
+    """
+    import numpy as np
+
+    bands = signatures(token_sets).reshape(len(token_sets), BANDS, ROWS)
+    keys = np.asarray(user_ids, dtype=np.uint64)[:, None] * np.uint64(
+        0x9E3779B97F4A7C15
+    ) ^ np.arange(BANDS, dtype=np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+    for row in range(ROWS):
+        keys = (keys ^ bands[:, :, row]) * np.uint64(0x165667B19E3779F9)
+        keys ^= keys >> np.uint64(29)
+    # Fit the keys into a signed 64-bit column
+    return (keys >> np.uint64(1)).astype(np.int64)
+
+
+def index_recipes(recipe_ids, using=DEFAULT_DB_ALIAS):
+    """Rebuild the similarity buckets of the given recipes"""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    tags, ingredients = {}, {}
+    for relation, links in (("tags", tags), ("ingredients", ingredients)):
+        field = Recipe._meta.get_field(relation)
+        target = f"{field.m2m_reverse_field_name()}_id"
+        rows = (
+            field.remote_field.through.objects.using(using)
+            .filter(recipe_id__in=recipe_ids)
+            .values_list("recipe_id", target)
+        )
+        for recipe_id, target_id in rows:
+            links.setdefault(recipe_id, []).append(target_id)
+    owners = dict(
+        Recipe.objects.using(using)
+        .filter(id__in=recipe_ids)
+        .values_list("id", "user_id")
+    )
+    indexed = [
+        recipe_id
+        for recipe_id in owners
+        if recipe_id in tags or recipe_id in ingredients
+    ]
+    buckets = []
+    if indexed:
+        keys = bucket_keys(
+            [owners[recipe_id] for recipe_id in indexed],
+            [
+                recipe_tokens(
+                    tags.get(recipe_id, ()), ingredients.get(recipe_id, ())
+                )
+                for recipe_id in indexed
+            ],
+        )
+        buckets = [
+            SimilarityBucket(recipe_id=recipe_id, key=key)
+            for recipe_id, row in zip(indexed, keys.tolist())
+            for key in row
+        ]
+    with transaction.atomic(using=using, savepoint=False):
+        SimilarityBucket.objects.using(using).filter(
+            recipe_id__in=recipe_ids
+        ).delete()
+        SimilarityBucket.objects.using(using).bulk_create(
+            buckets, batch_size=1000
+        )
+
+
+def candidate_recipes(recipe, using=DEFAULT_DB_ALIAS):
+    """Return the other recipes of the owner sharing a bucket with recipe"""
+    return (
+        Recipe.objects.using(using)
+        .filter(
+            user_id=recipe.user_id,
+            similarity_buckets__key__in=SimilarityBucket.objects.using(using)
+            .filter(recipe_id=recipe.id)
+            .values("key"),
+        )
+        .exclude(id=recipe.id)
+        .distinct()
+    )
+
+
+def similar_recipes(recipe, limit, using=DEFAULT_DB_ALIAS):
+    """Return up to ``limit`` (similarity, recipe) pairs, most similar first"""
+    tokens = snapshot_tokens(recipe)
+    scored = [
+        (jaccard(tokens, snapshot_tokens(candidate)), candidate)
+        for candidate in candidate_recipes(recipe, using)
+    ]
+    scored.sort(key=lambda pair: (-pair[0], pair[1].id))
+    return [pair for pair in scored[:limit] if pair[0] > 0]
@@ -0,0 +1,71 @@
+"""Denormalized tag and ingredient snapshots stored on each recipe
+
+List reads serialize the snapshots instead of querying the M2M through
+tables. Each snapshot is a list of ``[id, name]`` pairs ordered by ID.
+"""
+
+import uuid
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS
+
+from core.models import Recipe
+
+SNAPSHOT_FIELDS = {
+    "tags": "tag_snapshot",
+    "ingredients": "ingredient_snapshot",
+}
+
+
+def build_snapshots(recipe_ids, relation, using=DEFAULT_DB_ALIAS):
+    """Return the current snapshot of a relation for each of the recipes"""
+    field = Recipe._meta.get_field(relation)
+    target = field.m2m_reverse_field_name()
+    rows = (
+        field.remote_field.through.objects.using(using)
+        .filter(recipe_id__in=recipe_ids)
+        .order_by("recipe_id", f"{target}_id")
+        .values_list(
+            "recipe_id", f"{target}_id", f"{target}__catalog_name__value"
+        )
+    )
+    snapshots = defaultdict(list)
+    for recipe_id, target_id, name in rows:
+        snapshots[recipe_id].append([target_id, name])
+    return snapshots
+
+
+def refresh_snapshots(
+    recipe_ids, relations=tuple(SNAPSHOT_FIELDS), using=DEFAULT_DB_ALIAS
+):
+    """Rebuild the snapshots of the given recipes from the through tables
+
+    The detail version of each recipe is replaced too, as its nested tags
+    and ingredients have changed.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    fields = [SNAPSHOT_FIELDS[relation] for relation in relations]
+    fields.append("detail_version")
+    snapshots = {
+        relation: build_snapshots(recipe_ids, relation, using)
+        for relation in relations
+    }
+    recipes = [
+        Recipe(
+            id=recipe_id,
+            detail_version=uuid.uuid4(),
+            **{
+                SNAPSHOT_FIELDS[relation]: snapshots[relation][recipe_id]
+                for relation in relations
+            },
+        )
+        for recipe_id in recipe_ids
+    ]
+    Recipe.objects.using(using).bulk_update(recipes, fields, batch_size=500)
+
+
+def linked_recipe_ids(instance, using=DEFAULT_DB_ALIAS):
+    """Return the IDs of the recipes linked to a tag or ingredient"""
+    return list(instance.recipe_set.using(using).values_list("id", flat=True))
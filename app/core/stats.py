@@ -0,0 +1,74 @@
+"""Incremental maintenance of the per-user RecipeStats rows"""
+
+from collections import Counter
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.backends.utils import format_number
+from django.db.models import Count, Sum
+
+from core.models import Recipe, RecipeStats
+
+PRICE_FIELD = Recipe._meta.get_field("price")
+
+
+def stored_price(price):
+    """Return a price rounded the way it is written to the database"""
+    price = PRICE_FIELD.to_python(price)
+    return Decimal(
+        format_number(
+            price, PRICE_FIELD.max_digits, PRICE_FIELD.decimal_places
+        )
+    )
+
+
+def apply_change(user_id, removed=None, added=None, using=DEFAULT_DB_ALIAS):
+    """Remove and/or add one recipe's (time_minutes, price) from the stats
+
+    Returns whether the user's stats row had to be created.
+    """
+    with transaction.atomic(using=using):
+        queryset = RecipeStats.objects.using(using).select_for_update()
+        if added is None:
+            # Nothing to remove from when the row is gone, e.g. when the
+            # user is being deleted along with their recipes
+            stats = queryset.filter(user_id=user_id).first()
+            if stats is None:
+                return False
+            created = False
+        else:
+            stats, created = queryset.get_or_create(user_id=user_id)
+        counts = Counter(stats.time_minutes_counts)
+        for sign, values in ((-1, removed), (1, added)):
+            if values is None:
+                continue
+            time_minutes, price = values
+            stats.recipe_count += sign
+            stats.time_minutes_total += sign * time_minutes
+            stats.price_total += sign * price
+            counts[str(time_minutes)] += sign
+        stats.time_minutes_counts = {
+            minutes: count for minutes, count in counts.items() if count
+        }
+        stats.save(using=using)
+    return created
+
+
+def compute_stats(user_id, using=DEFAULT_DB_ALIAS):
+    """Compute a user's statistics from scratch"""
+    recipes = Recipe.objects.using(using).filter(user_id=user_id)
+    totals = recipes.aggregate(
+        recipe_count=Count("id"),
+        time_minutes_total=Sum("time_minutes"),
+        price_total=Sum("price"),
+    )
+    counts = recipes.values_list("time_minutes").annotate(count=Count("id"))
+    return RecipeStats(
+        user_id=user_id,
+        recipe_count=totals["recipe_count"],
+        time_minutes_total=totals["time_minutes_total"] or 0,
+        price_total=totals["price_total"] or Decimal("0"),
+        time_minutes_counts={
+            str(minutes): count for minutes, count in counts.order_by()
+        },
+    )
@@ -0,0 +1,27 @@
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from core import jobs, sharding
+from core.models import RecipeStats
+from core.snapshots import SNAPSHOT_FIELDS, refresh_snapshots
+from core.stats import compute_stats
+
+
+@jobs.task
+def rebuild_recipe_stats(user_id):
+    """Recompute the recipe statistics of a user"""
+    using = sharding.shard_for_user(user_id)
+    stats = RecipeStats.objects.using(using)
+    with transaction.atomic(using=using):
+        # Lock the row so concurrent signal updates queue behind us
+        list(stats.select_for_update().filter(user_id=user_id))
+        stats.filter(user_id=user_id).delete()
+        stats.bulk_create([compute_stats(user_id, using)])
+
+
+@jobs.task
+def refresh_recipe_snapshots(
+    recipe_ids, relations=tuple(SNAPSHOT_FIELDS), using=DEFAULT_DB_ALIAS
+):
+    """Rebuild the tag/ingredient snapshots of recipes"""
+    with transaction.atomic(using=using):
+        refresh_snapshots(recipe_ids, relations, using)
@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core import profiling
+from core.models import Recipe, Tag
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+ME_URL = reverse("user:me")
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+@override_settings(ROOT_URLCONF="app.urls_asgi")
+class AsyncViewTests(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="testpassword", name="test"
+        )
+        token = Token.objects.create(user=self.user)
+        self.headers = {"HTTP_AUTHORIZATION": f"Token {token.key}"}
+        self.async_headers = {"AUTHORIZATION": f"Token {token.key}"}
+
+    async def test_async_read_endpoints(self):
+        """Test that the hot read endpoints are served asynchronously"""
+        response = await self.async_client.get(ME_URL, **self.async_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["email"], "test@test.com")
+        response = await self.async_client.get(
+            RECIPES_URL, **self.async_headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [])
+
+    async def test_async_login_required(self):
+        """Test that async endpoints still require authentication"""
+        response = await self.async_client.get(TAGS_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_async_detail_and_writes(self):
+        """Test that details are served and writes still go through"""
+        recipe = Recipe.objects.create(
+            user=self.user, title="recipe", time_minutes=1, price=1.0
+        )
+        response = self.client.get(detail_url(recipe.id), **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["title"], "recipe")
+        response = self.client.post(TAGS_URL, {"name": "tag"}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Tag.objects.filter(user=self.user).exists())
+
+    async def test_async_query_stats_recorded(self):
+        """Test that queries run in the ORM pool are recorded"""
+        labels = {"route": "async-recipe:tag-list", "method": "GET"}
+
+        def recorded():
+            return (
+                REGISTRY.get_sample_value("db_queries_per_request_sum", labels)
+                or 0
+            )
+
+        before = recorded()
+        response = await self.async_client.get(TAGS_URL, **self.async_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(recorded(), before)
+
+    async def test_async_request_profiled(self):
+        """Test that sampled async requests profile the pooled view"""
+        with tempfile.TemporaryDirectory() as profiling_dir:
+            with override_settings(
+                PROFILING_ENABLED=True,
+                PROFILING_SAMPLE_RATE=1,
+                PROFILING_DIR=profiling_dir,
+            ):
+                response = await self.async_client.get(
+                    TAGS_URL, **self.async_headers
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            [profile_id] = os.listdir(profiling_dir)
+            with open(
+                os.path.join(profiling_dir, profile_id, profiling.FOLDED_FILE)
+            ) as f:
+                self.assertIn("_render_view", f.readline())
+            with open(
+                os.path.join(profiling_dir, profile_id, profiling.SUMMARY_FILE)
+            ) as f:
+                self.assertEqual(json.load(f)["status"], 200)
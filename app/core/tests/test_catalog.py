@@ -0,0 +1,114 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import CatalogName, Ingredient, Recipe, Tag
+
+TAGS_URL = reverse("recipe:tag-list")
+
+
+class CatalogTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com")
+        self.other = get_user_model().objects.create_user("other@test.com")
+
+    def test_names_shared_across_users(self):
+        """Test that equal names of different users share a catalog entry"""
+        mine = Ingredient.objects.create(user=self.user, name=" sea\t salt ")
+        theirs = Ingredient.objects.create(
+            user=self.other, name=" sea\t salt "
+        )
+        tag = Tag.objects.create(user=self.other, name="Sea Salt")
+
+        mine.refresh_from_db()
+        self.assertEqual(mine.name, " sea\t salt ")
+        self.assertEqual(tag.name, "Sea Salt")
+        self.assertEqual(mine.catalog_name_id, theirs.catalog_name_id)
+        self.assertNotEqual(tag.catalog_name_id, mine.catalog_name_id)
+        self.assertEqual(
+            set(CatalogName.objects.values_list("key", flat=True)),
+            {"sea salt"},
+        )
+
+    def test_unchanged_name_not_interned(self):
+        """Test that saving a row without renaming it skips the catalog"""
+        Tag.objects.create(user=self.user, name="spicy")
+        tag = Tag.objects.get(user=self.user)
+
+        with self.assertNumQueries(1):
+            tag.save()
+
+    def test_rename_interns_new_name(self):
+        """Test that saving only the name also updates the catalog entry"""
+        tag = Tag.objects.create(user=self.user, name="spicy")
+        tag.name = "hot"
+        tag.save(update_fields=["name"])
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.catalog_name.value, "hot")
+
+    def test_api_unchanged(self):
+        """Test that the tag API neither exposes nor accepts the entry"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        entry = CatalogName.objects.create(value="other")
+
+        res = client.post(
+            TAGS_URL, {"name": "vegan ", "catalog_name": entry.id}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(res.data), {"id", "name"})
+        tag = Tag.objects.get(id=res.data["id"])
+        self.assertEqual(tag.catalog_name.value, "vegan")
+        self.assertEqual(client.get(TAGS_URL).data[0]["name"], "vegan")
+
+    def test_bulk_create_interns_names(self):
+        """Test that bulk-created rows reference the entries of their names"""
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(user=self.user, name="Rice"),
+                Ingredient(user=self.other, name="Rice"),
+            ]
+        )
+
+        self.assertEqual(
+            list(Ingredient.objects.values_list("name", flat=True)),
+            ["Rice", "Rice"],
+        )
+        self.assertEqual(CatalogName.objects.count(), 1)
+
+    def test_rename_refreshes_snapshots(self):
+        """Test that renaming an ingredient updates the recipes using it"""
+        beans = Ingredient.objects.create(user=self.user, name="beans")
+        recipe = Recipe.objects.create(
+            user=self.user, title="r", time_minutes=1, price=1
+        )
+        recipe.ingredients.add(beans)
+
+        beans.name = "black beans"
+        beans.save()
+
+        recipe.refresh_from_db()
+        self.assertEqual(
+            recipe.ingredient_snapshot, [[beans.id, "black beans"]]
+        )
+
+    def test_prune_catalog_command(self):
+        """Test that catalog entries no row uses are pruned"""
+        Tag.objects.create(user=self.user, name="kept")
+        Tag.objects.create(user=self.user, name="unused").delete()
+
+        out = StringIO()
+        call_command("prune_catalog", stdout=out)
+
+        self.assertIn("Pruned 1 unused catalog names", out.getvalue())
+        self.assertEqual(
+            list(CatalogName.objects.values_list("value", flat=True)),
+            ["kept"],
+        )
@@ -1,37 +1,250 @@
-import logging
+import csv
+import io
+import json
+import os
+import tempfile
+import time
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
 from unittest.mock import patch
 
+from core.management.commands.profile_imports import parse_importtime
+from core.models import Recipe
 
-class CommandTests(TestCase):
-    def setUp(self):
-        logging.disable(logging.CRITICAL)
+PROBE = "core.management.commands.wait_for_db.Command._probe"
 
+
+class CommandTests(TestCase):
     def test_wait_for_db_ready(self):
         """Test on waiting until db is available, while available"""
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.return_value = True
-            call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 1)
+        with patch(PROBE) as probe:
+            probe.return_value = None
+            out = io.StringIO()
+            call_command("wait_for_db", stdout=out)
+            self.assertEqual(probe.call_count, 1)
+        self.assertIn("Waiting for database(s): default", out.getvalue())
+        self.assertIn("'default' is available after", out.getvalue())
+
+    def test_wait_for_db_queries_database(self):
+        """Test that availability is checked with a real query"""
+        call_command("wait_for_db", stdout=io.StringIO())
 
     @patch("time.sleep", return_value=True)
-    def test_wait_for_db(self, _):
+    def test_wait_for_db(self, sleep):
         """Test on waiting until db is available"""
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            # Throw an OperationalError 5 times, then return True
-            gi.side_effect = [
+        with patch(PROBE) as probe:
+            # Throw an OperationalError 5 times, then succeed
+            probe.side_effect = [
                 OperationalError,
                 OperationalError,
                 OperationalError,
                 OperationalError,
                 OperationalError,
-                True,
+                None,
             ]
-            call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 6)
+            out = io.StringIO()
+            call_command("wait_for_db", stdout=out)
+            self.assertEqual(probe.call_count, 6)
+        self.assertEqual(out.getvalue().count("unavailable; retrying"), 5)
+        self.assertIn("(6 attempts)", out.getvalue())
+
+    @patch("time.sleep", return_value=True)
+    def test_wait_for_db_backoff(self, sleep):
+        """Test that the delay between attempts grows up to the maximum"""
+        with patch(PROBE) as probe:
+            probe.side_effect = [OperationalError] * 8 + [None]
+            call_command(
+                "wait_for_db",
+                initial_delay=0.01,
+                max_delay=0.5,
+                stdout=io.StringIO(),
+            )
+        pauses = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(pauses), 8)
+        self.assertLess(pauses[0], 0.01 + 1e-9)
+        self.assertGreaterEqual(pauses[-1], 0.25)
+        self.assertLessEqual(max(pauses), 0.5)
+
+    def test_wait_for_db_timeout(self):
+        """Test that the command fails once the timeout has passed"""
+        with patch(PROBE) as probe:
+            probe.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command("wait_for_db", timeout=0, stdout=io.StringIO())
+
+    def test_wait_for_several_databases(self):
+        """Test that every requested database alias is checked"""
+        with patch(PROBE) as probe:
+            call_command(
+                "wait_for_db",
+                databases=["default", "replica"],
+                stdout=io.StringIO(),
+            )
+        probed = sorted(call.args[0] for call in probe.call_args_list)
+        self.assertEqual(probed, ["default", "replica"])
+
+
+class ProvisionUsersTests(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+
+    def write(self, name, content):
+        """Write an input file and return its path"""
+        path = os.path.join(self.tempdir.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_provision_users_from_csv(self):
+        """Test that users and tokens are created from a CSV file"""
+        path = self.write(
+            "users.csv",
+            "email,password,name\n"
+            "one@test.com,testpass1,One\n"
+            "two@test.com,,Two\n",
+        )
+        tokens_path = os.path.join(self.tempdir.name, "tokens.csv")
+        call_command(
+            "provision_users",
+            path,
+            workers=1,
+            tokens_output=tokens_path,
+            stdout=io.StringIO(),
+        )
+
+        one = get_user_model().objects.get(email="one@test.com")
+        self.assertEqual(one.name, "One")
+        self.assertTrue(one.check_password("testpass1"))
+        two = get_user_model().objects.get(email="two@test.com")
+        self.assertFalse(two.has_usable_password())
+        with open(tokens_path) as f:
+            issued = dict(csv.reader(f))
+        self.assertEqual(
+            issued["one@test.com"], Token.objects.get(user=one).key
+        )
+        self.assertEqual(len(issued), 2)
+
+    def test_provision_users_skips_existing(self):
+        """Test that taken emails are skipped with one query per batch"""
+        get_user_model().objects.create_user("taken@test.com")
+        path = self.write(
+            "users.ndjson",
+            "\n".join(
+                json.dumps({"email": email})
+                for email in [
+                    "taken@test.com",
+                    "new1@test.com",
+                    "new1@test.com",
+                    "new2@test.com",
+                    "new3@test.com",
+                ]
+            ),
+        )
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                "provision_users", path, workers=1, batch_size=2, stdout=out
+            )
+
+        self.assertIn("Created 3 users, skipped 2", out.getvalue())
+        self.assertEqual(Token.objects.count(), 3)
+        lookups = [
+            query
+            for query in queries
+            if query["sql"].startswith('SELECT "core_user"."email"')
+        ]
+        self.assertEqual(len(lookups), 3)
+
+
+class GcMediaTests(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        override = override_settings(MEDIA_ROOT=self.tempdir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = get_user_model().objects.create_user("test@test.com")
+
+    def make_file(self, name, age_hours=48):
+        """Create a media file last modified the given hours ago"""
+        path = os.path.join(self.tempdir.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        mtime = time.time() - age_hours * 3600
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def make_recipe(self, image):
+        """Create a recipe pointing at an image"""
+        return Recipe.objects.create(
+            user=self.user, title="a", time_minutes=1, price=1, image=image
+        )
+
+    def test_gc_media_deletes_orphans(self):
+        """Test that only old unreferenced files are deleted"""
+        kept = self.make_file("uploads/recipe/kept.jpg")
+        self.make_recipe("uploads/recipe/kept.jpg")
+        orphans = [
+            self.make_file(f"uploads/recipe/{name}.jpg")
+            for name in ("a", "b", "nested/c")
+        ]
+        recent = self.make_file("uploads/recipe/recent.jpg", age_hours=1)
+        out = io.StringIO()
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command("gc_media", batch_size=2, stdout=out)
+
+        self.assertTrue(os.path.exists(kept))
+        self.assertTrue(os.path.exists(recent))
+        for path in orphans:
+            self.assertFalse(os.path.exists(path))
+        self.assertIn("deleted 3 orphaned files", out.getvalue())
+        self.assertIn("reclaiming 30 bytes", out.getvalue())
+        self.assertLessEqual(len(queries), 3)
+
+    def test_gc_media_dry_run(self):
+        """Test that a dry run reports orphans without deleting them"""
+        orphan = self.make_file("uploads/recipe/a.jpg")
+        out = io.StringIO()
+
+        call_command("gc_media", dry_run=True, stdout=out)
+
+        self.assertTrue(os.path.exists(orphan))
+        self.assertIn("found 1 orphaned files", out.getvalue())
+
+    def test_gc_media_missing_directory(self):
+        """Test that a missing media directory is an error"""
+        with self.assertRaises(CommandError):
+            call_command("gc_media", stdout=io.StringIO())
+
+
+class ProfileImportsTests(TestCase):
+    def test_parse_importtime(self):
+        """Test that -X importtime output is parsed with nesting"""
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   encodings.idna\n"
+            "import time:      1500 |       1620 | app.wsgi\n"
+        )
+        self.assertEqual(
+            parse_importtime(output),
+            [("encodings.idna", 120, 120, 1), ("app.wsgi", 1500, 1620, 0)],
+        )
 
-    def tearDown(self):
-        logging.disable(logging.NOTSET)
+    def test_heavy_modules_not_imported_at_startup(self):
+        """Test that NumPy and Pillow are only imported when used"""
+        out = io.StringIO()
+        call_command("profile_imports", limit=10000, stdout=out)
+        modules = {line.split()[-1] for line in out.getvalue().splitlines()}
+        self.assertIn("recipe.views", modules)
+        self.assertNotIn("numpy", modules)
+        self.assertNotIn("PIL", modules)
@@ -0,0 +1,114 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.db.health import check_connection_health
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        """Open a fake connection"""
+        connection = MagicMock(name=f"connection{len(self.opened)}")
+        self.opened.append(connection)
+        return connection
+
+    def test_released_connection_reused(self):
+        """Test that a released connection is handed out again"""
+        pool = ConnectionPool(self.connect, max_size=2)
+        connection = pool.acquire()
+        pool.release(connection)
+        self.assertIs(pool.acquire(), connection)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_min_size_prefilled(self):
+        """Test that the pool opens min_size connections up front"""
+        pool = ConnectionPool(self.connect, min_size=3, max_size=5)
+        pool.acquire()
+        self.assertEqual(len(self.opened), 3)
+        self.assertEqual(pool.size, 3)
+        self.assertEqual(pool.idle, 2)
+
+    def test_acquire_times_out(self):
+        """Test that acquiring from an exhausted pool times out"""
+        pool = ConnectionPool(self.connect, max_size=1, timeout=0.01)
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+
+    def test_waiter_woken_on_release(self):
+        """Test that a waiting thread gets the next released connection"""
+        pool = ConnectionPool(self.connect, max_size=1, timeout=5)
+        connection = pool.acquire()
+        acquired = []
+        waiter = threading.Thread(
+            target=lambda: acquired.append(pool.acquire())
+        )
+        waiter.start()
+        pool.release(connection)
+        waiter.join()
+        self.assertEqual(acquired, [connection])
+
+    def test_broken_connection_discarded(self):
+        """Test that connections failing the reset check are closed"""
+        pool = ConnectionPool(
+            self.connect, reset=lambda connection: False, max_size=1
+        )
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.close.assert_called_once()
+        self.assertEqual(pool.size, 0)
+        self.assertIsNot(pool.acquire(), connection)
+
+    def test_failed_connect_frees_slot(self):
+        """Test that a failing connect does not leak a pool slot"""
+        connect = MagicMock(side_effect=[OSError, MagicMock()])
+        pool = ConnectionPool(connect, max_size=1, timeout=0.01)
+        with self.assertRaises(OSError):
+            pool.acquire()
+        pool.acquire()
+
+
+class ConnectionHealthTests(TestCase):
+    def test_unusable_connection_closed(self):
+        """Test that an unusable persistent connection is closed"""
+        connection = MagicMock(in_atomic_block=False)
+        connection.is_usable.return_value = False
+        with patch("core.db.health.connections") as connections:
+            connections.all.return_value = [connection]
+            check_connection_health()
+        connection.close.assert_called_once()
+
+    def test_usable_connection_kept(self):
+        """Test that usable connections are left open"""
+        connection = MagicMock(in_atomic_block=False)
+        connection.is_usable.return_value = True
+        with patch("core.db.health.connections") as connections:
+            connections.all.return_value = [connection]
+            check_connection_health()
+        connection.close.assert_not_called()
+
+    def test_recently_checked_connection_skipped(self):
+        """Test that a connection is checked once per interval"""
+        connection = MagicMock(in_atomic_block=False)
+        connection.is_usable.return_value = True
+        with patch("core.db.health.connections") as connections:
+            connections.all.return_value = [connection]
+            check_connection_health()
+            check_connection_health()
+            self.assertEqual(connection.is_usable.call_count, 1)
+
+            with override_settings(DB_CONN_HEALTH_CHECK_INTERVAL=0):
+                check_connection_health()
+        self.assertEqual(connection.is_usable.call_count, 2)
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=False)
+    def test_health_checks_disabled(self):
+        """Test that no checks are made when disabled"""
+        with patch("core.db.health.connections") as connections:
+            check_connection_health()
+        connections.all.assert_not_called()
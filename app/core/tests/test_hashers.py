@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from core import hashers
+
+TOKEN_URL = reverse("user:token")
+
+
+class HasherTests(TestCase):
+    """Test the configurable password hashers"""
+
+    def test_scrypt_round_trip(self):
+        """Test that scrypt hashes verify only the right password"""
+        hasher = hashers.ScryptPasswordHasher(work_factor=2**10)
+        encoded = hasher.encode("testpass", hasher.salt())
+        self.assertTrue(encoded.startswith("scrypt$1024$"))
+        self.assertTrue(hasher.verify("testpass", encoded))
+        self.assertFalse(hasher.verify("wrongpass", encoded))
+
+    def test_must_update_on_parameter_change(self):
+        """Test that hashes with other cost parameters need an update"""
+        for weak, strong in (
+            (
+                hashers.ScryptPasswordHasher(work_factor=2**10),
+                hashers.ScryptPasswordHasher(work_factor=2**11),
+            ),
+            (
+                hashers.Argon2PasswordHasher(time_cost=1, memory_cost=1024),
+                hashers.Argon2PasswordHasher(time_cost=2, memory_cost=1024),
+            ),
+        ):
+            encoded = weak.encode("testpass", weak.salt())
+            self.assertFalse(weak.must_update(encoded))
+            self.assertTrue(strong.must_update(encoded))
+
+
+class LoginHashingTests(TestCase):
+    """Test password hashing during login"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com")
+
+    def login(self):
+        """Log in through the token endpoint and return the response"""
+        return self.client.post(
+            TOKEN_URL, {"email": "test@test.com", "password": "testpass"}
+        )
+
+    def test_hash_upgraded_on_login(self):
+        """Test that a PBKDF2 hash is replaced with Argon2 on login"""
+        self.user.password = make_password("testpass", hasher="pbkdf2_sha256")
+        self.user.save()
+
+        self.assertEqual(self.login().status_code, 200)
+
+        self.user.refresh_from_db()
+        self.assertEqual(
+            identify_hasher(self.user.password).algorithm, "argon2"
+        )
+        self.assertTrue(self.user.check_password("testpass"))
+
+    def test_login_cpu_time_recorded(self):
+        """Test that the CPU time of logins is recorded by result"""
+        self.user.set_password("testpass")
+        self.user.save()
+
+        def count(result):
+            return (
+                REGISTRY.get_sample_value(
+                    "login_cpu_seconds_count", {"result": result}
+                )
+                or 0
+            )
+
+        before = count("success"), count("failure")
+        self.login()
+        self.client.post(
+            TOKEN_URL, {"email": "test@test.com", "password": "wrong"}
+        )
+        self.assertEqual(
+            (count("success"), count("failure")),
+            (before[0] + 1, before[1] + 1),
+        )
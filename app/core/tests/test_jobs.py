@@ -0,0 +1,243 @@
+import io
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job, Recipe, RecipeStats, Tag
+
+calls = []
+
+
+@jobs.task
+def record(value):
+    """Remember the value it was called with"""
+    calls.append(value)
+
+
+@jobs.task
+def explode():
+    """Always fail"""
+    raise ValueError("boom")
+
+
+def run_claimed():
+    """Claim and run every due job; return their new statuses"""
+    return [jobs.run_job(job) for job in jobs.claim_jobs(10)]
+
+
+@override_settings(JOB_RETRY_BASE_DELAY=2, JOB_RETRY_MAX_DELAY=5)
+class JobQueueTests(TestCase):
+    """Test enqueueing, claiming and running jobs"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_job(self):
+        """Test that a claimed job is called with its arguments"""
+        job = jobs.enqueue(record, {"value": 3})
+
+        self.assertEqual(run_claimed(), [Job.DONE])
+
+        job.refresh_from_db()
+        self.assertEqual(calls, [3])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished)
+
+    def test_dedup_key(self):
+        """Test that a queued job with the same key is reused"""
+        first = jobs.enqueue(record, {"value": 1}, dedup_key="k")
+        second = jobs.enqueue(record, {"value": 2}, dedup_key="k")
+        self.assertEqual(first.pk, second.pk)
+
+        run_claimed()
+        third = jobs.enqueue(record, {"value": 3}, dedup_key="k")
+
+        self.assertNotEqual(third.pk, first.pk)
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_delayed_job_not_claimed(self):
+        """Test that jobs are only claimed once they are due"""
+        jobs.enqueue(record, {"value": 1}, delay=60)
+        self.assertEqual(jobs.claim_jobs(10), [])
+
+    def test_claim_once(self):
+        """Test that a claimed job is not claimed again within its lease"""
+        jobs.enqueue(record, {"value": 1})
+        self.assertEqual(len(jobs.claim_jobs(10)), 1)
+        self.assertEqual(jobs.claim_jobs(10), [])
+
+    def test_expired_lease_reclaimed(self):
+        """Test that a job whose worker vanished is claimed again"""
+        jobs.enqueue(record, {"value": 1})
+        (stale,) = jobs.claim_jobs(10)
+        Job.objects.update(locked_until=timezone.now())
+
+        (job,) = jobs.claim_jobs(10)
+        self.assertEqual(job.attempts, 2)
+        # The outcome of the vanished worker is discarded
+        jobs.run_job(stale)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+
+    def test_expired_lease_on_last_attempt_fails(self):
+        """Test that a lapsed job without attempts left is not run again"""
+        job = jobs.enqueue(record, {"value": 1}, max_attempts=1)
+        jobs.claim_jobs(10)
+        Job.objects.update(locked_until=timezone.now())
+
+        self.assertEqual(jobs.claim_jobs(10), [])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.claim, "")
+        self.assertIsNotNone(job.finished)
+        self.assertEqual(job.last_error, jobs.LEASE_EXPIRED_ERROR)
+
+    def test_retry_with_backoff(self):
+        """Test that failed attempts are retried after a growing delay"""
+        job = jobs.enqueue(explode, max_attempts=3)
+        delays = []
+        for _ in range(2):
+            self.assertEqual(run_claimed(), ["retry"])
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.QUEUED)
+            self.assertIn("boom", job.last_error)
+            delays.append((job.run_at - timezone.now()).total_seconds())
+            Job.objects.update(run_at=timezone.now())
+        self.assertTrue(0.5 < delays[0] <= 2)
+        self.assertTrue(1 < delays[1] <= 4)
+
+        self.assertEqual(run_claimed(), [Job.FAILED])
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 3)
+
+    def test_retry_merged_into_queued_duplicate(self):
+        """Test that a failed attempt defers to a duplicate queued meanwhile"""
+        running = jobs.enqueue(explode, dedup_key="k")
+        (claimed,) = jobs.claim_jobs(10)
+        duplicate = jobs.enqueue(explode, dedup_key="k")
+
+        self.assertEqual(jobs.run_job(claimed), "merged")
+
+        running.refresh_from_db()
+        self.assertEqual(running.status, Job.FAILED)
+        self.assertIn("boom", running.last_error)
+        self.assertEqual(Job.objects.get(status=Job.QUEUED).pk, duplicate.pk)
+
+    def test_retry_delay_capped(self):
+        """Test that the backoff does not exceed the maximum delay"""
+        self.assertLessEqual(jobs.retry_delay(20), 5)
+
+    def test_unknown_task_fails(self):
+        """Test that a job for an unregistered task is not retried"""
+        jobs.enqueue("core.tests.test_jobs.missing")
+        self.assertEqual(run_claimed(), [Job.FAILED])
+
+    def test_rebuild_recipe_stats_task(self):
+        """Test the stats rebuild task"""
+        user = get_user_model().objects.create_user("test@test.com")
+        Recipe.objects.create(user=user, title="a", time_minutes=5, price=3)
+        RecipeStats.objects.filter(user=user).delete()
+
+        jobs.enqueue("core.tasks.rebuild_recipe_stats", {"user_id": user.id})
+
+        self.assertEqual(run_claimed(), [Job.DONE])
+        self.assertEqual(RecipeStats.objects.get(user=user).recipe_count, 1)
+
+    def test_incomplete_stats_rebuilt(self):
+        """Test that stats created next to older recipes are rebuilt"""
+        user = get_user_model().objects.create_user("test@test.com")
+        Recipe.objects.create(user=user, title="a", time_minutes=5, price=3)
+        RecipeStats.objects.filter(user=user).delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(
+                user=user, title="b", time_minutes=10, price=4
+            )
+
+        self.assertEqual(RecipeStats.objects.get(user=user).recipe_count, 1)
+        self.assertEqual(run_claimed(), [Job.DONE])
+        self.assertEqual(RecipeStats.objects.get(user=user).recipe_count, 2)
+
+    @override_settings(SNAPSHOT_INLINE_RECIPES=0)
+    def test_many_snapshots_refreshed_by_job(self):
+        """Test that renames touching many recipes refresh them in a job"""
+        user = get_user_model().objects.create_user("test@test.com")
+        recipe = Recipe.objects.create(
+            user=user, title="a", time_minutes=5, price=3
+        )
+        tag = Tag.objects.create(user=user, name="spicy")
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.add(tag)
+        self.assertEqual(run_claimed(), [Job.DONE])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = "hot"
+            tag.save()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_snapshot, [[tag.id, "spicy"]])
+        self.assertEqual(run_claimed(), [Job.DONE])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_snapshot, [[tag.id, "hot"]])
+
+
+class RunWorkerTests(TransactionTestCase):
+    """Test the run_worker command"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_worker_once(self):
+        """Test that the worker drains the due jobs and exits"""
+        for value in range(10):
+            jobs.enqueue(record, {"value": value})
+        jobs.enqueue(explode, max_attempts=1)
+        jobs.enqueue(record, {"value": 99}, delay=60)
+        out = io.StringIO()
+
+        call_command("run_worker", "--once", "--concurrency", "3", stdout=out)
+
+        self.assertEqual(sorted(calls), list(range(10)))
+        self.assertIn("Ran 11 jobs, 10 done, 1 failed", out.getvalue())
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 10)
+        self.assertEqual(Job.objects.filter(status=Job.FAILED).count(), 1)
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+    def test_run_worker_survives_runner_errors(self):
+        """Test that a job runner crash does not stop the worker"""
+        jobs.enqueue(record, {"value": 1})
+        jobs.enqueue(record, {"value": 2})
+        run_job = jobs.run_job
+
+        def flaky(job, using):
+            if job.kwargs["value"] == 1:
+                raise RuntimeError("lost connection")
+            return run_job(job, using)
+
+        out = io.StringIO()
+        with patch("core.jobs.run_job", side_effect=flaky), self.assertLogs(
+            "core.management.commands.run_worker", "ERROR"
+        ):
+            call_command("run_worker", "--once", stdout=out)
+
+        self.assertEqual(calls, [2])
+        self.assertIn("Ran 2 jobs, 1 error, 1 done", out.getvalue())
+
+    def test_run_worker_stops_on_signal(self):
+        """Test that a stop request ends the polling loop"""
+        from core.management.commands.run_worker import Command
+
+        def stop(seconds):
+            command.stopping = True
+
+        command = Command(stdout=io.StringIO())
+        with patch("time.sleep", side_effect=stop) as sleep:
+            call_command(command)
+        self.assertEqual(sleep.call_count, 1)
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+METRICS_URL = reverse("metrics")
+TAGS_URL = reverse("recipe:tag-list")
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="testpassword", name="test"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_metrics_exposed(self):
+        """Test that the metrics endpoint uses the Prometheus text format"""
+        response = self.client.get(METRICS_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+    def test_request_recorded_per_route(self):
+        """Test that requests are recorded with their route and method"""
+        self.client.get(TAGS_URL)
+        content = self.client.get(METRICS_URL).content.decode()
+        samples = [
+            line.split("{")[0]
+            for line in content.splitlines()
+            if 'method="GET",route="recipe:tag-list"' in line
+        ]
+        for name in [
+            "http_requests_total",
+            "http_request_duration_seconds_bucket",
+            "http_response_size_bytes_bucket",
+            "db_queries_per_request_bucket",
+        ]:
+            self.assertIn(name, samples)
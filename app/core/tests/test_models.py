@@ -3,7 +3,8 @@ from unittest.mock import patch
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from core import models
+from core import models, tokens
+from core.versions import bump_user_version, get_user_version
 
 
 def sample_user(email="test@test.com", password="testpassword"):
@@ -46,6 +47,21 @@ class ModelTests(TestCase):
         self.assertTrue(user.is_superuser)
         self.assertTrue(user.is_staff)
 
+    def test_stale_user_save_keeps_counters(self):
+        """Test that saving a stale user does not roll back its counters"""
+        user = sample_user()
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_user_version(user.id)
+        tokens.revoke_tokens(user)
+
+        user.name = "renamed"
+        user.save()
+
+        user.refresh_from_db()
+        self.assertEqual(user.name, "renamed")
+        self.assertEqual(user.token_version, 1)
+        self.assertEqual(get_user_version(user.id), 1)
+
     def test_tag_str(self):
         """Test the tag string representation"""
         tag = models.Tag.objects.create(
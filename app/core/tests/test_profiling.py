@@ -0,0 +1,115 @@
+import os.path
+import pstats
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import profiling
+
+TAGS_URL = reverse("recipe:tag-list")
+
+
+def profile_url(profile_id):
+    """Return the URL of a stored profile"""
+    return reverse("profile", args=[profile_id])
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.profiling_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            PROFILING_ENABLED=True, PROFILING_DIR=self.profiling_dir.name
+        )
+        self.settings_override.enable()
+        self.staff_user = get_user_model().objects.create_superuser(
+            email="admin@test.com", password="password"
+        )
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="password", name="test"
+        )
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        """Authenticate the client with a token like the API clients do"""
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_staff_request_profiled(self):
+        """Test that staff users can profile a request with a header"""
+        self.authenticate(self.staff_user)
+        response = self.client.get(TAGS_URL, HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        profile_id = response[profiling.PROFILE_ID_HEADER]
+        for filename in [
+            profiling.PSTATS_FILE,
+            profiling.FOLDED_FILE,
+            profiling.ALLOCATIONS_FILE,
+            profiling.SUMMARY_FILE,
+        ]:
+            path = profiling.profile_path(profile_id, filename)
+            self.assertTrue(os.path.exists(path))
+        pstats.Stats(profiling.profile_path(profile_id, profiling.PSTATS_FILE))
+
+        response = self.client.get(profile_url(profile_id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["path"], TAGS_URL)
+        self.assertTrue(response.data["top_functions"])
+
+    def test_non_staff_request_not_profiled(self):
+        """Test that regular users cannot profile requests"""
+        self.authenticate(self.user)
+        response = self.client.get(TAGS_URL, {"profile": "1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(profiling.PROFILE_ID_HEADER, response)
+        self.assertEqual(os.listdir(self.profiling_dir.name), [])
+
+    def test_sampled_request_profiled(self):
+        """Test that sampled requests are stored without exposing the ID"""
+        self.authenticate(self.user)
+        with override_settings(PROFILING_SAMPLE_RATE=1.0):
+            response = self.client.get(TAGS_URL)
+        self.assertNotIn(profiling.PROFILE_ID_HEADER, response)
+        self.assertEqual(len(os.listdir(self.profiling_dir.name)), 1)
+
+    def test_profile_retrieval_staff_only(self):
+        """Test that regular users cannot read stored profiles"""
+        self.authenticate(self.staff_user)
+        response = self.client.get(TAGS_URL, HTTP_X_PROFILE="1")
+        profile_id = response[profiling.PROFILE_ID_HEADER]
+        self.authenticate(self.user)
+        response = self.client.get(profile_url(profile_id))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_MAX_PROFILES=2)
+    def test_old_profiles_pruned(self):
+        """Test that only the most recent profiles are kept"""
+        unrelated = os.path.join(self.profiling_dir.name, "keep")
+        os.makedirs(unrelated)
+        self.authenticate(self.user)
+        for _ in range(3):
+            self.client.get(TAGS_URL)
+
+        self.assertEqual(len(os.listdir(self.profiling_dir.name)), 3)
+        self.assertTrue(os.path.isdir(unrelated))
+
+    def test_folded_stacks_file(self):
+        """Test retrieving the collapsed-stack flamegraph file"""
+        self.authenticate(self.staff_user)
+        response = self.client.get(TAGS_URL, HTTP_X_PROFILE="1")
+        profile_id = response[profiling.PROFILE_ID_HEADER]
+        response = self.client.get(profile_url(profile_id), {"file": "folded"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        line = b"".join(response.streaming_content).splitlines()[0]
+        stack, microseconds = line.rsplit(b" ", 1)
+        self.assertTrue(stack)
+        self.assertGreater(int(microseconds), 0)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.profiling_dir.cleanup()
@@ -0,0 +1,148 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import routers
+from core.models import Ingredient, Recipe
+from recipe import analytics, autocomplete, pantry
+
+RECIPES_URL = reverse("recipe:recipe-list")
+REPLICA = "replica0"
+
+
+class ReplicaRoutingTests(TestCase):
+    """Test read routing with a SQLite database standing in for a replica"""
+
+    @classmethod
+    def setUpClass(cls):
+        # The replica is only registered once the test runner has set up the
+        # test databases, so its schema is created here
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.databases[REPLICA] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.path.join(cls.replica_dir.name, "replica.sqlite3"),
+        }
+        call_command("migrate", database=REPLICA, verbosity=0)
+        cls.databases = {"default", REPLICA}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections.databases[REPLICA]
+        cls.replica_dir.cleanup()
+
+    def setUp(self):
+        self.settings_override = override_settings(DATABASE_REPLICAS=[REPLICA])
+        self.settings_override.enable()
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="testpassword", name="test"
+        )
+        token = Token.objects.create(user=self.user)
+        # Replicate the credentials so the replica can authenticate
+        self.user.save(using=REPLICA)
+        token.save(using=REPLICA)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def create_recipe(self, using, title):
+        """Create a recipe in the given database"""
+        recipe = Recipe(user=self.user, title=title, time_minutes=1, price=1)
+        recipe.save(using=using)
+        return recipe
+
+    def test_safe_requests_read_from_replica(self):
+        """Test that recipe list reads are served by the replica"""
+        self.create_recipe("default", "primary")
+        self.create_recipe(REPLICA, "replica")
+        response = self.client.get(RECIPES_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["title"] for r in response.data], ["replica"])
+
+    def test_reads_pinned_to_primary_after_write(self):
+        """Test that clients read their own writes after writing"""
+        payload = {"title": "new", "time_minutes": 1, "price": 1.0}
+        response = self.client.post(RECIPES_URL, payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(RECIPES_URL)
+        self.assertEqual([r["title"] for r in response.data], ["new"])
+
+    def test_lagging_replica_skipped(self):
+        """Test that reads fall back to the primary when replicas lag"""
+        self.create_recipe("default", "primary")
+        with patch("core.routers.measure_lag", return_value=60.0):
+            routers._lag_cache.clear()
+            response = self.client.get(RECIPES_URL)
+        routers._lag_cache.clear()
+        self.assertEqual([r["title"] for r in response.data], ["primary"])
+
+    def test_unavailable_replica_skipped(self):
+        """Test that replicas failing the lag check are not used"""
+        with patch("core.routers.measure_lag") as measure_lag:
+            measure_lag.side_effect = routers.DatabaseError
+            routers._lag_cache.clear()
+            self.assertIsNone(routers.choose_replica())
+        routers._lag_cache.clear()
+
+    def test_read_alias_reset_after_request(self):
+        """Test that replica selection does not leak past the request"""
+        self.client.get(RECIPES_URL)
+        self.assertIsNone(routers.get_read_alias())
+
+    def test_analytics_computed_from_primary(self):
+        """Test that the cached analytics ignore the replica"""
+        self.create_recipe("default", "primary")
+
+        routers.set_read_alias(REPLICA)
+        try:
+            result = analytics.compute_analytics(self.user.id, 10)
+        finally:
+            routers.set_read_alias(None)
+
+        self.assertEqual(result["recipe_count"], 1)
+
+    def test_pantry_index_built_from_primary(self):
+        """Test that the cached pantry index ignores the replica"""
+        rice = Ingredient.objects.create(user=self.user, name="rice")
+        recipe = self.create_recipe("default", "primary")
+        recipe.ingredients.add(rice)
+
+        routers.set_read_alias(REPLICA)
+        try:
+            recipe_ids, ingredient_ids, _ = pantry.build_index(self.user.id)
+        finally:
+            routers.set_read_alias(None)
+
+        self.assertEqual(recipe_ids.tolist(), [recipe.id])
+        self.assertEqual(ingredient_ids.tolist(), [rice.id])
+
+    @override_settings(AUTOCOMPLETE_CACHE_USERS=10)
+    def test_autocomplete_array_loaded_from_primary(self):
+        """Test that the cached autocomplete names ignore the replica"""
+        Ingredient.objects.create(user=self.user, name="rice")
+        queryset = Ingredient.objects.filter(user=self.user)
+
+        routers.set_read_alias(REPLICA)
+        try:
+            rows = autocomplete.search_memory(queryset, self.user.id, "r", 5)
+        finally:
+            routers.set_read_alias(None)
+        autocomplete._arrays.clear()
+
+        self.assertEqual([name for _, name, _ in rows], ["rice"])
+
+    def tearDown(self):
+        self.settings_override.disable()
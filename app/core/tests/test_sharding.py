@@ -0,0 +1,340 @@
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import sharding
+from core.versions import get_user_version
+from core.models import (
+    CatalogName,
+    Recipe,
+    RecipeStats,
+    SimilarityBucket,
+    Tag,
+    UserShard,
+)
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+SHARDS = ["shard0", "shard1"]
+
+
+class HashRingTests(SimpleTestCase):
+    def test_adding_shard_moves_few_keys(self):
+        """Test that a new shard only takes its share of the keys"""
+        before = sharding.HashRing(["default", "shard0", "shard1"])
+        after = sharding.HashRing(["default", "shard0", "shard1", "shard2"])
+        keys = range(10000)
+
+        moved = [
+            key for key in keys if before.lookup(key) != after.lookup(key)
+        ]
+
+        self.assertTrue(all(after.lookup(key) == "shard2" for key in moved))
+        self.assertGreater(len(moved), len(keys) / 8)
+        self.assertLess(len(moved), len(keys) * 3 / 8)
+
+    def test_id_ranges(self):
+        """Test that each shard allocates IDs from its own range"""
+        self.assertEqual(sharding.id_offset("default"), 0)
+        self.assertEqual(sharding.id_offset("shard0"), sharding.ID_RANGE)
+        self.assertEqual(sharding.id_offset("shard1"), 2 * sharding.ID_RANGE)
+
+
+@override_settings(DATABASE_SHARDS=["default", *SHARDS])
+class ShardingTests(TestCase):
+    """Test user sharding with SQLite databases standing in for shards"""
+
+    @classmethod
+    def setUpClass(cls):
+        # The shards are only registered once the test runner has set up the
+        # test databases, so their schema is created here
+        cls.shard_dir = tempfile.TemporaryDirectory()
+        for alias in SHARDS:
+            connections.databases[alias] = {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": os.path.join(cls.shard_dir.name, f"{alias}.sqlite3"),
+            }
+            call_command("migrate", database=alias, verbosity=0)
+        cls.databases = {"default", *SHARDS}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in SHARDS:
+            connections[alias].close()
+            del connections.databases[alias]
+        cls.shard_dir.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_user("test@test.com", "default")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_user(self, email, alias):
+        """Create a user and move them to the given shard"""
+        user = get_user_model().objects.create_user(email)
+        sharding.move_user(user.id, alias)
+        return user
+
+    def create_data(self):
+        """Create a tagged recipe through the API"""
+        tag = self.client.post(TAGS_URL, {"name": "vegan"}).data
+        return self.client.post(
+            RECIPES_URL,
+            {
+                "title": "chili",
+                "time_minutes": 30,
+                "price": 5.0,
+                "tags": [tag["id"]],
+            },
+        ).data
+
+    def test_new_users_placed_by_ring(self):
+        """Test that new users are assigned their ring placement"""
+        for index in range(10):
+            user = get_user_model().objects.create_user(f"u{index}@test.com")
+            alias = sharding.placement(user.id)
+            self.assertEqual(UserShard.objects.get(user=user).alias, alias)
+            self.assertEqual(sharding.shard_for_user(user.id), alias)
+            if alias != "default":
+                self.assertTrue(
+                    get_user_model().objects.using(alias).filter(pk=user.pk)
+                )
+
+    def test_api_routes_to_user_shard(self):
+        """Test that a user's API calls read and write their shard only"""
+        sharding.move_user(self.user.id, "shard1")
+
+        recipe = self.create_data()
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id"] for r in res.data], [recipe["id"]])
+        self.assertGreater(recipe["id"], sharding.id_offset("shard1"))
+        self.assertTrue(Recipe.objects.using("shard1").filter(id=recipe["id"]))
+        self.assertFalse(Recipe.objects.using("default").exists())
+        self.assertFalse(Tag.objects.using("shard0").exists())
+
+    def test_move_user(self):
+        """Test that moving a user copies their data and keeps the IDs"""
+        other = self.create_user("other@test.com", "default")
+        Tag.objects.create(user=other, name="vegan")
+        recipe = self.create_data()
+        detail = self.client.get(f"{RECIPES_URL}{recipe['id']}/").data
+
+        out = StringIO()
+        call_command(
+            "rebalance_shards", user=self.user.email, to="shard0", stdout=out
+        )
+
+        self.assertIn("Moved 1 users (4 rows)", out.getvalue())
+        self.assertEqual(sharding.shard_for_user(self.user.id), "shard0")
+        self.assertEqual(
+            self.client.get(f"{RECIPES_URL}{recipe['id']}/").data, detail
+        )
+        moved = Recipe.objects.using("shard0").get(id=recipe["id"])
+        self.assertEqual(moved.tag_snapshot, [[recipe["tags"][0], "vegan"]])
+        tag = Tag.objects.using("shard0").get()
+        self.assertEqual(
+            tag.catalog_name_id,
+            CatalogName.objects.using("shard0").get(value="vegan").id,
+        )
+        self.assertTrue(
+            RecipeStats.objects.using("shard0").filter(user=self.user)
+        )
+        self.assertTrue(
+            SimilarityBucket.objects.using("shard0").filter(recipe=moved)
+        )
+        self.assertFalse(Recipe.objects.using("default").exists())
+        self.assertEqual(
+            list(Tag.objects.using("default").values_list("user", flat=True)),
+            [other.id],
+        )
+
+    def test_move_user_fails_on_concurrent_insert(self):
+        """Test that rows written during a move fail it instead of being lost"""
+        sharding.move_user(self.user.id, "shard0")
+        recipe = self.create_data()
+        copy_user_rows = sharding._copy_user_rows
+
+        def copy_and_insert(user_id, source, target):
+            copied = copy_user_rows(user_id, source, target)
+            Tag.objects.using(source).create(user=self.user, name="late")
+            return copied
+
+        with patch.object(sharding, "_copy_user_rows", copy_and_insert):
+            with self.assertRaises(sharding.UserMoveConflict):
+                sharding.move_user(self.user.id, "shard1")
+
+        self.assertEqual(sharding.shard_for_user(self.user.id), "shard0")
+        self.assertTrue(Recipe.objects.using("shard0").filter(id=recipe["id"]))
+        self.assertEqual(
+            Tag.objects.using("shard0").filter(user=self.user).count(), 1
+        )
+        self.assertFalse(Tag.objects.using("shard1").exists())
+
+    def test_move_user_bumps_version_with_switch(self):
+        """Test that the version is bumped by the time the shard switches"""
+        before = get_user_version(self.user.id)
+        seen = []
+        forget_user = sharding.forget_user
+
+        def forget(user_id):
+            seen.append(get_user_version(user_id))
+            forget_user(user_id)
+
+        with patch.object(sharding, "forget_user", forget):
+            sharding.move_user(self.user.id, "shard0")
+
+        self.assertEqual(seen, [before + 1])
+        self.assertEqual(UserShard.objects.get(user=self.user).alias, "shard0")
+
+    def test_rebalance(self):
+        """Test that rebalancing moves users to their ring placement"""
+        users = [self.user] + [
+            self.create_user(f"u{index}@test.com", "default")
+            for index in range(5)
+        ]
+        misplaced = [
+            user for user in users if sharding.placement(user.id) != "default"
+        ]
+
+        out = StringIO()
+        call_command("rebalance_shards", dry_run=True, stdout=out)
+        self.assertIn(f"{len(misplaced)} users would be moved", out.getvalue())
+        self.assertEqual(sharding.shard_for_user(users[0].id), "default")
+
+        call_command("rebalance_shards", stdout=StringIO())
+        for user in users:
+            self.assertEqual(
+                sharding.shard_for_user(user.id), sharding.placement(user.id)
+            )
+
+    def test_rebalance_invalid_options(self):
+        """Test that unknown shards and users are rejected"""
+        for options in (
+            {"user": self.user.email, "to": "nowhere"},
+            {"user": "missing@test.com"},
+            {"to": "shard0"},
+        ):
+            with self.assertRaises(CommandError):
+                call_command("rebalance_shards", stdout=StringIO(), **options)
+
+    def test_delete_user_deletes_shard_data(self):
+        """Test that deleting a user deletes their data on their shard"""
+        sharding.move_user(self.user.id, "shard1")
+        self.create_data()
+
+        self.user.delete()
+
+        self.assertFalse(Recipe.objects.using("shard1").exists())
+        self.assertFalse(get_user_model().objects.using("shard1").exists())
+
+    def test_admin_lists_every_shard(self):
+        """Test that the admin lists and edits rows on any shard"""
+        other = self.create_user("other@test.com", "shard1")
+        Tag.objects.create(user=self.user, name="on-default")
+        with sharding.user_shard(other.id):
+            far = Tag.objects.create(user=other, name="on-shard")
+        admin = get_user_model().objects.create_superuser(
+            "admin@test.com", "password"
+        )
+        self.client.force_login(admin)
+
+        res = self.client.get(reverse("admin:core_tag_changelist"))
+        self.assertContains(res, "on-default")
+        self.assertContains(res, "on-shard")
+
+        res = self.client.get(reverse("admin:core_tag_change", args=[far.id]))
+        self.assertContains(res, "on-shard")
+
+    def test_paginator_merges_shards_in_order(self):
+        """Test that admin pages merge the shards on the list ordering"""
+        from core.admin import ShardedPaginator
+
+        other = self.create_user("other@test.com", "shard0")
+        for name in ("a", "c", "e"):
+            Tag.objects.create(user=self.user, name=name)
+        with sharding.user_shard(other.id):
+            for name in ("b", "d"):
+                Tag.objects.create(user=other, name=name)
+
+        paginator = ShardedPaginator(Tag.objects.order_by("name", "-pk"), 2)
+
+        self.assertEqual(paginator.count, 5)
+        self.assertEqual(
+            [
+                [tag.name for tag in paginator.page(number)]
+                for number in paginator.page_range
+            ],
+            [["a", "b"], ["c", "d"], ["e"]],
+        )
+
+    def test_gc_media_checks_every_shard(self):
+        """Test that images referenced on any shard are kept"""
+        other = self.create_user("other@test.com", "shard1")
+        with tempfile.TemporaryDirectory() as media, override_settings(
+            MEDIA_ROOT=media
+        ):
+            paths = {}
+            for name in ("kept", "orphan"):
+                paths[name] = os.path.join(
+                    media, "uploads", "recipe", f"{name}.jpg"
+                )
+                os.makedirs(os.path.dirname(paths[name]), exist_ok=True)
+                open(paths[name], "wb").close()
+                os.utime(paths[name], (0, 0))
+            with sharding.user_shard(other.id):
+                Recipe.objects.create(
+                    user=other,
+                    title="r",
+                    time_minutes=1,
+                    price=1,
+                    image="uploads/recipe/kept.jpg",
+                )
+
+            call_command("gc_media", stdout=StringIO())
+
+            self.assertTrue(os.path.exists(paths["kept"]))
+            self.assertFalse(os.path.exists(paths["orphan"]))
+
+    def test_check_requires_shared_cache(self):
+        """Test that sharding on a per-process cache is reported"""
+        errors = sharding.check_directory_cache(None)
+        self.assertEqual([error.id for error in errors], ["core.E001"])
+
+        with override_settings(DATABASE_SHARDS=[]):
+            self.assertEqual(sharding.check_directory_cache(None), [])
+
+    def test_provisioned_users_placed(self):
+        """Test that users created in bulk are placed on their shards"""
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+            f.write("email\n")
+            f.writelines(f"p{index}@test.com\n" for index in range(10))
+            f.flush()
+            call_command(
+                "provision_users", f.name, workers=1, stdout=StringIO()
+            )
+
+        users = get_user_model().objects.filter(email__startswith="p")
+        self.assertEqual(len(users), 10)
+        for user in users:
+            alias = sharding.placement(user.id)
+            self.assertEqual(sharding.shard_for_user(user.id), alias)
+            if alias != "default":
+                self.assertTrue(
+                    get_user_model().objects.using(alias).filter(pk=user.pk)
+                )
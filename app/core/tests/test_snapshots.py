@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Ingredient, Recipe, Tag
+
+
+class RecipeSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="testpassword"
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="recipe", time_minutes=1, price=1
+        )
+        self.tag1 = Tag.objects.create(user=self.user, name="tag1")
+        self.tag2 = Tag.objects.create(user=self.user, name="tag2")
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name="ingredient"
+        )
+
+    def snapshots(self):
+        """Return the stored snapshots of the test recipe"""
+        self.recipe.refresh_from_db()
+        return self.recipe.tag_snapshot, self.recipe.ingredient_snapshot
+
+    def test_snapshot_follows_m2m_changes(self):
+        """Test that adding, removing and clearing links update snapshots"""
+        self.recipe.tags.add(self.tag2, self.tag1)
+        self.recipe.ingredients.add(self.ingredient)
+        self.assertEqual(
+            self.snapshots(),
+            (
+                [[self.tag1.id, "tag1"], [self.tag2.id, "tag2"]],
+                [[self.ingredient.id, "ingredient"]],
+            ),
+        )
+        self.recipe.tags.remove(self.tag1)
+        self.assertEqual(self.snapshots()[0], [[self.tag2.id, "tag2"]])
+        self.recipe.tags.clear()
+        self.assertEqual(self.snapshots()[0], [])
+
+    def test_snapshot_follows_reverse_m2m_changes(self):
+        """Test that changes made from the tag side update snapshots"""
+        self.tag1.recipe_set.add(self.recipe)
+        self.assertEqual(self.snapshots()[0], [[self.tag1.id, "tag1"]])
+        self.tag1.recipe_set.clear()
+        self.assertEqual(self.snapshots()[0], [])
+
+    def test_snapshot_follows_rename(self):
+        """Test that renaming an ingredient updates snapshots"""
+        self.recipe.ingredients.add(self.ingredient)
+        self.ingredient.name = "renamed"
+        self.ingredient.save()
+        self.assertEqual(
+            self.snapshots()[1], [[self.ingredient.id, "renamed"]]
+        )
+
+    def test_snapshot_follows_delete(self):
+        """Test that deleting a tag removes it from snapshots"""
+        self.recipe.tags.add(self.tag1, self.tag2)
+        self.tag1.delete()
+        self.assertEqual(self.snapshots()[0], [[self.tag2.id, "tag2"]])
+
+    def test_repair_command(self):
+        """Test that the repair command finds and fixes drift"""
+        self.recipe.tags.add(self.tag1)
+        Recipe.objects.update(tag_snapshot=[], ingredient_snapshot=[[1, "x"]])
+        out = StringIO()
+        call_command("repair_recipe_snapshots", dry_run=True, stdout=out)
+        self.assertIn("found 1 drifted", out.getvalue())
+        self.assertEqual(self.snapshots()[0], [])
+
+        out = StringIO()
+        call_command("repair_recipe_snapshots", batch_size=1, stdout=out)
+        self.assertIn("repaired 1 drifted", out.getvalue())
+        self.assertEqual(self.snapshots(), ([[self.tag1.id, "tag1"]], []))
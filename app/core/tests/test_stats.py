@@ -0,0 +1,132 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from hypothesis import given, settings, strategies as st
+from hypothesis.extra.django import TestCase as HypothesisTestCase
+
+from core.models import Recipe, RecipeStats
+from core.stats import compute_stats
+
+prices = st.decimals(
+    min_value=0, max_value=Decimal("999.99"), places=2, allow_nan=False
+)
+time_minutes = st.integers(min_value=0, max_value=600)
+operations = st.lists(
+    st.one_of(
+        st.tuples(st.just("create"), time_minutes, prices),
+        st.tuples(st.just("update"), time_minutes, prices),
+        st.tuples(st.just("delete"), time_minutes, prices),
+        st.tuples(st.just("move"), time_minutes, prices),
+    ),
+    max_size=15,
+)
+
+
+def sample_user(email):
+    """Create a sample user, skipping the password hash for speed"""
+    return get_user_model().objects.create_user(email)
+
+
+def stored_stats(user):
+    """Return the incrementally maintained statistics of a user"""
+    return RecipeStats.objects.filter(user=user).first() or RecipeStats(
+        user=user
+    )
+
+
+def stats_values(stats):
+    """Return the fields that must match a full recomputation"""
+    return (
+        stats.recipe_count,
+        stats.time_minutes_total,
+        stats.time_minutes_counts,
+        stats.price_total,
+        stats.time_minutes_median,
+        stats.price_average,
+    )
+
+
+class RecipeStatsPropertyTests(HypothesisTestCase):
+    @settings(max_examples=40, deadline=None)
+    @given(operations)
+    def test_incremental_matches_recomputation(self, ops):
+        """Test that signal-maintained stats equal a full recomputation"""
+        user = sample_user("test@test.com")
+        other_user = sample_user("other@test.com")
+        for op, minutes, price in ops:
+            recipe = Recipe.objects.filter(user=user).first()
+            if op == "create" or recipe is None:
+                Recipe.objects.create(
+                    user=user,
+                    title="recipe",
+                    time_minutes=minutes,
+                    price=price,
+                )
+            elif op == "update":
+                recipe.time_minutes = minutes
+                recipe.price = price
+                recipe.save()
+            elif op == "delete":
+                recipe.delete()
+            else:
+                recipe.user = other_user
+                recipe.save()
+        for owner in [user, other_user]:
+            self.assertEqual(
+                stats_values(stored_stats(owner)),
+                stats_values(compute_stats(owner.id)),
+            )
+
+
+class RecipeStatsTests(TestCase):
+    def setUp(self):
+        self.user = sample_user("test@test.com")
+
+    def test_median_and_averages(self):
+        """Test the derived statistics"""
+        for minutes, price in [(10, "1.00"), (20, "2.50"), (40, "3.00")]:
+            Recipe.objects.create(
+                user=self.user,
+                title="recipe",
+                time_minutes=minutes,
+                price=Decimal(price),
+            )
+        stats = stored_stats(self.user)
+        self.assertEqual(stats.recipe_count, 3)
+        self.assertEqual(stats.time_minutes_median, 20)
+        self.assertAlmostEqual(stats.time_minutes_average, 70 / 3)
+        self.assertEqual(stats.price_total, Decimal("6.50"))
+        self.assertEqual(stats.price_average, Decimal("2.17"))
+
+    def test_float_price_rounded_like_database(self):
+        """Test that float prices are counted as they are stored"""
+        recipe = Recipe.objects.create(
+            user=self.user, title="recipe", time_minutes=1, price=1.005
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(stored_stats(self.user).price_total, recipe.price)
+
+    def test_user_deletion(self):
+        """Test that deleting a user with recipes removes their stats"""
+        Recipe.objects.create(
+            user=self.user, title="recipe", time_minutes=1, price=1
+        )
+        self.user.delete()
+        self.assertFalse(RecipeStats.objects.exists())
+
+    def test_rebuild_command(self):
+        """Test that the rebuild command backfills statistics"""
+        Recipe.objects.create(
+            user=self.user, title="recipe", time_minutes=5, price=2
+        )
+        RecipeStats.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_recipe_stats", stdout=out)
+        self.assertEqual(
+            stats_values(stored_stats(self.user)),
+            stats_values(compute_stats(self.user.id)),
+        )
+        self.assertEqual(stored_stats(self.user).recipe_count, 1)
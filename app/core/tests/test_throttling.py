@@ -0,0 +1,167 @@
+import os
+import tempfile
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import throttling
+
+TOKEN_URL = reverse("user:token")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+class TokenBucketTests(TestCase):
+    """Test the token bucket stores"""
+
+    def setUp(self):
+        cache.clear()
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        path = os.path.join(self.tempdir.name, "buckets")
+        self.shm_store = throttling.SharedMemoryBucketStore(path, slots=64)
+        self.addCleanup(self.shm_store.close)
+
+    def test_parse_rate(self):
+        """Test that rates are parsed into capacity and refill rate"""
+        self.assertEqual(throttling.parse_rate("30/min"), (30, 0.5))
+        self.assertEqual(throttling.parse_rate("2/s"), (2, 2))
+
+    def test_take_token_refills(self):
+        """Test that an empty bucket refills with time up to capacity"""
+        self.assertEqual(throttling.take_token(0.5, 0, 3, 1, 0), (False, 0.5))
+        self.assertEqual(throttling.take_token(0.5, 0, 3, 1, 1), (True, 0.5))
+        self.assertEqual(throttling.take_token(0, 0, 3, 1, 100), (True, 2))
+
+    def test_stores_allow_capacity_then_reject(self):
+        """Test that both stores allow a burst of capacity requests"""
+        for store in (throttling.CacheBucketStore(), self.shm_store):
+            allowed = [store.consume("bucket", 3, 0.001)[0] for _ in range(4)]
+            self.assertEqual(allowed, [True, True, True, False])
+            self.assertTrue(store.consume("other", 3, 0.001)[0])
+
+    @patch("core.throttling.time.time")
+    def test_cache_store_slides_window(self, mock_time):
+        """Test that the previous window counts less as time goes on"""
+        store = throttling.CacheBucketStore()
+        mock_time.return_value = 1000
+        allowed = [store.consume("bucket", 2, 0.2)[0] for _ in range(3)]
+        self.assertEqual(allowed, [True, True, False])
+
+        mock_time.return_value = 1015
+        self.assertEqual(store.consume("bucket", 2, 0.2), (True, 0))
+        self.assertEqual(store.consume("bucket", 2, 0.2), (False, 0))
+
+        mock_time.return_value = 1030
+        self.assertTrue(store.consume("bucket", 2, 0.2)[0])
+
+    def test_shared_memory_store_thread_safe(self):
+        """Test that threads of one process never overdraw a bucket"""
+        allowed = []
+
+        def consume():
+            for _ in range(50):
+                allowed.append(self.shm_store.consume("bucket", 100, 0)[0])
+
+        threads = [threading.Thread(target=consume) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(allowed.count(True), 100)
+
+    def test_shared_memory_store_is_shared(self):
+        """Test that buckets are shared by stores mapping the same file"""
+        other = throttling.SharedMemoryBucketStore(
+            os.path.join(self.tempdir.name, "buckets"), slots=64
+        )
+        self.addCleanup(other.close)
+        self.assertTrue(self.shm_store.consume("bucket", 1, 0.001)[0])
+        self.assertFalse(other.consume("bucket", 1, 0.001)[0])
+
+
+@override_settings(
+    REST_FRAMEWORK={
+        "DEFAULT_THROTTLE_RATES": {
+            "auth": "2/min",
+            "auth_ip": "3/min",
+            "write": "1/min",
+        }
+    }
+)
+class ThrottledApiTests(TestCase):
+    """Test throttling of the API endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_token_throttled_before_hashing(self):
+        """Test that throttled logins never reach the password check"""
+        payload = {"email": "test@test.com", "password": "wrong"}
+        with patch("user.serializers.authenticate") as authenticate:
+            authenticate.return_value = None
+            responses = [
+                self.client.post(TOKEN_URL, payload) for _ in range(3)
+            ]
+        self.assertEqual(authenticate.call_count, 2)
+        self.assertEqual(
+            responses[-1].status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertIn("Retry-After", responses[-1])
+
+    def test_login_throttled_per_email_across_addresses(self):
+        """Test that logins for one email share a bucket on any address"""
+        with patch("user.serializers.authenticate") as authenticate:
+            authenticate.return_value = None
+            responses = [
+                self.client.post(
+                    TOKEN_URL,
+                    {"email": email, "password": "wrong"},
+                    REMOTE_ADDR=f"10.0.0.{index}",
+                )
+                for index, email in enumerate(
+                    ["test@test.com", " Test@test.com", "TEST@TEST.COM"]
+                )
+            ]
+            other = self.client.post(
+                TOKEN_URL, {"email": "other@test.com", "password": "wrong"}
+            )
+        self.assertEqual(
+            responses[-1].status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_address_throttle_spans_credentials(self):
+        """Test that one address is throttled across several users"""
+        for index in range(4):
+            self.client.credentials(HTTP_AUTHORIZATION=f"Token bad{index}")
+            response = self.client.post(TOKEN_URL, {})
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+    def test_writes_throttled_per_user_before_authentication(self):
+        """Test that writes are throttled before the token is looked up"""
+        user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        self.client.force_authenticate(user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token test")
+        payload = {"title": "Test", "time_minutes": 5, "price": 5}
+        response = self.client.post(RECIPES_URL, payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with self.assertNumQueries(0):
+            response = self.client.post(RECIPES_URL, payload)
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        response = self.client.get(RECIPES_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
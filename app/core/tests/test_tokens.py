@@ -0,0 +1,82 @@
+import datetime
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from core import tokens
+from core.authentication import SignedTokenAuthentication
+from core.models import RefreshToken
+
+
+class SignedTokenTests(TestCase):
+    """Test signed access tokens and refresh tokens"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com")
+        self.authenticator = SignedTokenAuthentication()
+
+    def authenticate(self, header):
+        """Authenticate a request with the given Authorization header"""
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=header)
+        return self.authenticator.authenticate(Request(request))
+
+    def test_authenticate_without_queries(self):
+        """Test that access tokens are verified without the database"""
+        token = tokens.issue_access_token(self.user)
+        with self.assertNumQueries(0):
+            user, payload = self.authenticate(f"Bearer {token}")
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(payload["uid"], self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, self.user.email)
+
+    def test_other_schemes_ignored(self):
+        """Test that other Authorization schemes are left to others"""
+        self.assertIsNone(self.authenticate("Token abc"))
+
+    def test_tampered_token_rejected(self):
+        """Test that a token with a bad signature is rejected"""
+        token = tokens.issue_access_token(self.user)
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(f"Bearer {token}x")
+
+    @override_settings(ACCESS_TOKEN_LIFETIME=60)
+    def test_expired_token_rejected(self):
+        """Test that access tokens expire"""
+        token = tokens.issue_access_token(self.user)
+        later = time.time() + 120
+        with patch("django.core.signing.time.time", return_value=later):
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                self.authenticate(f"Bearer {token}")
+
+    def test_refresh_token_stored_hashed(self):
+        """Test that only a hash of the refresh token is stored"""
+        token = tokens.issue_refresh_token(self.user)
+        refresh_token = RefreshToken.objects.get(user=self.user)
+        self.assertNotEqual(refresh_token.key_hash, token)
+        self.assertEqual(tokens.get_refresh_token_user(token), self.user)
+
+    def test_expired_refresh_token_rejected(self):
+        """Test that expired refresh tokens give no user"""
+        token = tokens.issue_refresh_token(self.user)
+        RefreshToken.objects.update(
+            expires=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+        )
+        self.assertIsNone(tokens.get_refresh_token_user(token))
+
+    def test_inactive_user_refresh_rejected(self):
+        """Test that refresh tokens of deactivated users give no user"""
+        token = tokens.issue_refresh_token(self.user)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(tokens.get_refresh_token_user(token))
+
+    def test_revoke_by_version(self):
+        """Test that bumping the token version revokes refresh tokens"""
+        token = tokens.issue_refresh_token(self.user)
+        get_user_model().objects.update(token_version=5)
+        self.assertIsNone(tokens.get_refresh_token_user(token))
@@ -0,0 +1,246 @@
+"""Token-bucket throttling with state shared between worker processes
+
+Each bucket holds up to ``capacity`` tokens and refills continuously at
+``capacity / period`` tokens per second; a request takes one token or is
+rejected. Rates are configured per scope in the ``DEFAULT_THROTTLE_RATES``
+of ``REST_FRAMEWORK``, e.g. ``"auth": "20/min"``.
+
+Bucket state is kept in the default cache, which is shared by every worker
+when ``CACHE_LOCATION`` points at memcached, as per-window request counts
+updated with the cache's atomic ``incr`` (see ``CacheBucketStore``). With
+``THROTTLE_BACKEND=shm`` the buckets live in a memory-mapped file instead
+(``THROTTLE_SHM_PATH``, best placed on ``/dev/shm``), shared by the
+pre-forked workers of one host and updated under a per-slot ``fcntl`` lock.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import exceptions, throttling
+from rest_framework.settings import api_settings
+
+from core import metrics
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+# fcntl locks are held per process, so threads also take this one
+_slot_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """Return the (capacity, tokens per second) of a "<count>/<period>" rate"""
+    count, period = rate.split("/")
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+def take_token(tokens, updated_at, capacity, refill_rate, now):
+    """Refill a bucket and try to take a token from it
+
+    Return whether a token was taken and the tokens left in the bucket.
+    """
+    tokens = min(capacity, tokens + max(now - updated_at, 0) * refill_rate)
+    if tokens < 1:
+        return False, tokens
+    return True, tokens - 1
+
+
+class CacheBucketStore:
+    """Keep token buckets in a Django cache
+
+    A bucket is approximated by counting requests in fixed windows of one
+    ``capacity / refill_rate`` period, each counted with the cache's atomic
+    ``incr``, so concurrent requests never wait on each other. Requests of
+    the previous window count in proportion to how much of it still falls
+    within one period, which spreads the refill over the window like a
+    bucket. Rejected requests are not counted.
+    """
+
+    def __init__(self, alias="default"):
+        self.cache = caches[alias]
+
+    def consume(self, key, capacity, refill_rate):
+        """Take a token from a bucket; return (allowed, tokens left)"""
+        window = capacity / refill_rate
+        index, elapsed = divmod(time.time(), window)
+        current = f"{key}:{int(index)}"
+        try:
+            count = self.cache.incr(current)
+        except ValueError:
+            if self.cache.add(current, 1, int(2 * window) + 1):
+                count = 1
+            else:
+                # Another request started the window first
+                count = self.cache.incr(current)
+        previous = self.cache.get(f"{key}:{int(index) - 1}", 0)
+        tokens = capacity - previous * (1 - elapsed / window) - count + 1
+        if tokens >= 1:
+            return True, tokens - 1
+        self.cache.decr(current)
+        return False, tokens
+
+
+class SharedMemoryBucketStore:
+    """Keep token buckets in a memory-mapped file shared between processes
+
+    Keys are hashed into a fixed number of slots; each slot is locked with
+    ``fcntl`` against other processes, and with a module-level lock against
+    other threads, while it is updated. When two keys hash to the same slot
+    the newer one takes it over and the older bucket starts again full.
+    """
+
+    slot = struct.Struct("=Qdd")
+
+    def __init__(self, path, slots=1 << 16):
+        self.slots = slots
+        size = slots * self.slot.size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+
+    def consume(self, key, capacity, refill_rate):
+        """Take a token from a bucket; return (allowed, tokens left)"""
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        key_hash = int.from_bytes(digest, "little") or 1
+        offset = key_hash % self.slots * self.slot.size
+        with _slot_lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, self.slot.size, offset)
+            try:
+                now = time.time()
+                stored_hash, tokens, updated_at = self.slot.unpack_from(
+                    self.map, offset
+                )
+                if stored_hash != key_hash:
+                    tokens, updated_at = capacity, now
+                allowed, tokens = take_token(
+                    tokens, updated_at, capacity, refill_rate, now
+                )
+                self.slot.pack_into(self.map, offset, key_hash, tokens, now)
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, self.slot.size, offset)
+        return allowed, tokens
+
+    def close(self):
+        """Unmap the file and close its descriptor"""
+        self.map.close()
+        os.close(self.fd)
+
+
+def get_store():
+    """Return the bucket store of the current process"""
+    global _store, _store_pid
+    with _store_lock:
+        # A store opened before the server forked is not reused by workers
+        if _store is None or _store_pid != os.getpid():
+            if settings.THROTTLE_BACKEND == "shm":
+                _store = SharedMemoryBucketStore(settings.THROTTLE_SHM_PATH)
+            else:
+                _store = CacheBucketStore()
+            _store_pid = os.getpid()
+        return _store
+
+
+class TokenBucketThrottle(throttling.BaseThrottle):
+    """Throttle a view's scope with a token bucket per client identity
+
+    The scope comes from the view's ``throttle_scope``; views without a
+    scope, or scopes without a configured rate, are not throttled.
+    Identities are worked out from the raw request alone, so the throttle
+    can run before authentication.
+    """
+
+    rate_suffix = ""
+
+    def allow_request(self, request, view):
+        """Take a token from the client's bucket for the view's scope"""
+        scope = getattr(view, "throttle_scope", None)
+        if scope is None:
+            return True
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(
+            f"{scope}{self.rate_suffix}"
+        )
+        if rate is None:
+            return True
+        self.capacity, self.refill_rate = parse_rate(rate)
+        key = f"throttle:{scope}{self.rate_suffix}:{self.get_ident(request)}"
+        allowed, self.tokens = get_store().consume(
+            key, self.capacity, self.refill_rate
+        )
+        if not allowed:
+            metrics.THROTTLED_REQUESTS.labels(scope).inc()
+        return allowed
+
+    def wait(self):
+        """Return the seconds until the bucket holds a token again"""
+        return (1 - self.tokens) / self.refill_rate
+
+
+class CredentialThrottle(TokenBucketThrottle):
+    """Throttle each set of credentials, or each client address without
+
+    Requests carrying an ``Authorization`` header are identified by a hash
+    of it, which stands in for the user since each user has one token.
+    Views taking credentials in the body, such as logins, name the field
+    identifying the user in ``throttle_credential_field``.
+    """
+
+    def allow_request(self, request, view):
+        """Take a token from the bucket of the credentials sent to view"""
+        self.credential_field = getattr(
+            view, "throttle_credential_field", None
+        )
+        return super().allow_request(request, view)
+
+    def get_ident(self, request):
+        """Return a hash of the credentials, else the client address"""
+        credentials = request.META.get("HTTP_AUTHORIZATION")
+        if not credentials and self.credential_field:
+            try:
+                value = request.data.get(self.credential_field)
+            except (exceptions.ParseError, AttributeError):
+                value = None
+            if isinstance(value, str) and value.strip():
+                credentials = (
+                    f"{self.credential_field}:{value.strip().lower()}"
+                )
+        if not credentials:
+            return f"ip:{super().get_ident(request)}"
+        digest = hashlib.sha256(credentials.encode()).hexdigest()
+        return f"auth:{digest[:32]}"
+
+
+class AddressThrottle(TokenBucketThrottle):
+    """Throttle each client address, whatever credentials it sends"""
+
+    rate_suffix = "_ip"
+
+
+class ThrottleFirstMixin:
+    """Check throttles before authentication and permissions
+
+    Rejected requests then cost no database lookups or password hashing.
+    """
+
+    throttle_classes = (CredentialThrottle, AddressThrottle)
+
+    def initial(self, request, *args, **kwargs):
+        """Run the standard checks with throttling moved to the front"""
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+        self.check_throttles(request)
+        self.perform_authentication(request)
+        self.check_permissions(request)
@@ -0,0 +1,89 @@
+"""Signed access tokens and database-backed refresh tokens
+
+Access tokens are short-lived and carry the user ID in a payload signed with
+``SECRET_KEY``, so they are verified without touching the database. Refresh
+tokens are random, long-lived and stored hashed; each records the user's
+``token_version`` when it was issued, and bumping that version revokes them
+all. Revocation and deactivation are checked when a refresh token is used,
+so they reach access tokens once these expire, after at most
+``ACCESS_TOKEN_LIFETIME`` seconds.
+"""
+
+import datetime
+import hashlib
+import secrets
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import RefreshToken
+
+ACCESS_TOKEN_SALT = "core.tokens.access"
+
+
+def issue_access_token(user):
+    """Return a signed access token for a user"""
+    return signing.dumps({"uid": user.pk}, salt=ACCESS_TOKEN_SALT)
+
+
+def read_access_token(token):
+    """Return the payload of a valid access token
+
+    Raise ``signing.BadSignature`` for tampered or expired tokens.
+    """
+    return signing.loads(
+        token, salt=ACCESS_TOKEN_SALT, max_age=settings.ACCESS_TOKEN_LIFETIME
+    )
+
+
+def hash_refresh_token(token):
+    """Return the stored form of a refresh token"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_refresh_token(user):
+    """Create a refresh token for a user and return it"""
+    token = secrets.token_urlsafe(32)
+    RefreshToken.objects.create(
+        user=user,
+        key_hash=hash_refresh_token(token),
+        token_version=user.token_version,
+        expires=timezone.now()
+        + datetime.timedelta(seconds=settings.REFRESH_TOKEN_LIFETIME),
+    )
+    return token
+
+
+def issue_token_pair(user):
+    """Return a new access token and refresh token for a user"""
+    return {
+        "access": issue_access_token(user),
+        "refresh": issue_refresh_token(user),
+        "expires_in": settings.ACCESS_TOKEN_LIFETIME,
+    }
+
+
+def get_refresh_token_user(token):
+    """Return the active user a refresh token is valid for, else None"""
+    refresh_token = (
+        RefreshToken.objects.select_related("user")
+        .filter(key_hash=hash_refresh_token(token), expires__gt=timezone.now())
+        .first()
+    )
+    if refresh_token is None:
+        return None
+    user = refresh_token.user
+    if not user.is_active or refresh_token.token_version != user.token_version:
+        return None
+    return user
+
+
+def revoke_tokens(user):
+    """Revoke every refresh token issued to a user"""
+    get_user_model().objects.filter(pk=user.pk).update(
+        token_version=F("token_version") + 1
+    )
+    RefreshToken.objects.filter(user=user).delete()
@@ -0,0 +1,66 @@
+"""Per-user data versions for keying cached derived data
+
+Every write to a user's recipes, tags or ingredients bumps the user's
+version (see core.signals), so cache entries keyed on it go stale at once
+without having to be found and deleted. Versions are counted on the user's
+row on the primary, so every process sees a bump immediately whatever the
+cache backend; the cache only holds the data keyed on them.
+
+A bump made inside a transaction waits for it to commit, so readers never
+cache data the transaction has not published yet under the new version,
+and all the bumps of one transaction are made with a single UPDATE.
+"""
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+
+from core.models import User
+
+
+class _PendingBumps:
+    """on_commit callback bumping the versions of a set of users"""
+
+    def __init__(self):
+        self.user_ids = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        bump_user_versions(self.user_ids)
+
+
+def bump_user_versions(user_ids):
+    """Bump the versions of users right away, in the current transaction"""
+    User.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=user_ids).update(
+        data_version=F("data_version") + 1
+    )
+
+
+def get_user_version(user_id):
+    """Return the current data version of a user"""
+    return (
+        User.objects.using(DEFAULT_DB_ALIAS)
+        .filter(pk=user_id)
+        .values_list("data_version", flat=True)
+        .first()
+    ) or 0
+
+
+def bump_user_version(user_id, using=DEFAULT_DB_ALIAS):
+    """Invalidate everything cached against the user's current version
+
+    ``using`` is the database the user's data was written to; the bump is
+    made once its current transaction commits.
+    """
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        bump_user_versions([user_id])
+        return
+    # Callbacks of rolled back savepoints are dropped along with their users
+    for entry in connection.run_on_commit:
+        if isinstance(entry[1], _PendingBumps) and not entry[1].done:
+            entry[1].user_ids.add(user_id)
+            return
+    pending = _PendingBumps()
+    pending.user_ids.add(user_id)
+    transaction.on_commit(pending, using=using)
@@ -0,0 +1,55 @@
+import json
+import os
+
+from django.http import FileResponse, Http404, HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import authentication, response, views
+
+from core import metrics, profiling
+from core.authentication import SignedTokenAuthentication
+
+
+@require_GET
+def metrics_view(request):
+    """Expose metrics in the Prometheus text format"""
+    content, content_type = metrics.render_latest()
+    return HttpResponse(content, content_type=content_type)
+
+
+class ProfileView(views.APIView):
+    """Retrieve a stored request profile"""
+
+    authentication_classes = (
+        SignedTokenAuthentication,
+        authentication.TokenAuthentication,
+        authentication.SessionAuthentication,
+    )
+    permission_classes = (profiling.CanProfileRequests,)
+    profile_files = {
+        "pstats": profiling.PSTATS_FILE,
+        "folded": profiling.FOLDED_FILE,
+        "allocations": profiling.ALLOCATIONS_FILE,
+    }
+
+    def get(self, request, profile_id):
+        """Return the profile summary, or one of its files with ?file="""
+        summary_path = profiling.profile_path(
+            profile_id, profiling.SUMMARY_FILE
+        )
+        if not os.path.exists(summary_path):
+            raise Http404
+        requested_file = request.query_params.get("file")
+        if requested_file is None:
+            with open(summary_path) as f:
+                return response.Response(json.load(f))
+        if requested_file not in self.profile_files:
+            raise Http404
+        return FileResponse(
+            open(
+                profiling.profile_path(
+                    profile_id, self.profile_files[requested_file]
+                ),
+                "rb",
+            ),
+            as_attachment=True,
+        )
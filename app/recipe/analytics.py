@@ -0,0 +1,112 @@
+"""Distributions of recipe cooking times and prices
+
+The needed columns are fetched as flat rows and turned into NumPy arrays,
+so histograms and percentiles for the user and for each of their tags are
+computed without touching model instances. NumPy is imported on first use
+rather than with the URLconf, as it is the slowest import of a worker.
+Results are cached per user data version, so they are computed from the
+primary rather than a possibly lagging replica.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from core import metrics
+from core.models import Recipe, Tag
+from core.versions import get_user_version
+
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+CACHE_KEY = "recipe-analytics:{user_id}:{version}:{bins}"
+
+
+def distribution(values, edges):
+    """Return the histogram and percentiles of an array of values"""
+    import numpy as np
+
+    if not len(values):
+        return {
+            "histogram": {"edges": [], "counts": []},
+            "percentiles": {},
+        }
+    counts, edges = np.histogram(values, bins=edges)
+    percentiles = np.percentile(values, PERCENTILES)
+    return {
+        "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+        "percentiles": {
+            f"p{p}": value
+            for p, value in zip(PERCENTILES, percentiles.tolist())
+        },
+    }
+
+
+def compute_analytics(user_id, bins):
+    """Compute time and price distributions for a user and their tags"""
+    import numpy as np
+
+    using = router.db_for_write(Recipe)
+    rows = np.array(
+        Recipe.objects.using(using)
+        .filter(user_id=user_id)
+        .order_by("id")
+        .values_list("id", "time_minutes", Cast("price", FloatField())),
+        dtype=float,
+    ).reshape(-1, 3)
+    recipe_ids, times, prices = rows.T
+    time_edges = (
+        np.histogram_bin_edges(times, bins=bins) if len(times) else bins
+    )
+    price_edges = (
+        np.histogram_bin_edges(prices, bins=bins) if len(prices) else bins
+    )
+
+    links = np.array(
+        Recipe.tags.through.objects.using(using)
+        .filter(recipe__user_id=user_id)
+        .order_by("tag_id")
+        .values_list("tag_id", "recipe_id"),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    tag_ids, starts = np.unique(links[:, 0], return_index=True)
+    rows_per_link = np.searchsorted(recipe_ids, links[:, 1])
+    names = dict(
+        Tag.objects.using(using)
+        .filter(id__in=tag_ids.tolist())
+        .values_list("id", "name")
+    )
+
+    tags = []
+    for tag_id, tag_rows in zip(
+        tag_ids.tolist(), np.split(rows_per_link, starts[1:])
+    ):
+        tags.append(
+            {
+                "id": tag_id,
+                "name": names[tag_id],
+                "recipe_count": len(tag_rows),
+                "time_minutes": distribution(times[tag_rows], time_edges),
+                "price": distribution(prices[tag_rows], price_edges),
+            }
+        )
+
+    return {
+        "recipe_count": len(recipe_ids),
+        "time_minutes": distribution(times, time_edges),
+        "price": distribution(prices, price_edges),
+        "tags": tags,
+    }
+
+
+def get_analytics(user_id, bins):
+    """Return the analytics of a user, cached per user data version"""
+    key = CACHE_KEY.format(
+        user_id=user_id, version=get_user_version(user_id), bins=bins
+    )
+    analytics = cache.get(key)
+    metrics.record_cache_lookup("recipe-analytics", analytics is not None)
+    if analytics is None:
+        analytics = compute_analytics(user_id, bins)
+        cache.set(key, analytics, settings.RECIPE_ANALYTICS_CACHE_SECONDS)
+    return analytics
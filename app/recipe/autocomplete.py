@@ -0,0 +1,91 @@
+"""Prefix autocomplete of tag and ingredient names
+
+Names match on their catalog key (see core.catalog), so matching ignores
+case and extra whitespace, and are ranked by how many recipes use them.
+By default every lookup is a query, served on PostgreSQL by the pattern
+index Django creates for ``CatalogName.key``. With ``AUTOCOMPLETE_CACHE_USERS`` set,
+each process also keeps the names of that many recently active users as
+sorted arrays, searched by bisection; an array is rebuilt once the user's
+data version changes, i.e. after any write to their tags, ingredients or
+recipes. Arrays are loaded from the primary, as one loaded from a lagging
+replica would be kept until the next write.
+"""
+
+import bisect
+import heapq
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import router
+from django.db.models import Count
+
+from core import catalog
+from core.versions import get_user_version
+
+_arrays = OrderedDict()
+_lock = threading.Lock()
+
+
+def _ranking(row):
+    """Sort key putting the most used names first"""
+    row_id, name, usage = row
+    return (-usage, name, row_id)
+
+
+def search_database(queryset, prefix, limit):
+    """Return the most used (id, name, usage) rows starting with prefix"""
+    return list(
+        queryset.filter(catalog_name__key__startswith=catalog.key(prefix))
+        .annotate(usage=Count("recipe"))
+        .order_by("-usage", "name", "id")
+        .values_list("id", "name", "usage")[:limit]
+    )
+
+
+def _sorted_array(queryset):
+    """Return the name keys and rows of a queryset, sorted by key"""
+    rows = sorted(
+        (
+            (catalog.key(name), (row_id, name, usage))
+            for row_id, name, usage in queryset.annotate(
+                usage=Count("recipe")
+            ).values_list("id", "name", "usage")
+        ),
+        key=lambda item: item[0],
+    )
+    return [key for key, _ in rows], [row for _, row in rows]
+
+
+def search_memory(queryset, user_id, prefix, limit):
+    """Search the cached sorted array of a user's names"""
+    key = (queryset.model._meta.label, user_id)
+    version = get_user_version(user_id)
+    with _lock:
+        cached = _arrays.get(key)
+        if cached is not None:
+            _arrays.move_to_end(key)
+    if cached is None or cached[0] != version:
+        primary = router.db_for_write(queryset.model)
+        cached = (version, *_sorted_array(queryset.using(primary)))
+        with _lock:
+            _arrays[key] = cached
+            while len(_arrays) > settings.AUTOCOMPLETE_CACHE_USERS:
+                _arrays.popitem(last=False)
+    _, names, rows = cached
+    prefix = catalog.key(prefix)
+    start = bisect.bisect_left(names, prefix)
+    end = bisect.bisect_left(names, prefix + "\U0010ffff", start)
+    return heapq.nsmallest(limit, rows[start:end], key=_ranking)
+
+
+def autocomplete(queryset, user_id, prefix, limit):
+    """Return the most used names of a user's queryset starting with prefix"""
+    if settings.AUTOCOMPLETE_CACHE_USERS:
+        rows = search_memory(queryset, user_id, prefix, limit)
+    else:
+        rows = search_database(queryset, prefix, limit)
+    return [
+        {"id": row_id, "name": name, "usage": usage}
+        for row_id, name, usage in rows
+    ]
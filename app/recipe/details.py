@@ -0,0 +1,41 @@
+"""Cached rendered recipe details
+
+Entries are keyed by recipe ID and ``Recipe.detail_version``, which is
+replaced whenever the recipe, its tag/ingredient links or the name of a
+linked tag or ingredient changes. Stale entries are never read again and
+simply expire.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import metrics
+
+CACHE_KEY = "recipe-detail:{id}:{version}"
+
+
+def get_details(versions, render):
+    """Return the rendered details of recipes with a single cache lookup
+
+    ``versions`` holds ``(id, detail_version)`` pairs; ``render`` is called
+    with the IDs missing from the cache and returns their details by ID.
+    Details are returned in the order of ``versions``.
+    """
+    keys = {
+        recipe_id: CACHE_KEY.format(id=recipe_id, version=version)
+        for recipe_id, version in versions
+    }
+    cached = cache.get_many(keys.values())
+    missing = [
+        recipe_id for recipe_id, key in keys.items() if key not in cached
+    ]
+    metrics.record_cache_lookup("recipe-detail", True, len(cached))
+    if missing:
+        metrics.record_cache_lookup("recipe-detail", False, len(missing))
+        rendered = {
+            keys[recipe_id]: detail
+            for recipe_id, detail in render(missing).items()
+        }
+        cache.set_many(rendered, settings.RECIPE_DETAIL_CACHE_SECONDS)
+        cached.update(rendered)
+    return [cached[key] for key in keys.values() if key in cached]
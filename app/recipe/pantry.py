@@ -0,0 +1,113 @@
+"""Which recipes can be cooked from the ingredients at hand
+
+Each user's recipes are indexed as a bit matrix with one row per recipe
+and one bit per ingredient the user has linked to any recipe, packed eight
+to a byte. A pantry is packed the same way, and the ingredients a recipe
+lacks are its row without the pantry's bits, so every recipe is checked
+with a few vectorized byte operations. The index is cached per user data
+version, zlib-compressed to stay within cache item size limits, and the
+most recently used indexes are also kept decompressed in each process.
+Indexes are built from the primary, as one built from a lagging replica
+would be cached under the new version.
+"""
+
+import functools
+import pickle
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+
+from core import metrics
+from core.models import Recipe
+from core.versions import get_user_version
+
+CACHE_KEY = "recipe-pantry:{user_id}:{version}"
+
+
+def build_index(user_id):
+    """Return the recipe IDs, ingredient IDs and packed bits of a user"""
+    import numpy as np
+
+    using = router.db_for_write(Recipe)
+    recipe_ids = np.array(
+        Recipe.objects.using(using)
+        .filter(user_id=user_id)
+        .order_by("id")
+        .values_list("id", flat=True),
+        dtype=np.int64,
+    )
+    links = np.array(
+        Recipe.ingredients.through.objects.using(using)
+        .filter(recipe__user_id=user_id)
+        .values_list("recipe_id", "ingredient_id"),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    # Skip links of recipes created since the recipes were read
+    links = links[np.isin(links[:, 0], recipe_ids)]
+    ingredient_ids, columns = np.unique(links[:, 1], return_inverse=True)
+    rows = np.searchsorted(recipe_ids, links[:, 0])
+    bits = np.zeros(
+        (len(recipe_ids), (len(ingredient_ids) + 7) // 8), dtype=np.uint8
+    )
+    masks = (0x80 >> (columns % 8)).astype(np.uint8)
+    np.bitwise_or.at(bits, (rows, columns // 8), masks)
+    return recipe_ids, ingredient_ids, bits
+
+
+def get_index(user_id):
+    """Return the index of a user, cached per user data version"""
+    return _load_index(
+        CACHE_KEY.format(user_id=user_id, version=get_user_version(user_id)),
+        user_id,
+    )
+
+
+@functools.lru_cache(maxsize=16)
+def _load_index(key, user_id):
+    """Return the index stored under a versioned key, building it if needed"""
+    cached = cache.get(key)
+    metrics.record_cache_lookup("recipe-pantry", cached is not None)
+    if cached is not None:
+        return pickle.loads(zlib.decompress(cached))
+    index = build_index(user_id)
+    cache.set(
+        key,
+        zlib.compress(pickle.dumps(index, pickle.HIGHEST_PROTOCOL)),
+        settings.RECIPE_PANTRY_CACHE_SECONDS,
+    )
+    return index
+
+
+def _popcount(bits):
+    """Return the number of set bits in each row of a uint8 matrix"""
+    import numpy as np
+
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.uint32)
+    table = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1)
+    return table.sum(axis=1, dtype=np.uint8)[bits].sum(axis=1, dtype=np.uint32)
+
+
+def match(index, pantry, max_missing):
+    """Return (recipe ID, missing ingredient IDs) of the cookable recipes
+
+    Recipes lacking at most ``max_missing`` of their ingredients from the
+    ``pantry`` IDs are returned, those lacking the fewest first.
+    """
+    import numpy as np
+
+    recipe_ids, ingredient_ids, bits = index
+    have = np.packbits(np.isin(ingredient_ids, list(pantry)))
+    lacking = bits & ~have
+    missing = _popcount(lacking)
+    selected = np.flatnonzero(missing <= max_missing)
+    selected = selected[np.argsort(missing[selected], kind="stable")]
+    lacked = np.unpackbits(
+        lacking[selected], axis=1, count=len(ingredient_ids)
+    ).astype(bool)
+    return [
+        (recipe_id, ingredient_ids[row].tolist())
+        for recipe_id, row in zip(recipe_ids[selected].tolist(), lacked)
+    ]
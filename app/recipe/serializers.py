@@ -1,11 +1,81 @@
-from rest_framework import serializers
-
-from core.models import Ingredient, Recipe, Tag
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
+from rest_framework import relations, serializers
+
+from core.models import Ingredient, Recipe, RecipeStats, Tag
+
+
+class BulkManyRelatedField(relations.ManyRelatedField):
+    """Many related field resolving all submitted primary keys at once"""
+
+    default_error_messages = {
+        "does_not_exist": _("Invalid pks {pk_values} - objects do not exist."),
+        "incorrect_type": _(
+            "Incorrect type. Expected pk values, received {data_types}."
+        ),
+    }
+
+    def to_internal_value(self, data):
+        """Return the objects for a list of pks with a single query"""
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+        queryset = self.child_relation.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        incorrect_types = []
+        for item in data:
+            try:
+                if isinstance(item, bool):
+                    raise ValidationError(item)
+                pks.append(pk_field.to_python(item))
+            except ValidationError:
+                incorrect_types.append(type(item).__name__)
+        if incorrect_types:
+            self.fail(
+                "incorrect_type",
+                data_types=", ".join(dict.fromkeys(incorrect_types)),
+            )
+        pks = list(dict.fromkeys(pks))
+        if not pks:
+            return []
+        objects = {obj.pk: obj for obj in queryset.filter(pk__in=pks)}
+        missing = [pk for pk in pks if pk not in objects]
+        if missing:
+            self.fail("does_not_exist", pk_values=missing)
+        return [objects[pk] for pk in pks]
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field accepting only objects of the requesting user
+
+    With ``many=True`` the whole list of pks is validated in one query.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in relations.MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        """Limit the queryset to objects of the requesting user"""
+        queryset = super().get_queryset()
+        request = self.context.get("request")
+        if request is None:
+            return queryset.none()
+        return queryset.filter(user=request.user)
 
 
 class TagSerializer(serializers.ModelSerializer):
     """Serializer for tag class"""
 
+    # Stored in the shared catalog rather than as a model field
+    name = serializers.CharField(max_length=255)
+
     class Meta:
         model = Tag
         fields = ("id", "name")
@@ -15,6 +85,9 @@ class TagSerializer(serializers.ModelSerializer):
 class IngredientSerializer(serializers.ModelSerializer):
     """Serializer for ingredient class"""
 
+    # Stored in the shared catalog rather than as a model field
+    name = serializers.CharField(max_length=255)
+
     class Meta:
         model = Ingredient
         fields = ("id", "name")
@@ -24,12 +97,10 @@ class IngredientSerializer(serializers.ModelSerializer):
 class RecipeSerializer(serializers.ModelSerializer):
     """Serializer for recipe class"""
 
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = UserPrimaryKeyRelatedField(
         many=True, queryset=Ingredient.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all()
-    )
+    tags = UserPrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
 
     class Meta:
         model = Recipe
@@ -45,6 +116,26 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
+class RecipeListSerializer(serializers.ModelSerializer):
+    """Serializer for recipe lists, reading the denormalized snapshots"""
+
+    ingredients = serializers.SerializerMethodField()
+    tags = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = RecipeSerializer.Meta.fields
+        read_only_fields = fields
+
+    def get_ingredients(self, obj):
+        """Return the IDs of the recipe's ingredients"""
+        return [ingredient_id for ingredient_id, _ in obj.ingredient_snapshot]
+
+    def get_tags(self, obj):
+        """Return the IDs of the recipe's tags"""
+        return [tag_id for tag_id, _ in obj.tag_snapshot]
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for recipe image class"""
 
@@ -59,3 +150,82 @@ class RecipeDetailSerializer(RecipeSerializer):
 
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
+
+
+class RecipeLinksSerializer(serializers.Serializer):
+    """Serializer for adding and removing tag or ingredient links"""
+
+    remove = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+
+    def validate(self, attrs):
+        """Check that no ID is both added and removed"""
+        added = {obj.id for obj in attrs.get("add", [])}
+        both = sorted(added.intersection(attrs.get("remove", [])))
+        if both:
+            raise serializers.ValidationError(
+                f"IDs {both} cannot be both added and removed"
+            )
+        return attrs
+
+
+class TagLinksSerializer(RecipeLinksSerializer):
+    """Serializer for adding and removing the tags of a recipe"""
+
+    add = UserPrimaryKeyRelatedField(
+        many=True,
+        queryset=Tag.objects.select_related(None).only("id"),
+        required=False,
+    )
+
+
+class IngredientLinksSerializer(RecipeLinksSerializer):
+    """Serializer for adding and removing the ingredients of a recipe"""
+
+    add = UserPrimaryKeyRelatedField(
+        many=True,
+        queryset=Ingredient.objects.select_related(None).only("id"),
+        required=False,
+    )
+
+
+class BulkLinksSerializer(serializers.Serializer):
+    """Serializer for the recipes of a bulk link change"""
+
+    recipes = UserPrimaryKeyRelatedField(
+        many=True,
+        queryset=Recipe.objects.only("id", "user_id"),
+        allow_empty=False,
+    )
+
+
+class BulkTagLinksSerializer(BulkLinksSerializer, TagLinksSerializer):
+    """Serializer for adding and removing the tags of several recipes"""
+
+
+class BulkIngredientLinksSerializer(
+    BulkLinksSerializer, IngredientLinksSerializer
+):
+    """Serializer for adding and removing the ingredients of recipes"""
+
+
+class RecipeStatsSerializer(serializers.ModelSerializer):
+    """Serializer for per-user recipe statistics"""
+
+    time_minutes_average = serializers.FloatField(read_only=True)
+    time_minutes_median = serializers.FloatField(read_only=True)
+    price_average = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True
+    )
+
+    class Meta:
+        model = RecipeStats
+        fields = (
+            "recipe_count",
+            "time_minutes_average",
+            "time_minutes_median",
+            "price_total",
+            "price_average",
+        )
+        read_only_fields = fields
@@ -0,0 +1,39 @@
+"""Shopping lists merging the ingredients of several recipes"""
+
+from itertools import groupby
+
+from core.models import Recipe
+
+
+def shopping_list(user, recipe_ids):
+    """Return the distinct ingredients of the user's given recipes
+
+    Each ingredient lists the recipes using it and their count. The links
+    are read in a single query over the through table, ordered so that
+    they can be grouped per ingredient as they are read.
+    """
+    links = (
+        Recipe.ingredients.through.objects.filter(
+            recipe__user=user, recipe_id__in=recipe_ids
+        )
+        .order_by(
+            "ingredient__catalog_name__value", "ingredient_id", "recipe_id"
+        )
+        .values_list(
+            "ingredient_id", "ingredient__catalog_name__value", "recipe_id"
+        )
+    )
+    ingredients = []
+    for (ingredient_id, name), rows in groupby(
+        links.iterator(), key=lambda row: row[:2]
+    ):
+        recipes = [recipe_id for _, _, recipe_id in rows]
+        ingredients.append(
+            {
+                "id": ingredient_id,
+                "name": name,
+                "count": len(recipes),
+                "recipes": recipes,
+            }
+        )
+    return ingredients
@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+ANALYTICS_URL = reverse("recipe:analytics")
+
+
+def sample_recipe(user, time_minutes, price):
+    """Create a sample recipe"""
+    return Recipe.objects.create(
+        user=user, title="recipe", time_minutes=time_minutes, price=price
+    )
+
+
+class PublicRecipeAnalyticsApiTests(TestCase):
+    """Test public-facing recipe analytics API"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_login_required(self):
+        """Test that login is required for retrieving analytics"""
+        response = self.client.get(ANALYTICS_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecipeAnalyticsApiTests(TestCase):
+    """Test authenticated recipe analytics API"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="testpassword", name="test"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_empty_analytics(self):
+        """Test analytics for a user without recipes"""
+        response = self.client.get(ANALYTICS_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe_count"], 0)
+        self.assertEqual(response.data["time_minutes"]["percentiles"], {})
+        self.assertEqual(response.data["tags"], [])
+
+    def test_histograms_and_percentiles(self):
+        """Test the overall and per-tag distributions"""
+        tag = Tag.objects.create(user=self.user, name="tag")
+        for minutes in [10, 20, 30, 40]:
+            recipe = sample_recipe(self.user, minutes, minutes / 10)
+            if minutes > 20:
+                recipe.tags.add(tag)
+        other_user = get_user_model().objects.create_user(
+            email="other@test.com", password="testpassword", name="other"
+        )
+        sample_recipe(other_user, 1000, 100)
+
+        response = self.client.get(ANALYTICS_URL, {"bins": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        times = response.data["time_minutes"]
+        self.assertEqual(response.data["recipe_count"], 4)
+        self.assertEqual(times["histogram"]["edges"], [10, 20, 30, 40])
+        self.assertEqual(times["histogram"]["counts"], [1, 1, 2])
+        self.assertEqual(times["percentiles"]["p50"], 25)
+        self.assertEqual(response.data["price"]["percentiles"]["p50"], 2.5)
+
+        [tag_data] = response.data["tags"]
+        self.assertEqual(tag_data["name"], "tag")
+        self.assertEqual(tag_data["recipe_count"], 2)
+        self.assertEqual(
+            tag_data["time_minutes"]["histogram"]["counts"], [0, 0, 2]
+        )
+        self.assertEqual(tag_data["time_minutes"]["percentiles"]["p50"], 35)
+
+    def test_cache_invalidated_on_write(self):
+        """Test that cached analytics are recomputed after a change"""
+        with self.captureOnCommitCallbacks(execute=True):
+            sample_recipe(self.user, 10, 1)
+        self.client.get(ANALYTICS_URL)
+        # Only the user's data version is read
+        with self.assertNumQueries(1):
+            self.client.get(ANALYTICS_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            sample_recipe(self.user, 20, 2)
+        response = self.client.get(ANALYTICS_URL)
+        self.assertEqual(response.data["recipe_count"], 2)
+
+    def test_invalid_bins(self):
+        """Test that out of range bin counts are rejected"""
+        for bins in ["0", "1000", "x"]:
+            response = self.client.get(ANALYTICS_URL, {"bins": bins})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
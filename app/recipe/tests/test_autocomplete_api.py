@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+TAGS_AUTOCOMPLETE_URL = reverse("recipe:tag-autocomplete")
+INGREDIENTS_AUTOCOMPLETE_URL = reverse("recipe:ingredient-autocomplete")
+
+
+class AutocompleteApiTests(TestCase):
+    """Test the tag and ingredient autocomplete API"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("test@test.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def use(self, obj, times):
+        """Link a tag or ingredient to new recipes"""
+        relation = "tags" if isinstance(obj, Tag) else "ingredients"
+        for _ in range(times):
+            recipe = Recipe.objects.create(
+                user=self.user, title="r", time_minutes=1, price=1
+            )
+            getattr(recipe, relation).add(obj)
+
+    def names(self, url, prefix, **params):
+        """Return the names suggested for a prefix"""
+        res = self.client.get(url, {"prefix": prefix, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [match["name"] for match in res.data]
+
+    def test_ranked_by_usage(self):
+        """Test that matches are case-insensitive and ranked by usage"""
+        vegan, veggie, _ = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ("Vegan", "veggie", "Dessert")
+        ]
+        Tag.objects.create(
+            user=get_user_model().objects.create_user("o@test.com"),
+            name="Vegetarian",
+        )
+        self.use(veggie, 2)
+        self.use(vegan, 1)
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {"prefix": "veg"})
+
+        self.assertEqual(
+            res.data,
+            [
+                {"id": veggie.id, "name": "veggie", "usage": 2},
+                {"id": vegan.id, "name": "Vegan", "usage": 1},
+            ],
+        )
+
+    def test_limit(self):
+        """Test that only the top matches are returned"""
+        for name in ("salt", "sage", "saffron"):
+            Ingredient.objects.create(user=self.user, name=name)
+        names = self.names(INGREDIENTS_AUTOCOMPLETE_URL, "sa", limit=2)
+        self.assertEqual(names, ["saffron", "sage"])
+
+    @override_settings(AUTOCOMPLETE_CACHE_USERS=10)
+    def test_memory_cache(self):
+        """Test that cached names are searched without listing them"""
+        with self.captureOnCommitCallbacks(execute=True):
+            salt = Ingredient.objects.create(user=self.user, name="Salt")
+            Ingredient.objects.create(user=self.user, name="sage")
+            Ingredient.objects.create(user=self.user, name="rice")
+            self.use(salt, 1)
+        url = INGREDIENTS_AUTOCOMPLETE_URL
+        self.assertEqual(self.names(url, "s"), ["Salt", "sage"])
+
+        # Only the user's data version is read
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names(url, "SA"), ["Salt", "sage"])
+
+        salt.name = "Pepper"
+        with self.captureOnCommitCallbacks(execute=True):
+            salt.save()
+        self.assertEqual(self.names(url, "sa"), ["sage"])
+        self.assertEqual(self.names(url, "pep"), ["Pepper"])
+
+    @override_settings(AUTOCOMPLETE_CACHE_USERS=10)
+    def test_memory_cache_matches_database(self):
+        """Test that both search paths rank names the same way"""
+        for name, uses in [("ab", 0), ("Abc", 2), ("abd", 2), ("b", 1)]:
+            self.use(Tag.objects.create(user=self.user, name=name), uses)
+        for prefix in ("a", "AB", "abc", "b", "x"):
+            cached = self.names(TAGS_AUTOCOMPLETE_URL, prefix)
+            with override_settings(AUTOCOMPLETE_CACHE_USERS=0):
+                queried = self.names(TAGS_AUTOCOMPLETE_URL, prefix)
+            self.assertEqual(cached, queried)
+
+    def test_invalid_params(self):
+        """Test that a missing prefix or bad limit is rejected"""
+        for params in (
+            {},
+            {"prefix": "a", "limit": 0},
+            {"prefix": "a", "limit": "x"},
+        ):
+            res = self.client.get(TAGS_AUTOCOMPLETE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -2,13 +2,15 @@ import os.path
 import tempfile
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from PIL import Image
 
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.test import APIClient, APIRequestFactory
 
 from core.models import Ingredient, Recipe, Tag
 from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
@@ -93,6 +95,18 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data, serializer.data)
 
+    def test_list_recipes_without_m2m_queries(self):
+        """Test that listing recipes does not query the through tables"""
+        for title in ["recipe1", "recipe2", "recipe3"]:
+            recipe = sample_recipe(user=self.user, title=title)
+            recipe.tags.add(sample_tag(user=self.user))
+            recipe.ingredients.add(sample_ingredient(user=self.user))
+        with self.assertNumQueries(1):
+            response = self.client.get(RECIPES_URL)
+        recipes = Recipe.objects.filter(user=self.user).order_by("-title")
+        serializer = RecipeSerializer(recipes, many=True)
+        self.assertEqual(response.data, serializer.data)
+
     def test_view_recipe_detail(self):
         """Test viewing a recipe detail"""
         recipe = sample_recipe(user=self.user)
@@ -133,6 +147,37 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(tag1, tags)
         self.assertIn(tag2, tags)
 
+    def test_create_recipe_bumps_version_once(self):
+        """Test that a recipe write bumps the data version once, on commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = sample_tag(user=self.user)
+            ingredient = sample_ingredient(user=self.user)
+        payload = {
+            "title": "recipe",
+            "tags": [tag.id],
+            "ingredients": [ingredient.id],
+            "time_minutes": 1,
+            "price": 1.0,
+        }
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                response = self.client.post(RECIPES_URL, payload)
+                bumps = [
+                    query
+                    for query in queries
+                    if query["sql"].startswith('UPDATE "core_user"')
+                ]
+                self.assertEqual(bumps, [])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(callbacks), 1)
+        bumps = [
+            query
+            for query in queries
+            if query["sql"].startswith('UPDATE "core_user"')
+        ]
+        self.assertEqual(len(bumps), 1)
+
     def test_create_recipe_with_ingredients(self):
         """Test creating a recipe with ingredients"""
         ingredient1 = sample_ingredient(user=self.user, name="ingredient1")
@@ -183,6 +228,59 @@ class PrivateRecipeApiTests(TestCase):
         tags = recipe.tags.all()
         self.assertEqual(tags.count(), 0)
 
+    def test_create_recipe_with_other_users_tags(self):
+        """Test that tags of other users are rejected, all reported at once"""
+        other_user = get_user_model().objects.create_user("other@test.com")
+        own_tag = sample_tag(user=self.user)
+        other_tags = [sample_tag(user=other_user) for _ in range(2)]
+        payload = {
+            "title": "recipe",
+            "tags": [own_tag.id] + [tag.id for tag in other_tags],
+            "time_minutes": 1,
+            "price": 1.0,
+        }
+        response = self.client.post(RECIPES_URL, payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        [error] = response.data["tags"]
+        for tag in other_tags:
+            self.assertIn(str(tag.id), error)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_related_pks_validated_in_one_query(self):
+        """Test that each list of tags and ingredients costs one query"""
+        request = APIRequestFactory().post(RECIPES_URL)
+        request.user = self.user
+        for count in [1, 100, 1000]:
+            tags = Tag.objects.bulk_create(
+                Tag(user=self.user, name=f"tag{i}") for i in range(count)
+            )
+            if tags[0].pk is None:
+                tags = Tag.objects.filter(user=self.user).order_by("-id")
+            tag_ids = [tag.id for tag in tags[:count]]
+            ingredient = sample_ingredient(user=self.user)
+            serializer = RecipeSerializer(
+                data={
+                    "title": "recipe",
+                    "tags": tag_ids,
+                    "ingredients": [ingredient.id],
+                    "time_minutes": 1,
+                    "price": 1.0,
+                },
+                context={"request": request},
+            )
+            with self.assertNumQueries(2):
+                self.assertTrue(serializer.is_valid())
+
+            with CaptureQueriesContext(connection) as queries:
+                recipe = serializer.save(user=self.user)
+            refetches = [
+                query
+                for query in queries
+                if 'WHERE "core_tag"."id" IN' in query["sql"]
+            ]
+            self.assertEqual(refetches, [])
+            self.assertEqual(recipe.tags.count(), count)
+
 
 class RecipeImageUploadTests(TestCase):
     def setUp(self):
@@ -0,0 +1,103 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.serializers import RecipeDetailSerializer
+
+DETAILS_URL = reverse("recipe:recipe-bulk-retrieve")
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+class RecipeDetailCacheTests(TestCase):
+    """Test the cached recipe detail API"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("test@test.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.tag = Tag.objects.create(user=self.user, name="Vegan")
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Curry", time_minutes=30, price=5
+        )
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name="Rice")
+        )
+
+    def assertFreshDetail(self, recipe):
+        """Assert that the detail endpoint matches the recipe's state"""
+        response = self.client.get(detail_url(recipe.id))
+        recipe = Recipe.objects.get(id=recipe.id)
+        self.assertEqual(response.data, RecipeDetailSerializer(recipe).data)
+
+    def test_cached_detail_skips_nested_queries(self):
+        """Test that a cached detail only costs the recipe lookup"""
+        first = self.client.get(detail_url(self.recipe.id))
+        with self.assertNumQueries(1):
+            second = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(first.data, second.data)
+
+    def test_recipe_update_invalidates(self):
+        """Test that updating the recipe renders a new detail"""
+        self.client.get(detail_url(self.recipe.id))
+        self.client.patch(detail_url(self.recipe.id), {"title": "Dal"})
+        self.assertFreshDetail(self.recipe)
+
+    def test_link_change_invalidates(self):
+        """Test that relinking tags renders a new detail"""
+        self.client.get(detail_url(self.recipe.id))
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name="Hot"))
+        self.assertFreshDetail(self.recipe)
+        self.tag.recipe_set.clear()
+        self.assertFreshDetail(self.recipe)
+
+    def test_tag_rename_invalidates(self):
+        """Test that renaming a linked tag renders a new detail"""
+        self.client.get(detail_url(self.recipe.id))
+        self.tag.name = "Vegetarian"
+        self.tag.save()
+        self.assertFreshDetail(self.recipe)
+
+    def test_bulk_retrieve_single_cache_lookup(self):
+        """Test that several details are fetched in one cache round trip"""
+        other = Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=10, price=2
+        )
+        foreign = Recipe.objects.create(
+            user=get_user_model().objects.create_user("other@test.com"),
+            title="Pie",
+            time_minutes=10,
+            price=2,
+        )
+        ids = f"{other.id},{foreign.id},{self.recipe.id}"
+        self.client.get(DETAILS_URL, {"ids": ids})
+
+        with patch.object(
+            cache, "get_many", wraps=cache.get_many
+        ) as get_many, self.assertNumQueries(1):
+            response = self.client.get(DETAILS_URL, {"ids": ids})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_many.call_count, 1)
+        expected = [
+            RecipeDetailSerializer(Recipe.objects.get(id=recipe_id)).data
+            for recipe_id in (other.id, self.recipe.id)
+        ]
+        self.assertEqual(response.data, expected)
+
+    def test_bulk_retrieve_invalid_ids(self):
+        """Test that missing, malformed or too many IDs are rejected"""
+        for ids in ["", "1,x", ",".join(["1"] * 101)]:
+            response = self.client.get(DETAILS_URL, {"ids": ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,145 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+BULK_TAGS_URL = reverse("recipe:recipe-bulk-link-tags")
+BULK_INGREDIENTS_URL = reverse("recipe:recipe-bulk-link-ingredients")
+
+
+def tags_url(recipe_id):
+    """Return the URL for changing the tags of a recipe"""
+    return reverse("recipe:recipe-link-tags", args=[recipe_id])
+
+
+def ingredients_url(recipe_id):
+    """Return the URL for changing the ingredients of a recipe"""
+    return reverse("recipe:recipe-link-ingredients", args=[recipe_id])
+
+
+def through_writes(queries):
+    """Return the kinds of statements writing the recipe tag links"""
+    pattern = r'(INSERT (OR IGNORE )?INTO|DELETE FROM) "core_recipe_tags"'
+    return [
+        query["sql"].split()[0]
+        for query in queries
+        if re.match(pattern, query["sql"])
+    ]
+
+
+class RecipeLinksApiTests(TestCase):
+    """Test adding and removing recipe tags and ingredients"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.tags = [
+            Tag.objects.create(user=self.user, name=f"tag{i}")
+            for i in range(4)
+        ]
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="recipe", time_minutes=1, price=1
+        )
+        self.recipe.tags.add(self.tags[0], self.tags[1])
+
+    def test_add_and_remove_tags(self):
+        """Test that only the changed links are written"""
+        payload = {
+            "add": [self.tags[1].id, self.tags[2].id],
+            "remove": [self.tags[0].id, self.tags[3].id],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                tags_url(self.recipe.id), payload, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = sorted([self.tags[1].id, self.tags[2].id])
+        self.assertEqual(response.data["tags"], expected)
+        self.assertEqual(
+            sorted(self.recipe.tags.values_list("id", flat=True)), expected
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual([pk for pk, _ in self.recipe.tag_snapshot], expected)
+        self.assertEqual(through_writes(queries), ["DELETE", "INSERT"])
+
+    def test_add_ingredients(self):
+        """Test that ingredients are added to a recipe"""
+        ingredient = Ingredient.objects.create(user=self.user, name="salt")
+        response = self.client.post(
+            ingredients_url(self.recipe.id),
+            {"add": [ingredient.id]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["ingredients"], [ingredient.id])
+
+    def test_add_other_users_tag_rejected(self):
+        """Test that tags of other users cannot be added"""
+        other_user = get_user_model().objects.create_user("other@test.com")
+        tag = Tag.objects.create(user=other_user, name="other")
+        response = self.client.post(
+            tags_url(self.recipe.id), {"add": [tag.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(self.recipe.tags.filter(id=tag.id).exists())
+
+    def test_add_and_remove_same_id_rejected(self):
+        """Test that an ID cannot be both added and removed"""
+        payload = {"add": [self.tags[2].id], "remove": [self.tags[2].id]}
+        response = self.client.post(
+            tags_url(self.recipe.id), payload, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_change_tags(self):
+        """Test that tags of several recipes change with one write each"""
+        recipes = [self.recipe] + [
+            Recipe.objects.create(
+                user=self.user, title=f"recipe{i}", time_minutes=1, price=1
+            )
+            for i in range(3)
+        ]
+        payload = {
+            "recipes": [recipe.id for recipe in recipes],
+            "add": [self.tags[3].id],
+            "remove": [self.tags[0].id],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(BULK_TAGS_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data[0]["tags"], [self.tags[1].id, self.tags[3].id]
+        )
+        for result in response.data[1:]:
+            self.assertEqual(result["tags"], [self.tags[3].id])
+        self.assertEqual(through_writes(queries), ["DELETE", "INSERT"])
+        snapshot_writes = [
+            query
+            for query in queries
+            if query["sql"].startswith('UPDATE "core_recipe" ')
+        ]
+        self.assertEqual(len(snapshot_writes), 1)
+        for recipe in recipes[1:]:
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.tag_snapshot, [[self.tags[3].id, "tag3"]])
+
+    def test_bulk_change_other_users_recipe_rejected(self):
+        """Test that recipes of other users cannot be changed"""
+        other_user = get_user_model().objects.create_user("other@test.com")
+        recipe = Recipe.objects.create(
+            user=other_user, title="other", time_minutes=1, price=1
+        )
+        payload = {"recipes": [recipe.id], "add": [self.tags[0].id]}
+        response = self.client.post(BULK_TAGS_URL, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(recipe.tags.exists())
@@ -0,0 +1,131 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe
+from recipe import pantry
+
+PANTRY_URL = reverse("recipe:recipe-pantry")
+
+
+class PantryApiTests(TestCase):
+    """Test the pantry match API"""
+
+    def setUp(self):
+        cache.clear()
+        pantry._load_index.cache_clear()
+        self.user = get_user_model().objects.create_user("test@test.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rice, self.beans, self.onion, self.salt = [
+                Ingredient.objects.create(user=self.user, name=name)
+                for name in ("rice", "beans", "onion", "salt")
+            ]
+
+    def create_recipe(self, *ingredients, user=None):
+        """Create a recipe with the given ingredients"""
+        recipe = Recipe.objects.create(
+            user=user or self.user, title="r", time_minutes=5, price=1
+        )
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def get(self, ingredients, **params):
+        """Query the pantry endpoint with the given ingredients"""
+        return self.client.get(
+            PANTRY_URL,
+            {
+                "ingredients": ",".join(str(i.id) for i in ingredients),
+                **params,
+            },
+        )
+
+    def test_subset_match(self):
+        """Test that only recipes made of pantry ingredients match"""
+        rice_beans = self.create_recipe(self.rice, self.beans)
+        self.create_recipe(self.rice, self.onion)
+        other = get_user_model().objects.create_user("other@test.com")
+        self.create_recipe(self.rice, user=other)
+
+        res = self.get([self.rice, self.beans, self.salt])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id"] for r in res.data], [rice_beans.id])
+        self.assertEqual(res.data[0]["missing"], [])
+
+    def test_near_subset_match(self):
+        """Test that recipes missing up to k ingredients match"""
+        one = self.create_recipe(self.rice, self.onion)
+        two = self.create_recipe(self.onion, self.salt, self.beans)
+        exact = self.create_recipe(self.beans)
+
+        res = self.get([self.beans], max_missing=2)
+
+        self.assertEqual(
+            [(r["id"], r["missing"]) for r in res.data],
+            [
+                (exact.id, []),
+                (one.id, [self.rice.id, self.onion.id]),
+                (two.id, [self.onion.id, self.salt.id]),
+            ],
+        )
+
+    def test_index_cached_until_links_change(self):
+        """Test that the index is reused until the user's data changes"""
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.create_recipe(self.rice)
+        self.get([self.rice])
+        # The user's data version and the matched recipes are read
+        with self.assertNumQueries(2):
+            res = self.get([self.rice])
+        self.assertEqual(len(res.data), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.ingredients.add(self.salt)
+        self.assertEqual(self.get([self.rice]).data, [])
+
+    def test_invalid_params(self):
+        """Test that malformed ingredients and max_missing are rejected"""
+        for params in (
+            {"ingredients": "1,x"},
+            {"max_missing": 11},
+            {"max_missing": "x"},
+        ):
+            res = self.client.get(PANTRY_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_match_against_sets(self):
+        """Test the bitset match against a set-based reference"""
+        rng = random.Random(3)
+        Ingredient.objects.bulk_create(
+            Ingredient(user=self.user, name=f"i{i}") for i in range(40)
+        )
+        ingredients = list(Ingredient.objects.filter(user=self.user))
+        for _ in range(60):
+            self.create_recipe(*rng.sample(ingredients, rng.randint(0, 6)))
+        have = {i.id for i in rng.sample(ingredients, 20)}
+        expected = []
+        for recipe in Recipe.objects.prefetch_related("ingredients"):
+            missing = {i.id for i in recipe.ingredients.all()} - have
+            if len(missing) <= 2:
+                expected.append((len(missing), recipe.id, sorted(missing)))
+
+        matches = pantry.match(pantry.build_index(self.user.id), have, 2)
+
+        self.assertEqual(
+            sorted(
+                (len(missing), recipe_id, missing)
+                for recipe_id, missing in matches
+            ),
+            sorted(expected),
+        )
+        self.assertEqual(
+            [len(missing) for _, missing in matches],
+            sorted(len(missing) for _, missing in matches),
+        )
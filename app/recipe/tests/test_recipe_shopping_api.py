@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe
+
+SHOPPING_LIST_URL = reverse("recipe:recipe-shopping-list")
+
+
+class ShoppingListApiTests(TestCase):
+    """Test the shopping list API"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_recipe(self, *ingredients, user=None):
+        """Create a recipe with the given ingredients"""
+        recipe = Recipe.objects.create(
+            user=user or self.user, title="r", time_minutes=5, price=1
+        )
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def get(self, *recipes):
+        """Request the shopping list of the given recipes"""
+        return self.client.get(
+            SHOPPING_LIST_URL, {"ids": ",".join(str(r.id) for r in recipes)}
+        )
+
+    def test_shopping_list_merges_ingredients(self):
+        """Test that shared ingredients are listed once with a count"""
+        rice, beans, salt = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ("rice", "beans", "salt")
+        ]
+        one = self.create_recipe(rice, beans)
+        two = self.create_recipe(rice, salt)
+        three = self.create_recipe(rice)
+        self.create_recipe(salt)
+
+        with self.assertNumQueries(1):
+            res = self.get(one, two, three)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data,
+            [
+                {
+                    "id": beans.id,
+                    "name": "beans",
+                    "count": 1,
+                    "recipes": [one.id],
+                },
+                {
+                    "id": rice.id,
+                    "name": "rice",
+                    "count": 3,
+                    "recipes": [one.id, two.id, three.id],
+                },
+                {
+                    "id": salt.id,
+                    "name": "salt",
+                    "count": 1,
+                    "recipes": [two.id],
+                },
+            ],
+        )
+
+    def test_shopping_list_other_users_recipes_ignored(self):
+        """Test that recipes of other users are left out"""
+        other = get_user_model().objects.create_user("other@test.com")
+        recipe = self.create_recipe(
+            Ingredient.objects.create(user=other, name="rice"), user=other
+        )
+        res = self.get(recipe)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_shopping_list_invalid_ids(self):
+        """Test that missing, malformed or too many IDs are rejected"""
+        for ids in ["", "1,x", ",".join(["1"] * 501)]:
+            res = self.client.get(SHOPPING_LIST_URL, {"ids": ids})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,181 @@
+import io
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, SimilarityBucket, Tag
+from core.similarity import (
+    BANDS,
+    candidate_recipes,
+    jaccard,
+    snapshot_tokens,
+)
+from core.snapshots import refresh_snapshots
+
+
+def similar_url(recipe_id):
+    """Return the similar recipes URL of a recipe"""
+    return reverse("recipe:recipe-similar", args=[recipe_id])
+
+
+def tags_url(recipe_id):
+    """Return the tag link URL of a recipe"""
+    return reverse("recipe:recipe-link-tags", args=[recipe_id])
+
+
+class SimilarRecipesApiTests(TestCase):
+    """Test the similar recipes API"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_recipe(self, tags=(), ingredients=(), user=None):
+        """Create a recipe linked to the given tags and ingredients"""
+        recipe = Recipe.objects.create(
+            user=user or self.user, title="r", time_minutes=5, price=1
+        )
+        recipe.tags.add(*tags)
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def ingredients(self, *names, user=None):
+        """Create ingredients with the given names"""
+        return [
+            Ingredient.objects.create(user=user or self.user, name=name)
+            for name in names
+        ]
+
+    def test_similar_ranked_by_jaccard(self):
+        """Test that similar recipes are ranked by their overlap"""
+        rice, beans, onion, garlic, salt = self.ingredients(
+            "rice", "beans", "onion", "garlic", "salt"
+        )
+        vegan = Tag.objects.create(user=self.user, name="vegan")
+        recipe = self.create_recipe([vegan], [rice, beans, onion])
+        close = self.create_recipe([vegan], [rice, beans, onion, garlic])
+        farther = self.create_recipe([], [rice, beans, onion, salt])
+        self.create_recipe([], [salt])
+        other = get_user_model().objects.create_user("other@test.com")
+        self.create_recipe([], [rice, beans, onion], user=other)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id"] for r in res.data], [close.id, farther.id])
+        self.assertEqual(res.data[0]["similarity"], 0.8)
+        self.assertEqual(res.data[1]["similarity"], 0.6)
+
+    def test_links_update_index(self):
+        """Test that linking and deleting tags updates the index"""
+        recipe = self.create_recipe(ingredients=self.ingredients("a", "b"))
+        other = self.create_recipe()
+        spicy = Tag.objects.create(user=self.user, name="spicy")
+        other.tags.add(spicy)
+        self.assertEqual(self.client.get(similar_url(recipe.id)).data, [])
+
+        self.client.post(tags_url(recipe.id), {"add": [spicy.id]})
+        res = self.client.get(similar_url(recipe.id))
+        self.assertEqual([r["id"] for r in res.data], [other.id])
+
+        spicy.delete()
+        self.assertEqual(self.client.get(similar_url(recipe.id)).data, [])
+        self.assertFalse(SimilarityBucket.objects.filter(recipe=other))
+        self.assertEqual(
+            SimilarityBucket.objects.filter(recipe=recipe).count(), BANDS
+        )
+
+    def test_similar_limit(self):
+        """Test that the number of results is limited"""
+        tag = Tag.objects.create(user=self.user, name="t")
+        recipe = self.create_recipe([tag])
+        for _ in range(3):
+            self.create_recipe([tag])
+
+        res = self.client.get(similar_url(recipe.id), {"limit": 2})
+        self.assertEqual(len(res.data), 2)
+        for limit in (0, 51, "x"):
+            res = self.client.get(similar_url(recipe.id), {"limit": limit})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_recipe_not_found(self):
+        """Test that another user's recipe cannot be looked up"""
+        other = get_user_model().objects.create_user("other@test.com")
+        recipe = self.create_recipe(user=other)
+        res = self.client.get(similar_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SimilarityRecallTests(TestCase):
+    """Test the LSH index against exact Jaccard similarity"""
+
+    def test_recall_against_exact_jaccard(self):
+        """Test that close neighbours are found among few candidates"""
+        user = get_user_model().objects.create_user("test@test.com")
+        rng = random.Random(7)
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f"tag{i}") for i in range(20)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f"ingredient{i}") for i in range(200)
+        )
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f"r{i}", time_minutes=1, price=1)
+            for i in range(400)
+        )
+        tags = list(Tag.objects.order_by("id"))
+        ingredients = list(Ingredient.objects.order_by("id"))
+        recipes = list(Recipe.objects.order_by("id"))
+        # Recipes are variations of a few base recipes
+        bases = [
+            (rng.sample(tags, 2), rng.sample(ingredients, 8))
+            for _ in range(40)
+        ]
+        tag_links, ingredient_links = [], []
+        for recipe in recipes:
+            base_tags, base_ingredients = rng.choice(bases)
+            kept = rng.sample(base_ingredients, rng.randint(5, 8))
+            extra = rng.sample(ingredients, rng.randint(0, 3))
+            for tag in base_tags:
+                tag_links.append(
+                    Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+                )
+            for ingredient in set(kept + extra):
+                ingredient_links.append(
+                    Recipe.ingredients.through(
+                        recipe_id=recipe.id, ingredient_id=ingredient.id
+                    )
+                )
+        Recipe.tags.through.objects.bulk_create(tag_links)
+        Recipe.ingredients.through.objects.bulk_create(ingredient_links)
+        refresh_snapshots([recipe.id for recipe in recipes])
+        call_command("rebuild_similarity_index", stdout=io.StringIO())
+
+        recipes = list(Recipe.objects.order_by("id"))
+        tokens = {recipe.id: snapshot_tokens(recipe) for recipe in recipes}
+        found = expected = candidates = 0
+        for recipe in recipes[:50]:
+            neighbours = {
+                other.id
+                for other in recipes
+                if other.id != recipe.id
+                and jaccard(tokens[recipe.id], tokens[other.id]) >= 0.5
+            }
+            candidate_ids = set(
+                candidate_recipes(recipe).values_list("id", flat=True)
+            )
+            found += len(neighbours & candidate_ids)
+            expected += len(neighbours)
+            candidates += len(candidate_ids)
+
+        self.assertGreater(expected, 0)
+        self.assertGreaterEqual(found / expected, 0.95)
+        # Candidates are a small fraction of the user's recipes
+        self.assertLess(candidates / 50, len(recipes) / 4)
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+STATS_URL = reverse("recipe:stats")
+
+
+class PublicRecipeStatsApiTests(TestCase):
+    """Test public-facing recipe statistics API"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_login_required(self):
+        """Test that login is required for retrieving statistics"""
+        response = self.client.get(STATS_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecipeStatsApiTests(TestCase):
+    """Test authenticated recipe statistics API"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="testpassword", name="test"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_empty_stats(self):
+        """Test retrieving statistics before creating any recipe"""
+        response = self.client.get(STATS_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe_count"], 0)
+        self.assertIsNone(response.data["time_minutes_median"])
+
+    def test_stats_limited_to_user(self):
+        """Test that statistics only cover the authenticated user"""
+        other_user = get_user_model().objects.create_user(
+            email="other@test.com", password="testpassword", name="other"
+        )
+        Recipe.objects.create(
+            user=other_user, title="other", time_minutes=100, price=10
+        )
+        for minutes in [10, 30]:
+            Recipe.objects.create(
+                user=self.user, title="recipe", time_minutes=minutes, price=5
+            )
+        with self.assertNumQueries(1):
+            response = self.client.get(STATS_URL)
+        self.assertEqual(response.data["recipe_count"], 2)
+        self.assertEqual(response.data["time_minutes_average"], 20)
+        self.assertEqual(response.data["time_minutes_median"], 20)
+        self.assertEqual(response.data["price_total"], "10.00")
+        self.assertEqual(response.data["price_average"], "5.00")
@@ -4,7 +4,6 @@ from rest_framework.routers import DefaultRouter
 
 from recipe import views
 
-
 router = DefaultRouter()
 router.register("tags", views.TagViewSet)
 router.register("ingredients", views.IngredientViewSet)
@@ -13,5 +12,7 @@ router.register("recipes", views.RecipeViewSet)
 app_name = "recipe"
 
 urlpatterns = [
+    path("stats/", views.RecipeStatsView.as_view(), name="stats"),
+    path("analytics/", views.RecipeAnalyticsView.as_view(), name="analytics"),
     path("", include(router.urls)),
 ]
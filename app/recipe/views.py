@@ -1,24 +1,47 @@
+from django.db import router, transaction
 from rest_framework import (
     authentication,
     decorators,
+    exceptions,
+    generics,
     mixins,
     permissions,
     response,
     status,
+    views,
     viewsets,
 )
 
-from core.models import Ingredient, Recipe, Tag
-from recipe import serializers
+from core import links, metrics, similarity
+from core.authentication import SignedTokenAuthentication
+from core.models import Ingredient, Recipe, RecipeStats, Tag
+from core.snapshots import SNAPSHOT_FIELDS
+from core.throttling import ThrottleFirstMixin
+from recipe import (
+    analytics,
+    autocomplete,
+    details,
+    pantry,
+    serializers,
+    shopping,
+)
 
 
 class BaseRecipeAttrViewSet(
-    viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin
+    ThrottleFirstMixin,
+    viewsets.GenericViewSet,
+    mixins.ListModelMixin,
+    mixins.CreateModelMixin,
 ):
     """Base viewset for user-owned recipe attributes"""
 
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (
+        SignedTokenAuthentication,
+        authentication.TokenAuthentication,
+    )
     permission_classes = (permissions.IsAuthenticated,)
+    replica_reads = True
+    max_autocomplete = 50
 
     def get_queryset(self):
         """Return attributes for the current authenticated user only"""
@@ -31,10 +54,45 @@ class BaseRecipeAttrViewSet(
             .order_by("-name")
         )
 
+    @property
+    def throttle_scope(self):
+        """Throttle writes only"""
+        if self.request.method not in permissions.SAFE_METHODS:
+            return "write"
+        return None
+
     def perform_create(self, serializer):
         """Create a new attribute"""
         serializer.save(user=self.request.user)
 
+    @decorators.action(methods=["GET"], detail=False)
+    def autocomplete(self, request):
+        """Return the most used names starting with ?prefix="""
+        errors = {}
+        prefix = request.query_params.get("prefix", "")
+        if not 1 <= len(prefix) <= 255:
+            errors["prefix"] = ["Must be 1 to 255 characters long"]
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.max_autocomplete:
+            errors["limit"] = [
+                f"Must be an integer from 1 to {self.max_autocomplete}"
+            ]
+        if errors:
+            return response.Response(
+                errors, status=status.HTTP_400_BAD_REQUEST
+            )
+        return response.Response(
+            autocomplete.autocomplete(
+                self.queryset.filter(user=request.user),
+                request.user.id,
+                prefix,
+                limit,
+            )
+        )
+
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database"""
@@ -50,18 +108,51 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ThrottleFirstMixin, viewsets.ModelViewSet):
     """Manage recipes in the database"""
 
     queryset = Recipe.objects.all()
     serializer_class = serializers.RecipeSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (
+        SignedTokenAuthentication,
+        authentication.TokenAuthentication,
+    )
     permission_classes = (permissions.IsAuthenticated,)
+    replica_reads = True
+    max_bulk_details = 100
+    max_shopping_list = 500
+    max_similar = 50
+    max_pantry_missing = 10
+    link_serializers = {
+        "link_tags": serializers.TagLinksSerializer,
+        "link_ingredients": serializers.IngredientLinksSerializer,
+        "bulk_link_tags": serializers.BulkTagLinksSerializer,
+        "bulk_link_ingredients": serializers.BulkIngredientLinksSerializer,
+    }
 
     def __params_to_ints(self, qs):
         """Convert a list of string IDs to integers"""
         return [int(str_id) for str_id in qs.split(",")]
 
+    def _ids_param(self, maximum):
+        """Return the recipe IDs of ?ids=, rejecting too few or too many"""
+        try:
+            ids = self.__params_to_ints(
+                self.request.query_params.get("ids", "")
+            )
+        except ValueError:
+            ids = []
+        if not 1 <= len(ids) <= maximum:
+            raise exceptions.ValidationError(
+                {
+                    "ids": [
+                        "Must be a comma-separated list of 1 to "
+                        f"{maximum} recipe IDs"
+                    ]
+                }
+            )
+        return ids
+
     def get_queryset(self):
         """Return recipes for the current authenticated user only"""
         queryset = self.queryset
@@ -71,17 +162,188 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 queryset = queryset.filter(**{f"{attr}__id__in": param_ids})
         return queryset.filter(user=self.request.user).order_by("-title")
 
+    @property
+    def throttle_scope(self):
+        """Throttle image uploads and other writes separately"""
+        if self.action == "upload_image":
+            return "upload"
+        if self.request.method not in permissions.SAFE_METHODS:
+            return "write"
+        return None
+
     def get_serializer_class(self):
         """Return appropriate serializer class"""
-        if self.action == "retrieve":
+        if self.action in ("list", "similar", "pantry"):
+            return serializers.RecipeListSerializer
+        elif self.action in ("retrieve", "bulk_retrieve"):
             return serializers.RecipeDetailSerializer
         elif self.action == "upload_image":
             return serializers.RecipeImageSerializer
+        elif self.action in self.link_serializers:
+            return self.link_serializers[self.action]
         return self.serializer_class
 
     def perform_create(self, serializer):
-        """Create a new recipe"""
-        serializer.save(user=self.request.user)
+        """Create a new recipe and its links in one transaction"""
+        with transaction.atomic(using=router.db_for_write(Recipe)):
+            serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        """Update a recipe and its links in one transaction"""
+        with transaction.atomic(using=router.db_for_write(Recipe)):
+            serializer.save()
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return the details of a recipe, cached per detail version"""
+        recipe = self.get_object()
+        [detail] = details.get_details(
+            [(recipe.id, recipe.detail_version)],
+            lambda ids: {recipe.id: self.get_serializer(recipe).data},
+        )
+        return response.Response(detail)
+
+    @decorators.action(methods=["GET"], detail=False, url_path="details")
+    def bulk_retrieve(self, request):
+        """Return the details of the recipes listed in ?ids="""
+        ids = self._ids_param(self.max_bulk_details)
+        queryset = self.get_queryset().filter(id__in=ids)
+        versions = dict(queryset.values_list("id", "detail_version"))
+
+        def render(missing):
+            recipes = queryset.filter(id__in=missing).prefetch_related(
+                "tags", "ingredients"
+            )
+            serializer = self.get_serializer(recipes, many=True)
+            return {detail["id"]: detail for detail in serializer.data}
+
+        return response.Response(
+            details.get_details(
+                [
+                    (id, versions[id])
+                    for id in dict.fromkeys(ids)
+                    if id in versions
+                ],
+                render,
+            )
+        )
+
+    @decorators.action(methods=["GET"], detail=False, url_path="shopping-list")
+    def shopping_list(self, request):
+        """Return the ingredients needed for the recipes listed in ?ids="""
+        ids = self._ids_param(self.max_shopping_list)
+        return response.Response(shopping.shopping_list(request.user, ids))
+
+    @decorators.action(methods=["GET"], detail=True)
+    def similar(self, request, pk=None):
+        """Return the recipes sharing the most tags and ingredients"""
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.max_similar:
+            return response.Response(
+                {
+                    "limit": [
+                        f"Must be an integer from 1 to {self.max_similar}"
+                    ]
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        recipe = self.get_object()
+        results = []
+        for score, similar in similarity.similar_recipes(
+            recipe, limit, recipe._state.db
+        ):
+            result = self.get_serializer(similar).data
+            result["similarity"] = round(score, 4)
+            results.append(result)
+        return response.Response(results)
+
+    @decorators.action(methods=["GET"], detail=False)
+    def pantry(self, request):
+        """Return the recipes cookable from the ?ingredients= at hand
+
+        Recipes lacking up to ?max_missing= ingredients are included too,
+        with the IDs of the ingredients they lack.
+        """
+        errors = {}
+        ingredients = request.query_params.get("ingredients", "")
+        try:
+            ingredients = (
+                self.__params_to_ints(ingredients) if ingredients else []
+            )
+        except ValueError:
+            errors["ingredients"] = [
+                "Must be a comma-separated list of ingredient IDs"
+            ]
+        try:
+            max_missing = int(request.query_params.get("max_missing", 0))
+        except ValueError:
+            max_missing = -1
+        if not 0 <= max_missing <= self.max_pantry_missing:
+            errors["max_missing"] = [
+                f"Must be an integer from 0 to {self.max_pantry_missing}"
+            ]
+        if errors:
+            return response.Response(
+                errors, status=status.HTTP_400_BAD_REQUEST
+            )
+        matches = pantry.match(
+            pantry.get_index(request.user.id), ingredients, max_missing
+        )
+        recipes = Recipe.objects.in_bulk(
+            [recipe_id for recipe_id, _ in matches]
+        )
+        results = []
+        for recipe_id, missing in matches:
+            if recipe_id in recipes:
+                result = self.get_serializer(recipes[recipe_id]).data
+                result["missing"] = missing
+                results.append(result)
+        return response.Response(results)
+
+    def _change_links(self, recipes, relation):
+        """Apply the validated link changes and return the new links"""
+        serializer = self.get_serializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.validated_data.get("recipes", recipes)
+        links.change_links(
+            recipes,
+            relation,
+            add=[obj.id for obj in serializer.validated_data.get("add", [])],
+            remove=serializer.validated_data.get("remove", []),
+            using=router.db_for_write(Recipe),
+        )
+        snapshot_field = SNAPSHOT_FIELDS[relation]
+        snapshots = Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ).values_list("id", snapshot_field)
+        return [
+            {"id": recipe_id, relation: [pk for pk, _ in snapshot]}
+            for recipe_id, snapshot in snapshots.order_by("id")
+        ]
+
+    @decorators.action(methods=["POST"], detail=True, url_path="tags")
+    def link_tags(self, request, pk=None):
+        """Add and remove tags of a recipe"""
+        [result] = self._change_links([self.get_object()], "tags")
+        return response.Response(result)
+
+    @decorators.action(methods=["POST"], detail=True, url_path="ingredients")
+    def link_ingredients(self, request, pk=None):
+        """Add and remove ingredients of a recipe"""
+        [result] = self._change_links([self.get_object()], "ingredients")
+        return response.Response(result)
+
+    @decorators.action(methods=["POST"], detail=False, url_path="tags")
+    def bulk_link_tags(self, request):
+        """Add and remove tags of several recipes"""
+        return response.Response(self._change_links(None, "tags"))
+
+    @decorators.action(methods=["POST"], detail=False, url_path="ingredients")
+    def bulk_link_ingredients(self, request):
+        """Add and remove ingredients of several recipes"""
+        return response.Response(self._change_links(None, "ingredients"))
 
     @decorators.action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
@@ -90,9 +352,54 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(recipe, data=request.data)
         if serializer.is_valid():
             serializer.save()
+            metrics.IMAGE_UPLOAD_BYTES.labels(
+                request.resolver_match.view_name
+            ).inc(sum(upload.size for upload in request.FILES.values()))
             return response.Response(
                 serializer.data, status=status.HTTP_200_OK
             )
         return response.Response(
             serializer.errors, status=status.HTTP_400_BAD_REQUEST
         )
+
+
+class RecipeStatsView(generics.RetrieveAPIView):
+    """Retrieve recipe statistics for the authenticated user"""
+
+    serializer_class = serializers.RecipeStatsSerializer
+    authentication_classes = (
+        SignedTokenAuthentication,
+        authentication.TokenAuthentication,
+    )
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_object(self):
+        """Return the statistics of the authenticated user"""
+        stats = RecipeStats.objects.filter(user=self.request.user).first()
+        return stats or RecipeStats(user=self.request.user)
+
+
+class RecipeAnalyticsView(views.APIView):
+    """Retrieve time and price distributions of the user's recipes"""
+
+    authentication_classes = (
+        SignedTokenAuthentication,
+        authentication.TokenAuthentication,
+    )
+    permission_classes = (permissions.IsAuthenticated,)
+    max_bins = 100
+
+    def get(self, request):
+        """Return histograms and percentiles, overall and per tag"""
+        try:
+            bins = int(request.query_params.get("bins", 10))
+        except ValueError:
+            bins = 0
+        if not 1 <= bins <= self.max_bins:
+            return response.Response(
+                {"bins": [f"Must be an integer from 1 to {self.max_bins}"]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return response.Response(
+            analytics.get_analytics(request.user.id, bins)
+        )
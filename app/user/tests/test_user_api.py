@@ -1,13 +1,16 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-
 CREATE_USER_URL = reverse("user:create")
 TOKEN_URL = reverse("user:token")
+TOKEN_PAIR_URL = reverse("user:token-pair")
+TOKEN_REFRESH_URL = reverse("user:token-refresh")
+TOKEN_REVOKE_URL = reverse("user:token-revoke")
 ME_URL = reverse("user:me")
 
 
@@ -142,3 +145,65 @@ class PrivateUsersApiTests(TestCase):
         self.assertEqual(self.user.name, payload["name"])
         self.assertTrue(self.user.check_password, payload["password"])
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class SignedTokenApiTests(TestCase):
+    """Test the signed access and refresh token API"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="testpassword", name="test"
+        )
+        self.client = APIClient()
+        response = self.client.post(
+            TOKEN_PAIR_URL,
+            {"email": "test@test.com", "password": "testpassword"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.tokens = response.data
+
+    def test_access_token_authenticates(self):
+        """Test that a signed access token authenticates the user"""
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}"
+        )
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["email"], self.user.email)
+
+    def test_token_pair_invalid_credentials(self):
+        """Test that no token pair is created with invalid credentials"""
+        response = self.client.post(
+            TOKEN_PAIR_URL,
+            {"email": "test@test.com", "password": "wrongpassword"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn("access", response.data)
+
+    def test_refresh_token(self):
+        """Test that a refresh token gives a new access token"""
+        response = self.client.post(
+            TOKEN_REFRESH_URL, {"refresh": self.tokens["refresh"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access']}"
+        )
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+
+    def test_revoke_tokens(self):
+        """Test that revoking invalidates the user's refresh tokens"""
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}"
+        )
+        response = self.client.post(TOKEN_REVOKE_URL)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.client.credentials()
+        response = self.client.post(
+            TOKEN_REFRESH_URL, {"refresh": self.tokens["refresh"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.token_version, 1)
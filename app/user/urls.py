@@ -2,11 +2,21 @@ from django.urls import path
 
 from user import views
 
-
 app_name = "user"
 
 urlpatterns = [
     path("create/", views.CreateUserView.as_view(), name="create"),
     path("token/", views.CreateTokenView.as_view(), name="token"),
+    path(
+        "token/pair/", views.CreateTokenPairView.as_view(), name="token-pair"
+    ),
+    path(
+        "token/refresh/",
+        views.RefreshTokenView.as_view(),
+        name="token-refresh",
+    ),
+    path(
+        "token/revoke/", views.RevokeTokensView.as_view(), name="token-revoke"
+    ),
     path("me/", views.ManageUserView.as_view(), name="me"),
 ]
@@ -1,30 +1,105 @@
-from rest_framework import authentication, generics, permissions
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework import (
+    authentication,
+    generics,
+    permissions,
+    response,
+    status,
+    views,
+)
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
-from user.serializers import AuthTokenSerializer, UserSerializer
+from core import tokens
+from core.authentication import SignedTokenAuthentication
+from core.throttling import ThrottleFirstMixin
+from user.serializers import (
+    AuthTokenSerializer,
+    RefreshTokenSerializer,
+    UserSerializer,
+)
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(ThrottleFirstMixin, generics.CreateAPIView):
     """Create a new user in the system"""
 
     serializer_class = UserSerializer
+    authentication_classes = ()
+    throttle_scope = "signup"
 
 
-class CreateTokenView(ObtainAuthToken):
+class CreateTokenView(ThrottleFirstMixin, ObtainAuthToken):
     """Create a new auth token for the user"""
 
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    authentication_classes = ()
+    throttle_scope = "auth"
+    throttle_credential_field = "email"
+
+
+class CreateTokenPairView(ThrottleFirstMixin, generics.GenericAPIView):
+    """Create a signed access token and a refresh token for the user"""
+
+    serializer_class = AuthTokenSerializer
+    authentication_classes = ()
+    throttle_scope = "auth"
+    throttle_credential_field = "email"
+
+    def post(self, request):
+        """Return a new token pair for valid credentials"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data["user"]
+        return response.Response(tokens.issue_token_pair(user))
+
+
+class RefreshTokenView(ThrottleFirstMixin, generics.GenericAPIView):
+    """Create a new signed access token from a refresh token"""
+
+    serializer_class = RefreshTokenSerializer
+    authentication_classes = ()
+    throttle_scope = "auth"
+
+    def post(self, request):
+        """Return a new access token for a valid refresh token"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data["user"]
+        return response.Response(
+            {
+                "access": tokens.issue_access_token(user),
+                "expires_in": settings.ACCESS_TOKEN_LIFETIME,
+            }
+        )
+
+
+class RevokeTokensView(views.APIView):
+    """Revoke every refresh token of the authenticated user"""
+
+    authentication_classes = (
+        SignedTokenAuthentication,
+        authentication.TokenAuthentication,
+    )
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        """Revoke the user's refresh tokens"""
+        tokens.revoke_tokens(request.user)
+        return response.Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage an authenticated user"""
 
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (
+        SignedTokenAuthentication,
+        authentication.TokenAuthentication,
+    )
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """Retrieve the authenticated user"""
-        return self.request.user
+        return get_user_model().objects.get(pk=self.request.user.pk)